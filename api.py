@@ -0,0 +1,361 @@
+"""
+HTTP API for Email Productivity Agent.
+Serves the same backend as the Streamlit app to other clients and scripts:
+
+    uvicorn api:app --port 8000
+    MAILBOX=alice uvicorn api:app --port 8001
+
+The event loop never blocks on SQLite or the LLM. Health, job status and chat
+are ``async`` routes: chat runs the agent with ``run_in_threadpool`` and streams
+by iterating its (blocking) answer generator on the threadpool. The remaining
+routes are database-bound and deliberately plain functions, which FastAPI runs
+on the same threadpool; each pool thread keeps one open SQLite connection, since
+sqlite3 has no async driver to await. List endpoints take batches (ingest many
+emails, fetch or update many rows in one transaction), and bulk processing runs
+as a background job that clients poll. Set API_KEY to require an X-API-Key header.
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from fastapi import Depends, FastAPI, Header, HTTPException, Query
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+from backend import agent, email_processor, metrics
+from backend.database import Database
+from backend.deadlines import TIMESTAMP_FORMAT
+from backend.mailboxes import MailboxRegistry
+from backend.memory import ConversationMemory
+
+API_KEY = os.getenv("API_KEY")
+# Finished processing jobs kept for polling, and server-side chat sessions kept
+JOBS_KEEP = int(os.getenv("API_JOBS_KEEP", "100"))
+# Processing jobs run at once; later ones wait as "queued"
+JOB_WORKERS = max(1, int(os.getenv("API_JOB_WORKERS", "2")))
+CHAT_SESSIONS_KEEP = int(os.getenv("API_CHAT_SESSIONS", "500"))
+MAX_BATCH = 1000
+
+
+def open_database() -> Database:
+    """Open the MAILBOX shard (or the default database) with per-thread connections."""
+    mailbox = os.getenv("MAILBOX")
+    if not mailbox:
+        return Database(reuse_connections=True)
+    path = MailboxRegistry().get_path(mailbox)
+    if path is None:
+        raise KeyError(f"Unknown mailbox: {mailbox}")
+    return Database(path, reuse_connections=True)
+
+
+db = open_database()
+email_processor.init_processor(db)
+agent.init_agent(db)
+
+
+def require_api_key(x_api_key: Optional[str] = Header(None)):
+    if API_KEY and x_api_key != API_KEY:
+        raise HTTPException(status_code=401, detail="Invalid or missing X-API-Key")
+
+
+app = FastAPI(title="Email Productivity Agent", dependencies=[Depends(require_api_key)])
+
+
+# ==================== Models ====================
+
+class EmailIn(BaseModel):
+    id: Optional[int] = None
+    sender: str
+    subject: str = ""
+    body: str = ""
+    timestamp: str
+    message_id: Optional[str] = None
+    in_reply_to: Optional[str] = None
+
+
+class EmailIds(BaseModel):
+    ids: List[int] = Field(..., max_length=MAX_BATCH)
+
+
+class ProcessJobIn(BaseModel):
+    ids: Optional[List[int]] = None
+    limit: Optional[int] = None
+    with_summary: bool = True
+    stages: Optional[List[str]] = None
+
+
+class TaskStatus(BaseModel):
+    id: int
+    status: str = Field(..., pattern="^(pending|completed)$")
+
+
+class DraftIn(BaseModel):
+    email_id: int
+    instructions: str = ""
+
+
+class DraftChange(BaseModel):
+    id: int
+    subject: Optional[str] = None
+    body: Optional[str] = None
+
+
+class ChatTurn(BaseModel):
+    role: str = Field(..., pattern="^(user|assistant)$")
+    content: str
+
+
+class ChatIn(BaseModel):
+    question: str
+    email_id: Optional[int] = None
+    history: List[ChatTurn] = []
+    session_id: Optional[str] = None
+    stream: bool = False
+
+
+def email_dict(email, include_body: bool = True) -> Dict:
+    email = dict(email)
+    if not include_body:
+        email.pop('body', None)
+    return email
+
+
+# ==================== Health and metrics ====================
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "db_path": db.db_path}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    return metrics.render_prometheus()
+
+
+@app.get("/stats")
+def stats():
+    return db.get_email_stats()
+
+
+# ==================== Emails ====================
+
+@app.post("/emails", status_code=201)
+def ingest_emails(emails: List[EmailIn]):
+    """Insert a batch of emails in one transaction. Existing IDs are skipped."""
+    if len(emails) > MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH} emails per request")
+    rows = [email.model_dump(exclude_none=True) for email in emails]
+    return {"received": len(rows), "inserted": db.insert_emails(rows)}
+
+
+@app.get("/emails")
+def list_emails(q: Optional[str] = None, category: Optional[str] = None, sender: Optional[str] = None,
+                date_from: Optional[str] = None, date_to: Optional[str] = None,
+                processed: Optional[bool] = None, limit: int = Query(50, ge=1, le=500),
+                offset: int = Query(0, ge=0), include_body: bool = False):
+    """Search and filter emails, newest first, with category and sender facets."""
+    result = db.filter_emails(query=q, category=category, sender=sender, date_from=date_from,
+                              date_to=date_to, processed=processed, limit=limit, offset=offset)
+    result['emails'] = [email_dict(e, include_body) for e in result['emails']]
+    return result
+
+
+@app.post("/emails/batch")
+def get_emails(request: EmailIds):
+    """Fetch several emails by ID in one query."""
+    return {"emails": [email_dict(e) for e in db.get_emails_by_ids(request.ids)]}
+
+
+@app.get("/emails/{email_id}")
+def get_email(email_id: int):
+    email = db.get_email_by_id(email_id)
+    if not email:
+        raise HTTPException(status_code=404, detail=f"No email with id {email_id}")
+    result = email_dict(email)
+    result['tasks'] = [dict(t) for t in db.get_action_items_for_email(email_id)]
+    return result
+
+
+@app.post("/emails/{email_id}/process")
+def process_email(email_id: int, with_summary: bool = True):
+    """Process one email now, ahead of any queued background work."""
+    if not db.get_email_by_id(email_id):
+        raise HTTPException(status_code=404, detail=f"No email with id {email_id}")
+    return email_processor.process_email_now(email_id, with_summary) or {}
+
+
+# ==================== Processing jobs ====================
+
+_jobs: "OrderedDict[str, Dict]" = OrderedDict()
+_jobs_lock = threading.Lock()
+_job_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+
+
+def _run_job(job: Dict, request: ProcessJobIn):
+    job['status'] = 'running'
+    job['started_at'] = datetime.now().isoformat(timespec='seconds')
+    started = time.monotonic()
+    try:
+        if request.ids:
+            emails = db.get_emails_by_ids(request.ids)
+            job['total'] = len(emails)
+            counts = email_processor.process_emails(emails, request.with_summary, request.stages)
+        else:
+            pending = db.get_unprocessed_summary()['count']
+            job['total'] = min(pending, request.limit) if request.limit else pending
+            counts = email_processor.process_all_emails(request.with_summary, request.stages, request.limit)
+        job['processed'] = counts['processed']
+        job['failed'] = counts['failed']
+        status = 'done'
+    except Exception as e:
+        print(f"Processing job {job['id']} failed: {e}")
+        job['error'] = str(e)
+        status = 'failed'
+    job['elapsed'] = round(time.monotonic() - started, 3)
+    # Set last, so a poller that sees the job finished also sees its results
+    job['status'] = status
+
+
+@app.post("/jobs/process", status_code=202)
+def submit_processing_job(request: ProcessJobIn):
+    """Start processing in the background; poll GET /jobs/{id} for the result."""
+    if request.ids and len(request.ids) > MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH} ids per job")
+    try:
+        email_processor.resolve_stages(request.with_summary, request.stages)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    job = {"id": uuid.uuid4().hex, "status": "queued", "created_at": datetime.now().isoformat(timespec='seconds')}
+    with _jobs_lock:
+        _jobs[job['id']] = job
+        # Forget the oldest finished jobs
+        finished = [k for k, j in _jobs.items() if j['status'] in ('done', 'failed')]
+        for key in finished[:max(0, len(_jobs) - JOBS_KEEP)]:
+            del _jobs[key]
+    submitted = dict(job)
+    _job_executor.submit(_run_job, job, request)
+    return submitted
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job with id {job_id}")
+    return dict(job)
+
+
+# ==================== Tasks ====================
+
+@app.get("/tasks")
+def list_tasks(status: str = Query("pending", pattern="^(pending|completed|any)$"), sender: Optional[str] = None,
+               due: str = Query("any", pattern="^(any|overdue|due_soon)$"), within_hours: int = 48,
+               limit: int = Query(50, ge=1, le=500)):
+    """Action items, soonest due first, with the total matching count."""
+    status = None if status == "any" else status
+    now = datetime.now()
+    due_before = due_after = None
+    if due == "overdue":
+        due_before = now.strftime(TIMESTAMP_FORMAT)
+    elif due == "due_soon":
+        due_after = now.strftime(TIMESTAMP_FORMAT)
+        due_before = (now + timedelta(hours=within_hours)).strftime(TIMESTAMP_FORMAT)
+
+    return {
+        "total": db.count_tasks(status, sender, due_before, due_after),
+        "tasks": [dict(t) for t in db.find_tasks(status, sender, due_before, due_after, limit=limit)],
+    }
+
+
+@app.patch("/tasks")
+def update_tasks(updates: List[TaskStatus]):
+    """Set the status of several tasks in one transaction."""
+    if len(updates) > MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH} tasks per request")
+    return {"updated": db.update_action_item_statuses({u.id: u.status for u in updates})}
+
+
+# ==================== Drafts ====================
+
+@app.get("/drafts")
+def list_drafts(limit: int = Query(25, ge=1, le=500), offset: int = Query(0, ge=0)):
+    """A page of drafts, newest first. Fetch /drafts/{id} for the body."""
+    return {"total": db.count_drafts(), "drafts": [dict(d) for d in db.get_draft_page(limit, offset)]}
+
+
+@app.post("/drafts", status_code=201)
+def create_draft(request: DraftIn):
+    """Draft a reply to an email (reusing a pre-generated one when possible)."""
+    if not db.get_email_by_id(request.email_id):
+        raise HTTPException(status_code=404, detail=f"No email with id {request.email_id}")
+    draft_id = email_processor.create_draft_reply(request.email_id, request.instructions)
+    if not draft_id:
+        raise HTTPException(status_code=502, detail="Failed to generate a draft")
+    return dict(db.get_draft_by_id(draft_id))
+
+
+@app.patch("/drafts")
+def update_drafts(changes: List[DraftChange]):
+    """Save edited subjects and bodies of several drafts in one transaction."""
+    if len(changes) > MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH} drafts per request")
+    fields = {c.id: {k: v for k, v in (('subject', c.subject), ('body', c.body)) if v is not None}
+              for c in changes}
+    return {"updated": db.update_drafts(fields)}
+
+
+@app.get("/drafts/{draft_id}")
+def get_draft(draft_id: int):
+    draft = db.get_draft_by_id(draft_id)
+    if not draft:
+        raise HTTPException(status_code=404, detail=f"No draft with id {draft_id}")
+    return dict(draft)
+
+
+@app.delete("/drafts/{draft_id}", status_code=204)
+def delete_draft(draft_id: int):
+    db.delete_draft(draft_id)
+
+
+# ==================== Chat ====================
+
+_chat_sessions: "OrderedDict[str, ConversationMemory]" = OrderedDict()
+_chat_lock = threading.Lock()
+
+
+def chat_memory(session_id: Optional[str]) -> ConversationMemory:
+    """The rolling memory of a chat session, so older turns are summarized only once."""
+    if not session_id:
+        return ConversationMemory()
+    with _chat_lock:
+        memory = _chat_sessions.pop(session_id, None) or ConversationMemory()
+        _chat_sessions[session_id] = memory
+        while len(_chat_sessions) > CHAT_SESSIONS_KEEP:
+            _chat_sessions.popitem(last=False)
+    return memory
+
+
+@app.post("/chat")
+async def chat(request: ChatIn):
+    """Answer a question, optionally about one email. With "stream": true the
+    answer is sent as plain text chunks while it is generated."""
+    history = [{"role": t.role, "content": t.content} for t in request.history]
+    memory = chat_memory(request.session_id)
+
+    if request.stream:
+        chunks = agent.stream_answer(request.question, request.email_id, history, memory)
+        return StreamingResponse(iterate_in_threadpool(chunks), media_type="text/plain; charset=utf-8")
+
+    answer = await run_in_threadpool(agent.ask_question, request.question, request.email_id, history, memory)
+    if not answer:
+        raise HTTPException(status_code=502, detail="The model returned no answer")
+    return {"answer": answer}
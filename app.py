@@ -1,8 +1,17 @@
+import os
+import time
 import streamlit as st
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 from backend.database import Database
-from backend import email_processor, agent
+from backend import email_processor, agent, metrics
+from backend.threads import strip_quoted
+from backend.memory import ConversationMemory
+from backend.mailboxes import MailboxRegistry
+from backend.archive import start_background_archiver
+from backend.analytics import get_analytics
+from utils.helpers import get_sidebar_stats
+from utils.profiler import is_enabled as profiling_enabled, rerun_profiler
 
 
 
@@ -58,9 +67,19 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Optional Prometheus scrape endpoint (one per server process)
+if os.getenv("METRICS_PORT"):
+    metrics.start_http_server(int(os.getenv("METRICS_PORT")))
+
 # Initialize session state
 if 'db' not in st.session_state:
-    st.session_state.db = Database()
+    # One app server per mailbox: the processor and agent share module-level state
+    mailbox = os.getenv("MAILBOX")
+    st.session_state.db = MailboxRegistry().open(mailbox) if mailbox else Database()
+
+# Optional background archiving of old bodies (one job per server process)
+if os.getenv("ARCHIVE_AFTER_DAYS"):
+    start_background_archiver(st.session_state.db)
 
 # Initialize processor and agent with database
 if 'initialized' not in st.session_state:
@@ -71,6 +90,9 @@ if 'initialized' not in st.session_state:
     
 if 'chat_history' not in st.session_state:
     st.session_state.chat_history = []
+
+if 'chat_memory' not in st.session_state:
+    st.session_state.chat_memory = ConversationMemory()
     
 if 'selected_email_id' not in st.session_state:
     st.session_state.selected_email_id = None
@@ -118,8 +140,8 @@ def inbox_viewer_page():
         if st.button("⚡ Process All Emails", use_container_width=True, disabled=not st.session_state.emails_loaded):
             with st.spinner("Processing emails with LLM..."):
                 try:
-                    results = email_processor.process_all_emails(with_summary=False)
-                    st.success(f"✅ Processed {len(results)} emails")
+                    counts = email_processor.process_all_emails(with_summary=False)
+                    st.success(f"✅ Processed {counts['processed']} emails")
                     st.rerun()
                 except Exception as e:
                     st.error(f"❌ Error: {e}")
@@ -131,29 +153,91 @@ def inbox_viewer_page():
     
     st.divider()
     
+    # Filter values come from the widgets' state, so the query runs first and its
+    # facet counts can label the filter options drawn below in the same run
+    state = st.session_state
+    search_query = state.get("inbox_query", "")
+    selected_category = state.get("inbox_category", "All")
+    selected_sender = state.get("inbox_sender", "All")
+    date_range = state.get("inbox_dates", ())
+    status = state.get("inbox_status", "All")
+    
+    filters = {
+        "query": search_query or None,
+        "category": None if selected_category == "All" else selected_category,
+        "sender": None if selected_sender == "All" else selected_sender,
+        "processed": {"All": None, "Processed": True, "Unprocessed": False}[status],
+    }
+    if len(date_range) == 2:
+        filters["date_from"] = date_range[0].isoformat()
+        filters["date_to"] = (date_range[1] + timedelta(days=1)).isoformat()
+    active = {k: v for k, v in filters.items() if v is not None}
+    group_threads = state.get("inbox_threads", False) and not active
+    
+    # One query returns the page, the match count and the facet counts
+    page_size = 50
+    result = None
+    if not group_threads:
+        page = state.get("inbox_page", 0) if active == state.get("inbox_page_filters") else 0
+        result = state.db.filter_emails(**active, limit=page_size, offset=page * page_size)
+        state.inbox_page_filters = active
+    facets = result['facets'] if result else {}
+    
     # Filters
     col1, col2 = st.columns([3, 1])
     
     with col1:
-        search_query = st.text_input("🔍 Search emails", placeholder="Search by subject or content...")
+        st.text_input("🔍 Search emails", placeholder="Search by subject or content...", key="inbox_query")
     
     with col2:
         categories = ["All", "Important", "To-Do", "Meeting Request", "Project Update", "Newsletter", "Spam", "Personal"]
-        selected_category = st.selectbox("Filter by Category", categories)
+        category_counts = facets.get("category", {})
+        categories += [c for c in category_counts if c not in categories]
+        st.selectbox(
+            "Filter by Category", categories, key="inbox_category",
+            format_func=lambda c: c if c == "All" or not facets else f"{c} ({category_counts.get(c, 0)})"
+        )
     
-    # Get emails
-    if search_query:
-        emails = st.session_state.db.search_emails(search_query)
-    elif selected_category != "All":
-        emails = st.session_state.db.get_emails_by_category(selected_category)
-    else:
-        emails = st.session_state.db.get_all_emails()
+    with st.expander("More filters", expanded=bool(active.keys() & {"sender", "date_from", "processed"})):
+        col1, col2, col3 = st.columns([2, 2, 1])
+        sender_counts = facets.get("sender", {})
+        with col1:
+            senders = ["All"] + list(sender_counts)
+            if selected_sender not in senders:
+                senders.append(selected_sender)
+            st.selectbox(
+                "Sender", senders, key="inbox_sender",
+                format_func=lambda s: s if s == "All" or not facets else f"{s} ({sender_counts.get(s, 0)})"
+            )
+        with col2:
+            st.date_input("Date range", value=(), format="YYYY-MM-DD", key="inbox_dates")
+        with col3:
+            st.radio("Status", ["All", "Processed", "Unprocessed"], key="inbox_status")
+    
+    if st.toggle("🧵 Group by thread", disabled=bool(active), key="inbox_threads") and not active:
+        thread_list_view()
+        return
+    
+    emails = result['emails']
     
     if not emails:
-        st.info("📭 No emails found. Click 'Load Mock Inbox' to get started.")
+        if active:
+            st.info("📭 No emails match these filters.")
+        else:
+            st.info("📭 No emails found. Click 'Load Mock Inbox' to get started.")
         return
     
-    st.write(f"**Showing {len(emails)} email(s)**")
+    start = page * page_size
+    st.write(f"**Showing {start + 1}-{start + len(emails)} of {result['total']} email(s)**")
+    col1, col2, _ = st.columns([1, 1, 4])
+    with col1:
+        if st.button("◀ Newer", disabled=page == 0, use_container_width=True):
+            st.session_state.inbox_page = page - 1
+            st.rerun()
+    with col2:
+        if st.button("Older ▶", disabled=start + len(emails) >= result['total'], use_container_width=True):
+            st.session_state.inbox_page = page + 1
+            st.rerun()
     
     # Display emails
     for email in emails:
@@ -169,7 +253,7 @@ def inbox_viewer_page():
             with col2:
                 if st.button("🔄 Process", key=f"process_{email['id']}", use_container_width=True):
                     with st.spinner("Processing..."):
-                        email_processor.process_single_email(email['id'], with_summary=True)
+                        email_processor.process_email_now(email['id'], with_summary=True)
                         st.success("✅ Processed")
                         st.rerun()
                 
@@ -197,11 +281,34 @@ def inbox_viewer_page():
                     st.markdown(f"""
                     <div class="action-item">
                         <strong>Task:</strong> {item['task']}<br>
-                        <strong>Deadline:</strong> {item['deadline']}
+                        <strong>Deadline:</strong> {item['deadline']}{f" (due {item['due_at'].replace('T', ' ')[:16]})" if item.get('due_at') else ""}
                     </div>
                     """, unsafe_allow_html=True)
 
 
+def thread_list_view():
+    threads = st.session_state.db.get_threads(limit=200)
+    
+    if not threads:
+        st.info("📭 No emails found. Click 'Load Mock Inbox' to get started.")
+        return
+    
+    st.write(f"**Showing {len(threads)} thread(s)**")
+    
+    for thread in threads:
+        count = f" ({thread['message_count']})" if thread['message_count'] > 1 else ""
+        with st.expander(f"**{thread['subject']}**{count} - {thread['sender']}", expanded=False):
+            if thread['message_count'] > 1 and thread.get('summary'):
+                st.info(f"**Thread Summary:** {thread['summary']}")
+            
+            for email in st.session_state.db.get_thread_emails(thread['id']):
+                st.markdown(f"**{email['sender']}** · {format_timestamp(email['timestamp'])}")
+                if email['category']:
+                    st.markdown(get_category_badge_html(email['category']), unsafe_allow_html=True)
+                st.write(strip_quoted(email['body']) or email['body'])
+                st.markdown("---")
+
+
 def prompt_configuration_page():
     st.title("🧠 Prompt Configuration")
     
@@ -319,6 +426,7 @@ def email_agent_page():
     with col2:
         if st.button("🗑️ Clear History", use_container_width=True):
             st.session_state.chat_history = []
+            st.session_state.chat_memory.reset()
             st.rerun()
     
     # Quick action buttons
@@ -375,14 +483,18 @@ def email_agent_page():
                 # Process query with agent
                 response = agent.ask_question(
                     question=user_query,
-                    email_id=st.session_state.selected_email_id
+                    email_id=st.session_state.selected_email_id,
+                    history=st.session_state.chat_history,
+                    memory=st.session_state.chat_memory
                 )
                 
-                # Add to history
-                st.session_state.chat_history.append({"role": "user", "content": user_query})
-                st.session_state.chat_history.append({"role": "assistant", "content": response})
-                
-                st.rerun()
+                if not response:
+                    # Keep failed turns out of the history sent with later questions
+                    st.error("❌ The agent couldn't answer. Please try again.")
+                else:
+                    st.session_state.chat_history.append({"role": "user", "content": user_query})
+                    st.session_state.chat_history.append({"role": "assistant", "content": response})
+                    st.rerun()
             except Exception as e:
                 st.error(f"❌ Error: {e}")
 
@@ -392,54 +504,242 @@ def draft_manager_page():
     
     st.markdown("View, edit, and manage your email drafts. **No drafts are actually sent** - this is a safe playground.")
     
-    # Get all drafts
-    drafts = st.session_state.db.get_all_drafts()
+    db = st.session_state.db
+    total = db.count_drafts()
     
-    if not drafts:
+    if not total:
         st.info("📭 No drafts yet. Generate drafts from the Inbox page or use the Email Agent.")
         return
     
-    st.write(f"**{len(drafts)} draft(s)**")
+    # Opened drafts: id -> subject/body as loaded plus unsaved edits. Edits are copied
+    # out of the widgets as they happen, because Streamlit drops the state of widgets
+    # that aren't rendered, i.e. of open drafts on other pages.
+    opened = st.session_state.setdefault("open_drafts", {})
+    
+    def record_edit(draft_id, field):
+        opened[draft_id]['edited'][field] = st.session_state[f"{field}_{draft_id}"]
+    
+    def dirty_fields(draft_id):
+        original = opened[draft_id]
+        return {field: value for field, value in original['edited'].items() if value != original[field]}
+    
+    def save(changes):
+        db.update_drafts(changes)
+        for draft_id, fields in changes.items():
+            opened[draft_id].update(fields)
+            opened[draft_id]['edited'] = {}
+    
+    def close(draft_id):
+        opened.pop(draft_id, None)
+        for field in ('subject', 'body'):
+            st.session_state.pop(f"{field}_{draft_id}", None)
+    
+    # Subject-only rows, one page at a time
+    page_size = 25
+    page = min(st.session_state.get("draft_page", 0), (total - 1) // page_size)
+    drafts = db.get_draft_page(limit=page_size, offset=page * page_size)
+    
+    start = page * page_size
+    col1, col2, col3, col4 = st.columns([2, 1, 1, 2])
+    col1.write(f"**{total} draft(s)** · showing {start + 1}-{start + len(drafts)}")
+    with col2:
+        if st.button("◀ Newer", key="drafts_newer", disabled=page == 0, use_container_width=True):
+            st.session_state.draft_page = page - 1
+            st.rerun()
+    with col3:
+        if st.button("Older ▶", key="drafts_older", disabled=start + len(drafts) >= total, use_container_width=True):
+            st.session_state.draft_page = page + 1
+            st.rerun()
+    
+    # Edits to every open draft are saved together in one transaction
+    pending = {draft_id: fields for draft_id in opened if (fields := dirty_fields(draft_id))}
+    with col4:
+        if st.button(f"💾 Save All Changes ({len(pending)})", disabled=not pending, use_container_width=True):
+            save(pending)
+            st.success(f"✅ Saved {len(pending)} draft(s)")
+            st.rerun()
     
-    # Display drafts
     for draft in drafts:
-        with st.expander(f"**{draft['subject']}**", expanded=False):
-            st.markdown(f"**Created:** {format_timestamp(draft['created_at'])}")
-            
+        draft_id = draft['id']
+        col1, col2, col3 = st.columns([6, 1, 1])
+        with col1:
+            label = f"**{draft['subject']}** · {format_timestamp(draft['created_at'])}"
             if draft.get('original_subject'):
-                st.markdown(f"**In Reply To:** {draft['original_subject']}")
-            
-            # Edit mode
-            col1, col2 = st.columns([4, 1])
-            
-            with col1:
-                edited_subject = st.text_input(
-                    "Subject",
-                    value=draft['subject'],
-                    key=f"subj_{draft['id']}"
-                )
-            
-            with col2:
-                if st.button("🗑️ Delete", key=f"del_{draft['id']}", use_container_width=True):
-                    st.session_state.db.delete_draft(draft['id'])
-                    st.success("✅ Deleted")
+                label += f" · in reply to *{draft['original_subject']}*"
+            st.markdown(label)
+        with col2:
+            if draft_id in opened:
+                if st.button("✖️ Close", key=f"close_{draft_id}", use_container_width=True):
+                    close(draft_id)
                     st.rerun()
+            elif st.button("✏️ Open", key=f"open_{draft_id}", use_container_width=True):
+                # Load the body only when the draft is opened
+                full = db.get_draft_by_id(draft_id)
+                if full:
+                    opened[draft_id] = {'subject': full['subject'], 'body': full['body'],
+                                        'metadata': full.get('metadata'), 'edited': {}}
+                st.rerun()
+        with col3:
+            if st.button("🗑️ Delete", key=f"del_{draft_id}", use_container_width=True):
+                db.delete_draft(draft_id)
+                close(draft_id)
+                st.success("✅ Deleted")
+                st.rerun()
+        
+        if draft_id not in opened:
+            continue
+        
+        original = opened[draft_id]
+        with st.container():
+            edited = original['edited']
+            st.text_input("Subject", value=edited.get('subject', original['subject']), key=f"subject_{draft_id}",
+                          on_change=record_edit, args=(draft_id, 'subject'))
+            st.text_area("Body", value=edited.get('body', original['body']), height=200, key=f"body_{draft_id}",
+                         on_change=record_edit, args=(draft_id, 'body'))
             
-            edited_body = st.text_area(
-                "Body",
-                value=draft['body'],
-                height=200,
-                key=f"body_{draft['id']}"
-            )
-            
-            if st.button("💾 Save Changes", key=f"save_{draft['id']}"):
-                st.session_state.db.update_draft(draft['id'], edited_subject, edited_body)
+            changes = dirty_fields(draft_id)
+            if st.button("💾 Save Changes", key=f"save_{draft_id}", disabled=not changes):
+                save({draft_id: changes})
                 st.success("✅ Draft updated")
             
             # Show metadata if available
-            if draft.get('metadata'):
+            if original.get('metadata'):
                 with st.expander("📊 Metadata"):
-                    st.json(draft['metadata'])
+                    st.json(original['metadata'])
+
+
+def senders_page():
+    st.title("👥 Senders")
+    
+    st.markdown("Everyone who has emailed you, busiest first. Addresses are normalized, so display-name variants count as one sender.")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        domain = st.text_input("Domain", placeholder="e.g. company.com", key="senders_domain").strip()
+    with col2:
+        category = st.selectbox("Mostly sends", ["Any", "Important", "To-Do", "Meeting Request", "Newsletter",
+                                                 "Project Update", "Personal", "Spam"], key="senders_category")
+    
+    contacts = st.session_state.db.get_top_senders(50, domain=domain or None,
+                                                   category=None if category == "Any" else category)
+    if not contacts:
+        st.info("📭 No senders found.")
+        return
+    
+    st.dataframe(
+        pd.DataFrame([dict(c) for c in contacts],
+                     columns=['address', 'display_name', 'domain', 'message_count', 'dominant_category', 'last_seen']),
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    address = st.selectbox("Show mail from", [c['address'] for c in contacts], key="senders_address")
+    for email in st.session_state.db.get_emails_from_sender(address, limit=20):
+        st.markdown(f"**{email['subject']}** · {format_timestamp(email['timestamp'])} · "
+                    f"{email.get('category') or 'Uncategorized'}")
+
+
+def analytics_page():
+    st.title("📊 Analytics")
+    
+    st.markdown("Mailbox trends computed from an in-memory snapshot that refreshes when the database changes.")
+    
+    snapshot = get_analytics(st.session_state.db)
+    started = time.perf_counter()
+    overview = snapshot.overview()
+    
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("Emails", overview['emails'])
+    col2.metric("Processed", overview['processed'])
+    col3.metric("Senders", overview['senders'])
+    col4.metric("Pending Tasks", overview['pending_tasks'])
+    col5.metric("Overdue Tasks", overview['overdue_tasks'])
+    
+    if not overview['emails']:
+        st.info("📭 No emails yet. Load the mock inbox from the Inbox page.")
+        return
+    
+    st.subheader("Category Trend")
+    period = st.radio("Period", ["Day", "Week", "Month"], index=1, horizontal=True, key="analytics_period")
+    st.area_chart(snapshot.category_trend({"Day": "D", "Week": "W", "Month": "MS"}[period]))
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Top Senders")
+        st.dataframe(snapshot.sender_volume(20), use_container_width=True)
+    with col2:
+        st.subheader("Task Backlog Age")
+        st.bar_chart(snapshot.task_backlog())
+    
+    st.subheader("Processing Latency")
+    latency = snapshot.processing_latency()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Processed Emails", latency['count'])
+    col2.metric("p50", f"{latency['p50']:.1f} h")
+    col3.metric("p90", f"{latency['p90']:.1f} h")
+    col4.metric("p99", f"{latency['p99']:.1f} h")
+    
+    st.caption(f"Computed in {(time.perf_counter() - started) * 1000:.0f} ms · "
+               f"snapshot refreshed {snapshot.refreshed_at:%H:%M:%S}")
+
+
+def diagnostics_page():
+    st.title("📈 Diagnostics")
+    
+    st.markdown("Latency, token usage and cost recorded by this server process since it started.")
+    
+    data = metrics.snapshot()
+    counters = pd.DataFrame(data['counters'])
+    histograms = pd.DataFrame(data['histograms'])
+    
+    def counter_total(name, **labels):
+        if counters.empty:
+            return 0
+        rows = counters[counters['metric'] == name]
+        for label, value in labels.items():
+            if label not in rows:
+                return 0
+            rows = rows[rows[label] == value]
+        return rows['value'].sum()
+    
+    llm_calls = 0
+    if not histograms.empty:
+        llm_calls = histograms.loc[histograms['metric'] == 'llm_request_seconds', 'count'].sum()
+    
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric("LLM Calls", int(llm_calls))
+    col2.metric("Prompt Tokens", int(counter_total('llm_tokens_total', kind='prompt')))
+    col3.metric("Completion Tokens", int(counter_total('llm_tokens_total', kind='completion')))
+    col4.metric("Est. Cost", f"${counter_total('llm_cost_usd_total'):.4f}")
+    col5.metric("Retries / Cache Hits",
+                f"{int(counter_total('llm_retries_total'))} / {int(counter_total('llm_cache_hits_total'))}")
+    
+    st.subheader("Latency")
+    if histograms.empty:
+        st.info("No measurements yet. Process some emails or chat with the agent.")
+    else:
+        st.dataframe(histograms.sort_values('total_s', ascending=False), use_container_width=True)
+    
+    st.subheader("Counters")
+    if not counters.empty:
+        st.dataframe(counters, use_container_width=True)
+    
+    st.subheader("Processing Scheduler")
+    st.dataframe(pd.DataFrame(email_processor.get_processing_stats()).T, use_container_width=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            "⬇️ Download Prometheus Metrics",
+            metrics.render_prometheus(),
+            file_name="metrics.prom",
+            mime="text/plain",
+            use_container_width=True
+        )
+    with col2:
+        if st.button("🗑️ Reset Metrics", use_container_width=True):
+            metrics.reset()
+            st.rerun()
 
 
 # Main app
@@ -451,8 +751,9 @@ def main():
     
     page = st.sidebar.radio(
         "Navigation",
-        ["📧 Inbox", "🧠 Prompts", "💬 Agent Chat", "✍️ Drafts"],
-        label_visibility="collapsed"
+        ["📧 Inbox", "🧠 Prompts", "💬 Agent Chat", "✍️ Drafts", "👥 Senders", "📊 Analytics", "📈 Diagnostics"],
+        label_visibility="collapsed",
+        key="page"
     )
     
     st.sidebar.markdown("---")
@@ -460,17 +761,11 @@ def main():
     # Status indicators
     st.sidebar.markdown("### Status")
     
-    emails = st.session_state.db.get_all_emails()
-    processed = sum(1 for e in emails if e['processed'])
-    st.sidebar.metric("Emails Loaded", len(emails))
-    st.sidebar.metric("Processed", f"{processed}/{len(emails)}")
-    
-    drafts = st.session_state.db.get_all_drafts()
-    st.sidebar.metric("Drafts", len(drafts))
-    
-    action_items = st.session_state.db.get_all_action_items()
-    pending = sum(1 for a in action_items if a['status'] == 'pending')
-    st.sidebar.metric("Pending Tasks", pending)
+    stats = get_sidebar_stats(st.session_state.db)
+    st.sidebar.metric("Emails Loaded", stats['emails'])
+    st.sidebar.metric("Processed", f"{stats['processed']}/{stats['emails']}")
+    st.sidebar.metric("Drafts", stats['drafts'])
+    st.sidebar.metric("Pending Tasks", stats['pending_tasks'])
     
   
     
@@ -483,7 +778,49 @@ def main():
         email_agent_page()
     elif page == "✍️ Drafts":
         draft_manager_page()
+    elif page == "👥 Senders":
+        senders_page()
+    elif page == "📊 Analytics":
+        analytics_page()
+    elif page == "📈 Diagnostics":
+        diagnostics_page()
+
+
+def profiler_panel():
+    with st.sidebar.expander("🐢 Slowest Reruns"):
+        records = rerun_profiler.slowest()
+        if not records:
+            st.caption("No profiled reruns yet.")
+        
+        for i, record in enumerate(records):
+            st.markdown(f"**{record.total * 1000:.0f} ms** · {record.label} · {record.created_at}")
+            
+            sections = sorted(record.sections.items(), key=lambda x: x[1], reverse=True)
+            for name, seconds in sections:
+                st.caption(f"{name}: {seconds * 1000:.0f} ms")
+            
+            db_calls = sorted(record.db_calls.items(), key=lambda x: x[1][1], reverse=True)
+            for name, (calls, seconds) in db_calls[:5]:
+                st.caption(f"db.{name} ×{calls}: {seconds * 1000:.0f} ms")
+            
+            if st.toggle("Top functions", key=f"profile_report_{i}"):
+                st.code(record.report(), language=None)
+            
+            st.download_button(
+                "⬇️ Profile",
+                record.raw,
+                file_name=f"rerun-{i + 1}.prof",
+                key=f"profile_download_{i}"
+            )
+        
+        if records and st.button("Clear Profiles"):
+            rerun_profiler.clear()
 
 
 if __name__ == "__main__":
-    main()
+    if profiling_enabled(st.query_params):
+        with rerun_profiler.profile(lambda: st.session_state.get("page", "")):
+            main()
+        profiler_panel()
+    else:
+        main()
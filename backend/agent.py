@@ -1,6 +1,10 @@
+import os
+from datetime import datetime, timedelta
 from typing import List, Dict
+from langchain_core.messages import HumanMessage, SystemMessage
 from backend.database import Database
-from backend import llm_service
+from backend.deadlines import TIMESTAMP_FORMAT
+from backend import analytics, llm_service, metrics
 
 db = None
 
@@ -20,6 +24,11 @@ def format_email_context(email):
     if email.get('summary'):
         text += f"Summary: {email['summary']}\n\n"
     
+    if email.get('thread_id'):
+        thread = db.get_thread(email['thread_id'])
+        if thread and thread['message_count'] > 1 and thread.get('summary'):
+            text += f"Thread ({thread['message_count']} messages): {thread['summary']}\n\n"
+    
     text += f"Body:\n{email['body']}"
     
     tasks = db.get_action_items_for_email(email['id'])
@@ -31,7 +40,169 @@ def format_email_context(email):
     return text
 
 
-def ask_question(question, email_id=None):
+# Let the chat model query the mailbox through tools (set to 0 for models without tool calling)
+USE_TOOLS = os.getenv("AGENT_TOOLS", "1") == "1"
+
+AGENT_SYSTEM = (
+    "You are a helpful email assistant with access to the user's mailbox through tools. "
+    "Use the tools to look up emails, counts and tasks instead of guessing, prefer counts "
+    "over listing when the user asks how many, and answer concisely. Current time: {now}."
+)
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "search_emails",
+            "description": "Search emails by a keyword in the subject or body. Returns newest matches first.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "query": {"type": "string", "description": "Keyword or phrase"},
+                    "limit": {"type": "integer", "description": "Max results (default 10)"},
+                },
+                "required": ["query"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "get_email",
+            "description": "Fetch one email with its summary and action items.",
+            "parameters": {
+                "type": "object",
+                "properties": {"email_id": {"type": "integer"}},
+                "required": ["email_id"],
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "inbox_stats",
+            "description": "Email counts (total, processed, per category), task counts by status and draft count.",
+            "parameters": {"type": "object", "properties": {}},
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "query_tasks",
+            "description": "Count and list action items, soonest due first.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "status": {"type": "string", "enum": ["pending", "completed", "any"],
+                               "description": "Default pending"},
+                    "sender": {"type": "string", "description": "Part of the sender's name or address"},
+                    "due": {"type": "string", "enum": ["any", "overdue", "due_soon"], "description": "Default any"},
+                    "within_hours": {"type": "integer", "description": "Window for due_soon (default 48)"},
+                    "count_only": {"type": "boolean", "description": "Return only the count"},
+                    "limit": {"type": "integer", "description": "Max tasks listed (default 10)"},
+                },
+            },
+        },
+    },
+    {
+        "type": "function",
+        "function": {
+            "name": "urgent_emails",
+            "description": "Newest emails categorized Important or To-Do.",
+            "parameters": {
+                "type": "object",
+                "properties": {"limit": {"type": "integer", "description": "Max results (default 10)"}},
+            },
+        },
+    },
+]
+
+
+def compact_email(email):
+    return {
+        "id": email['id'],
+        "from": email['sender'],
+        "subject": email['subject'],
+        "date": email['timestamp'],
+        "category": email.get('category'),
+    }
+
+
+def compact_task(task):
+    return {
+        "task": task['task'],
+        "deadline": task['deadline'],
+        "due_at": task.get('due_at'),
+        "status": task['status'],
+        "from": task['sender'],
+        "email_id": task['email_id'],
+    }
+
+
+def tool_search_emails(query, limit=10):
+    return [compact_email(e) for e in db.search_emails(query, limit=min(int(limit), 50))]
+
+
+def tool_get_email(email_id):
+    email = db.get_email_by_id(int(email_id))
+    if not email:
+        return {"error": f"No email with id {email_id}"}
+    result = compact_email(email)
+    result["summary"] = email.get('summary')
+    result["body"] = email['body'][:2000]
+    result["tasks"] = [{"task": t['task'], "deadline": t['deadline'], "status": t['status']}
+                       for t in db.get_action_items_for_email(email['id'])]
+    return result
+
+
+def tool_inbox_stats():
+    return db.get_email_stats()
+
+
+def tool_query_tasks(status="pending", sender=None, due="any", within_hours=48, count_only=False, limit=10):
+    status = None if status == "any" else status
+    now = datetime.now()
+    due_before = due_after = None
+    if due == "overdue":
+        due_before = now.strftime(TIMESTAMP_FORMAT)
+    elif due == "due_soon":
+        due_after = now.strftime(TIMESTAMP_FORMAT)
+        due_before = (now + timedelta(hours=int(within_hours))).strftime(TIMESTAMP_FORMAT)
+    
+    result = {"count": db.count_tasks(status, sender, due_before, due_after)}
+    if not count_only and result["count"]:
+        tasks = db.find_tasks(status, sender, due_before, due_after, limit=min(int(limit), 50))
+        result["tasks"] = [compact_task(t) for t in tasks]
+    return result
+
+
+def tool_urgent_emails(limit=10):
+    return [compact_email(e) for e in db.get_urgent_emails(limit=min(int(limit), 50))]
+
+
+TOOL_FUNCTIONS = {
+    "search_emails": tool_search_emails,
+    "get_email": tool_get_email,
+    "inbox_stats": tool_inbox_stats,
+    "query_tasks": tool_query_tasks,
+    "urgent_emails": tool_urgent_emails,
+}
+
+
+def run_tool(name, args):
+    func = TOOL_FUNCTIONS.get(name)
+    if func is None:
+        return {"error": f"Unknown tool {name}"}
+    
+    with metrics.timer("agent_tool_seconds", tool=name):
+        try:
+            return func(**args)
+        except Exception as e:
+            print(f"Tool {name} failed: {e}")
+            return {"error": str(e)}
+
+
+def chat_context(email_id=None, history=None, memory=None):
     context = ""
     
     if email_id:
@@ -39,67 +210,109 @@ def ask_question(question, email_id=None):
         if email:
             context = format_email_context(email)
     
-    return llm_service.chat_with_agent(question, context)
+    # Earlier turns: recent ones verbatim, older ones as the session's rolling summary
+    past = memory.messages(history) if memory is not None and history else []
+    return context, past
+
+
+def ask_question(question, email_id=None, history=None, memory=None):
+    context, past = chat_context(email_id, history, memory)
+    
+    if not USE_TOOLS:
+        return llm_service.chat_with_agent(question, context, past)
+    
+    prompt = f"Selected email:\n{context}\n\nQuestion: {question}" if context else question
+    messages = [
+        SystemMessage(content=AGENT_SYSTEM.format(now=datetime.now().strftime("%Y-%m-%d %H:%M"))),
+        *past,
+        HumanMessage(content=prompt),
+    ]
+    answer = llm_service.chat_with_tools(messages, TOOLS, run_tool)
+    
+    # Models without tool calling still get a context-only answer; a failed
+    # request isn't retried without tools
+    if answer == "":
+        return llm_service.chat_with_agent(question, context, past)
+    return answer
+
+
+def stream_answer(question, email_id=None, history=None, memory=None):
+    # Tool-using answers arrive whole once the tool calls finish; plain answers stream as generated
+    if USE_TOOLS:
+        answer = ask_question(question, email_id, history, memory)
+        if answer:
+            yield answer
+        return
+    
+    context, past = chat_context(email_id, history, memory)
+    yield from llm_service.stream_chat_with_agent(question, context, past)
 
 
 def search_emails(query):
     return db.search_emails(query)
 
 
-def get_urgent_emails():
-    important = db.get_emails_by_category("Important")
-    todos = db.get_emails_by_category("To-Do")
-    
-    urgent = important + todos
-    urgent.sort(key=lambda x: x['timestamp'], reverse=True)
-    
-    return urgent
+def get_urgent_emails(limit=None):
+    return db.get_urgent_emails(("Important", "To-Do"), limit)
 
 
 def get_inbox_summary():
-    emails = db.get_all_emails()
-    
-    categories = {}
-    for email in emails:
-        cat = email.get('category', 'Uncategorized')
-        categories[cat] = categories.get(cat, 0) + 1
-    
-    tasks = db.get_all_action_items()
-    pending = [t for t in tasks if t['status'] == 'pending']
+    snapshot = analytics.get_analytics(db)
+    overview = snapshot.overview()
+    pending = overview['pending_tasks']
     
     summary = f"📧 Inbox Summary:\n\n"
-    summary += f"Total Emails: {len(emails)}\n\n"
+    summary += f"Total Emails: {overview['emails']}\n\n"
     
     summary += "By Category:\n"
-    for cat, count in sorted(categories.items(), key=lambda x: x[1], reverse=True):
-        summary += f"  • {cat}: {count}\n"
+    summary += "".join(f"  • {cat}: {count}\n" for cat, count in snapshot.category_counts().items())
     
-    summary += f"\n📋 Pending Tasks: {len(pending)}\n"
+    summary += f"\n📋 Pending Tasks: {pending}\n"
+    if overview['overdue_tasks']:
+        summary += f"⏰ Overdue: {overview['overdue_tasks']}\n"
     
     if pending:
         summary += "\nTop Tasks:\n"
-        for task in pending[:5]:
+        for task in db.get_urgent_tasks(5):
             summary += f"  • {task['task']}\n"
     
     return summary
 
 
-def get_all_tasks():
-    tasks = db.get_all_action_items()
+def format_task(task):
+    text = f"  • {task['task']}\n"
+    text += f"    Deadline: {task['deadline']}"
+    if task.get('due_at'):
+        text += f" (due {task['due_at'].replace('T', ' ')[:16]})"
+    text += f"\n    Email: {task['email_subject']}\n\n"
+    return text
+
+
+def get_all_tasks(limit=50):
+    counts = db.get_task_counts()
     
-    if not tasks:
+    if not counts:
         return "No tasks found."
     
-    pending = [t for t in tasks if t['status'] == 'pending']
+    pending = counts.get('pending', 0)
     
     summary = f"📋 Tasks Summary:\n\n"
-    summary += f"Pending: {len(pending)}\n\n"
+    summary += f"Pending: {pending}\n\n"
     
-    if pending:
+    overdue = db.get_overdue_tasks(limit=limit)
+    if overdue:
+        summary += "⏰ Overdue:\n"
+        for task in overdue:
+            summary += format_task(task)
+    
+    overdue_ids = {task['id'] for task in overdue}
+    upcoming = [t for t in db.get_urgent_tasks(limit + len(overdue)) if t['id'] not in overdue_ids][:limit]
+    if upcoming:
         summary += "Pending Tasks:\n"
-        for task in pending:
-            summary += f"  • {task['task']}\n"
-            summary += f"    Deadline: {task['deadline']}\n"
-            summary += f"    Email: {task['email_subject']}\n\n"
+        for task in upcoming:
+            summary += format_task(task)
+    
+    if pending > len(overdue) + len(upcoming):
+        summary += f"...and {pending - len(overdue) - len(upcoming)} more\n"
     
     return summary
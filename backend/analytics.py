@@ -0,0 +1,300 @@
+"""
+Inbox analytics over columnar snapshots.
+Emails and tasks are loaded once into pandas DataFrames and then kept current
+incrementally: new and re-categorized emails are merged in, a reloaded inbox
+is loaded afresh, and tasks are reloaded only when their table changed. Dashboards aggregate the in-memory
+frames instead of scanning SQLite. With ``pyarrow`` installed, snapshots can
+be persisted as Parquet so a restarted server skips the initial email load.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+from backend import metrics
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+# Directory for Parquet snapshots; empty keeps snapshots in memory only
+SNAPSHOT_DIR = os.getenv("ANALYTICS_SNAPSHOT_DIR", "")
+# Minimum seconds between Parquet writes of a changing snapshot
+PERSIST_SECONDS = float(os.getenv("ANALYTICS_PERSIST_SECONDS", "60"))
+
+EMAIL_COLUMNS = ["sender", "category", "timestamp", "processed", "processed_at"]
+TASK_COLUMNS = ["email_id", "status", "due_at", "created_at", "email_timestamp", "sender"]
+
+BACKLOG_BUCKETS = [-float("inf"), 1, 3, 7, 28, float("inf")]
+BACKLOG_LABELS = ["< 1 day", "1-3 days", "3-7 days", "1-4 weeks", "> 4 weeks"]
+
+
+def _to_datetime(values: pd.Series) -> pd.Series:
+    # Emails use ISO 'T' timestamps, SQLite defaults use a space; only the first 19 characters matter
+    return pd.to_datetime(values.astype("string").str.slice(0, 19).str.replace(" ", "T", regex=False),
+                          format="%Y-%m-%dT%H:%M:%S", errors="coerce")
+
+
+class InboxAnalytics:
+    """Columnar snapshot of one database's emails and tasks, with vectorized aggregates."""
+
+    def __init__(self, db, snapshot_dir: str = SNAPSHOT_DIR):
+        self.db = db
+        self.snapshot_dir = snapshot_dir if snapshot_dir and pyarrow is not None else ""
+        self.emails = pd.DataFrame(columns=EMAIL_COLUMNS, index=pd.Index([], name="id", dtype="int64"))
+        self.tasks = pd.DataFrame(columns=TASK_COLUMNS, index=pd.Index([], name="id", dtype="int64"))
+        self.refreshed_at: Optional[datetime] = None
+
+        self._lock = threading.RLock()
+        self._watcher: Optional[sqlite3.Connection] = None
+        self._version = None
+        self._last_id = 0
+        self._last_processed_at = ""
+        self._generation = None
+        self._task_token = None
+        self._cache: Dict[tuple, object] = {}
+        self._persisted_at = 0.0
+
+        if self.snapshot_dir:
+            self._load_snapshot()
+
+    # ==================== Refresh ====================
+
+    def _data_version(self) -> int:
+        # PRAGMA data_version changes whenever another connection commits, so a
+        # long-lived watcher connection detects changes without touching tables
+        if self._watcher is None:
+            self._watcher = sqlite3.connect(self.db.db_path, check_same_thread=False)
+        return self._watcher.execute("PRAGMA data_version").fetchone()[0]
+
+    def refresh(self) -> bool:
+        """Bring the snapshot up to date. Returns True if anything was reloaded."""
+        with self._lock:
+            version = self._data_version()
+            if version == self._version:
+                return False
+
+            with metrics.timer("analytics_refresh_seconds"):
+                conn = self.db.get_connection()
+                try:
+                    self._refresh_emails(conn)
+                    self._refresh_tasks(conn)
+                finally:
+                    conn.close()
+
+            self._version = version
+            self._cache.clear()
+            self.refreshed_at = datetime.now()
+            if self.snapshot_dir and time.monotonic() - self._persisted_at >= PERSIST_SECONDS:
+                self._save_snapshot()
+            return True
+
+    def _refresh_emails(self, conn: sqlite3.Connection):
+        row = conn.execute("SELECT value FROM meta WHERE key = 'inbox_generation'").fetchone()
+        generation = row[0] if row else 0
+        if generation != self._generation:
+            # The inbox was reloaded, possibly with the same ids and count: start over
+            self.emails = self.emails.iloc[0:0]
+            self._last_id = 0
+            self._last_processed_at = ""
+            self._task_token = None
+            self._generation = generation
+
+        # New emails by id, plus emails (re)categorized since the last refresh.
+        # '>=' re-reads the last second so updates within it aren't missed.
+        changed = pd.read_sql_query('''
+            SELECT id, sender, category, timestamp, processed, processed_at FROM emails WHERE id > ?
+            UNION
+            SELECT id, sender, category, timestamp, processed, processed_at FROM emails WHERE processed_at >= ?
+        ''', conn, params=(self._last_id, self._last_processed_at), index_col="id")
+
+        if not changed.empty:
+            processed_at = changed["processed_at"].dropna()
+            if not processed_at.empty:
+                self._last_processed_at = max(self._last_processed_at, processed_at.max())
+            self._last_id = max(self._last_id, int(changed.index.max()))
+
+            changed["category"] = changed["category"].fillna("Uncategorized")
+            changed["timestamp"] = _to_datetime(changed["timestamp"])
+            changed["processed"] = changed["processed"].fillna(0).astype(bool)
+            changed["processed_at"] = _to_datetime(changed["processed_at"])
+
+            kept = self.emails.drop(changed.index, errors="ignore")
+            self.emails = pd.concat([kept, changed]) if not kept.empty else changed
+
+        count = conn.execute("SELECT COUNT(*) FROM emails").fetchone()[0]
+        if count != len(self.emails):
+            # Emails were deleted (e.g. the inbox was reloaded): rebuild
+            self.emails = self.emails.iloc[0:0]
+            self._last_id = 0
+            self._last_processed_at = ""
+            self._refresh_emails(conn)
+
+    def _refresh_tasks(self, conn: sqlite3.Connection):
+        # Count, max id and a checksum of completed ids detect inserts, deletes and status changes
+        token = tuple(conn.execute('''
+            SELECT COUNT(*), COALESCE(MAX(id), 0),
+                   COALESCE(SUM(CASE WHEN status = 'completed' THEN id ELSE 0 END), 0)
+            FROM action_items
+        ''').fetchone())
+        if token == self._task_token:
+            return
+
+        previous = self._task_token
+        after_id = 0
+        if previous and token[0] > previous[0] and token[2] == previous[2]:
+            after_id = previous[1]  # only new tasks: append them
+
+        new = pd.read_sql_query('''
+            SELECT a.id, a.email_id, a.status, a.due_at, a.created_at,
+                   e.timestamp AS email_timestamp, e.sender
+            FROM action_items a
+            JOIN emails e ON a.email_id = e.id
+            WHERE a.id > ?
+        ''', conn, params=(after_id,), index_col="id")
+        for column in ("due_at", "created_at", "email_timestamp"):
+            new[column] = _to_datetime(new[column])
+
+        self.tasks = pd.concat([self.tasks, new]) if after_id and not self.tasks.empty else new
+        self._task_token = token
+
+    # ==================== Persistence ====================
+
+    def _snapshot_path(self, name: str) -> str:
+        key = hashlib.sha1(os.path.abspath(self.db.db_path).encode("utf-8")).hexdigest()[:12]
+        return os.path.join(self.snapshot_dir, f"{key}.{name}")
+
+    def _save_snapshot(self):
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            self.emails.to_parquet(self._snapshot_path("emails.parquet"))
+            with open(self._snapshot_path("meta.json"), "w") as f:
+                json.dump({"db_path": os.path.abspath(self.db.db_path), "last_id": self._last_id,
+                           "last_processed_at": self._last_processed_at, "generation": self._generation}, f)
+            self._persisted_at = time.monotonic()
+        except Exception as e:
+            print(f"Error saving analytics snapshot: {e}")
+
+    def _load_snapshot(self):
+        try:
+            with open(self._snapshot_path("meta.json")) as f:
+                meta = json.load(f)
+            emails = pd.read_parquet(self._snapshot_path("emails.parquet"))
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            print(f"Error loading analytics snapshot: {e}")
+            return
+        # Tasks are far fewer than emails and are simply reloaded on the first refresh
+        self.emails = emails
+        self._last_id = meta["last_id"]
+        self._last_processed_at = meta["last_processed_at"]
+        self._generation = meta.get("generation")
+
+    # ==================== Aggregates ====================
+
+    def _cached(self, key: tuple, compute: Callable):
+        """Refresh if needed, then compute once per snapshot version."""
+        with self._lock:
+            self.refresh()
+            if len(self._cache) > 64:
+                self._cache.clear()  # keys include the current minute; don't grow forever
+            if key not in self._cache:
+                self._cache[key] = compute()
+            return self._cache[key]
+
+    def category_counts(self) -> pd.Series:
+        """Email count per category, largest first."""
+        return self._cached(("category_counts",), lambda: self.emails["category"].value_counts())
+
+    def overview(self, now: Optional[datetime] = None) -> Dict:
+        """Headline numbers: emails, processed, pending and overdue tasks."""
+        now = pd.Timestamp(now or datetime.now()).floor("min")
+
+        def compute():
+            pending = self.tasks[self.tasks["status"] == "pending"]
+            return {
+                "emails": len(self.emails),
+                "processed": int(self.emails["processed"].sum()),
+                "senders": int(self.emails["sender"].nunique()),
+                "pending_tasks": len(pending),
+                "overdue_tasks": int((pending["due_at"] < now).sum()),
+            }
+
+        return self._cached(("overview", now), compute)
+
+    def category_trend(self, freq: str = "W", since: Optional[datetime] = None) -> pd.DataFrame:
+        """Emails per category per period (``freq`` is a pandas offset alias: D, W, MS)."""
+        def compute():
+            emails = self.emails
+            if since is not None:
+                emails = emails[emails["timestamp"] >= pd.Timestamp(since)]
+            return (emails.groupby([pd.Grouper(key="timestamp", freq=freq), "category"])
+                    .size()
+                    .unstack(fill_value=0))
+
+        return self._cached(("category_trend", freq, since), compute)
+
+    def sender_volume(self, top: int = 20) -> pd.DataFrame:
+        """Busiest senders with their email count, actionable share and latest email."""
+        def compute():
+            emails = self.emails
+            by_sender = emails.groupby("sender")
+            volume = pd.DataFrame({
+                "emails": by_sender.size(),
+                "actionable": emails["category"].isin(["To-Do", "Important", "Meeting Request"])
+                                                .groupby(emails["sender"]).sum(),
+                "last_email": by_sender["timestamp"].max(),
+            })
+            return volume.nlargest(top, "emails")
+
+        return self._cached(("sender_volume", top), compute)
+
+    def task_backlog(self, now: Optional[datetime] = None) -> pd.DataFrame:
+        """Pending tasks bucketed by age (since their email arrived), with overdue counts."""
+        now = pd.Timestamp(now or datetime.now()).floor("min")
+
+        def compute():
+            pending = self.tasks[self.tasks["status"] == "pending"]
+            age_days = (now - pending["email_timestamp"]).dt.total_seconds() / 86400
+            buckets = pd.cut(age_days, BACKLOG_BUCKETS, labels=BACKLOG_LABELS)
+            return pd.DataFrame({
+                "pending": buckets.value_counts(sort=False),
+                "overdue": (pending["due_at"] < now).groupby(buckets, observed=False).sum(),
+            }).rename_axis("age")
+
+        return self._cached(("task_backlog", now), compute)
+
+    def processing_latency(self) -> Dict[str, float]:
+        """Hours from an email's timestamp to its processing: p50, p90, p99 and count."""
+        def compute():
+            processed = self.emails.dropna(subset=["processed_at"])
+            hours = ((processed["processed_at"] - processed["timestamp"]).dt.total_seconds() / 3600).clip(lower=0)
+            if hours.empty:
+                return {"count": 0, "p50": 0.0, "p90": 0.0, "p99": 0.0}
+            quantiles = hours.quantile([0.5, 0.9, 0.99])
+            return {"count": int(hours.count()), "p50": float(quantiles[0.5]),
+                    "p90": float(quantiles[0.9]), "p99": float(quantiles[0.99])}
+
+        return self._cached(("processing_latency",), compute)
+
+
+_analytics: Dict[str, InboxAnalytics] = {}
+_analytics_lock = threading.Lock()
+
+
+def get_analytics(db) -> InboxAnalytics:
+    """Get the shared analytics snapshot for a database (one per file per process)."""
+    key = os.path.abspath(db.db_path)
+    with _analytics_lock:
+        if key not in _analytics:
+            _analytics[key] = InboxAnalytics(db)
+        return _analytics[key]
@@ -0,0 +1,109 @@
+"""
+Cold storage for old email bodies.
+Bodies older than a configurable age move from the ``emails`` table into a
+compressed blob table, keeping hot rows and pages small. Compressed values are
+self-describing (a one-byte codec tag), so readers decompress transparently.
+A background job archives and compacts the database periodically.
+"""
+
+import os
+import threading
+import time
+import zlib
+from typing import Dict, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bodies of emails older than this many days are archived
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+CODEC = os.getenv("ARCHIVE_CODEC", "zstd" if zstandard else "zlib")
+
+_TAGS = {"zlib": b"Z", "zstd": b"S"}
+
+
+def compress_body(body: str, codec: Optional[str] = None) -> bytes:
+    """Compress a body, prefixed with the tag of the codec used."""
+    codec = codec or CODEC
+    data = (body or '').encode('utf-8')
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("ARCHIVE_CODEC=zstd needs the 'zstandard' package")
+        return _TAGS["zstd"] + zstandard.ZstdCompressor(level=9).compress(data)
+    if codec == "zlib":
+        return _TAGS["zlib"] + zlib.compress(data, 9)
+    raise ValueError(f"Unknown archive codec: {codec}")
+
+
+def decompress_body(value):
+    """Decompress an archived body. Plain text is returned unchanged."""
+    if not isinstance(value, bytes):
+        return value
+    tag, data = value[:1], value[1:]
+    if tag == _TAGS["zlib"]:
+        return zlib.decompress(data).decode('utf-8')
+    if tag == _TAGS["zstd"]:
+        if zstandard is None:
+            raise RuntimeError("This body was archived with zstd; install the 'zstandard' package")
+        return zstandard.ZstdDecompressor().decompress(data).decode('utf-8')
+    raise ValueError("Unknown archive codec tag")
+
+
+class ArchiveJob:
+    """Periodically archives old bodies and compacts the database in a background thread."""
+
+    def __init__(self, db, older_than_days: int = ARCHIVE_AFTER_DAYS,
+                 interval_seconds: float = 6 * 3600, vacuum: bool = True):
+        self.db = db
+        self.older_than_days = older_than_days
+        self.interval_seconds = interval_seconds
+        self.vacuum = vacuum
+        self.last_run: Optional[Dict] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> Dict:
+        """Archive old bodies, then VACUUM if anything moved."""
+        started = time.monotonic()
+        archived = self.db.archive_old_emails(self.older_than_days)
+        result = {"archived": archived}
+        if archived and self.vacuum:
+            result.update(self.db.compact())
+        result["elapsed"] = round(time.monotonic() - started, 3)
+        self.last_run = result
+        return result
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Archive job failed: {e}")
+            self._stop.wait(self.interval_seconds)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="archive-job", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+
+_job: Optional[ArchiveJob] = None
+_job_lock = threading.Lock()
+
+
+def start_background_archiver(db, **kwargs) -> ArchiveJob:
+    """Start the process-wide archive job once; later calls return the running job."""
+    global _job
+    with _job_lock:
+        if _job is None:
+            _job = ArchiveJob(db, **kwargs).start()
+        return _job
@@ -0,0 +1,16 @@
+"""
+Sender normalization for the contacts index.
+"Jane Doe <Jane.Doe@Example.com>" and "jane.doe@example.com" are the same
+contact: the display name is split off and the address lowercased.
+"""
+
+from email.utils import parseaddr
+from typing import Tuple
+
+
+def normalize_address(sender: str) -> Tuple[str, str, str]:
+    """Split a sender into (normalized address, domain, display name)."""
+    name, address = parseaddr(sender or '')
+    address = (address or sender or '').strip().lower()
+    domain = address.rsplit('@', 1)[1] if '@' in address else ''
+    return address, domain, name.strip()
@@ -4,24 +4,73 @@ Handles SQLite database setup and CRUD operations for emails, prompts, drafts, a
 """
 
 import sqlite3
+import hashlib
 import json
 import os
-from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+import threading
+from datetime import datetime, timedelta
+from typing import List, Dict, Iterator, Optional, Tuple
+from backend import metrics
+from backend import dedup
+from backend.threads import normalize_subject, is_reply, clean_message_id, THREAD_WINDOW_DAYS
+from backend.deadlines import parse_deadline, TIMESTAMP_FORMAT
+from backend.contacts import normalize_address
+from backend.records import EmailRecord, ThreadRecord, TaskRecord, DraftRecord, ContactRecord
+from backend.archive import compress_body, decompress_body, ARCHIVE_AFTER_DAYS
+
+# Email body column: archived bodies come from the compressed archive table and
+# are decompressed by EmailRecord when first read
+BODY_COLUMN = ("CASE WHEN archived = 1 THEN (SELECT a.body FROM email_archive a WHERE a.email_id = emails.id) "
+               "ELSE body END AS body")
+
+# Searchable body text, decompressing archived bodies inside SQLite
+BODY_TEXT = ("CASE WHEN archived = 1 THEN unarchive((SELECT a.body FROM email_archive a WHERE a.email_id = emails.id)) "
+             "ELSE body END")
+
+
+def prompt_hash(content: str) -> str:
+    """Short fingerprint of a prompt, stored with drafts generated from it."""
+    return hashlib.sha256((content or '').encode('utf-8')).hexdigest()[:16]
+
+
+class _ReusableConnection(sqlite3.Connection):
+    """Connection kept open for its thread; close() is a no-op so methods can reuse it."""
+    
+    def close(self):
+        pass
 
 
 class Database:
     """Database manager for Email Productivity Agent."""
     
-    def __init__(self, db_path: str = "data/email_agent.db"):
-        """Initialize database connection."""
+    def __init__(self, db_path: str = "data/email_agent.db", reuse_connections: bool = False):
+        """Initialize database connection.
+        
+        With ``reuse_connections``, each thread keeps one open connection instead
+        of connecting on every call (for long-running servers).
+        """
         self.db_path = db_path
+        self.reuse_connections = reuse_connections
+        self._local = threading.local()
         self.init_database()
     
     def get_connection(self) -> sqlite3.Connection:
         """Get database connection."""
-        conn = sqlite3.connect(self.db_path)
+        if not self.reuse_connections:
+            return self._connect(sqlite3.Connection)
+        
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect(_ReusableConnection)
+        elif conn.in_transaction:
+            # A call that failed before committing left its transaction open
+            conn.rollback()
+        return conn
+    
+    def _connect(self, factory) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, factory=factory)
         conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+        conn.create_function("unarchive", 1, decompress_body, deterministic=True)
         return conn
     
     def init_database(self):
@@ -80,9 +129,147 @@ class Database:
             )
         ''')
         
+        # Conversation threads
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS threads (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                normalized_subject TEXT NOT NULL,
+                message_count INTEGER DEFAULT 0,
+                last_timestamp TEXT,
+                summary TEXT,
+                summarized_email_id INTEGER,
+                summarized_timestamp TEXT
+            )
+        ''')
+        
+        # SimHash band index for near-duplicate lookups
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS simhash_bands (
+                band INTEGER NOT NULL,
+                value INTEGER NOT NULL,
+                email_id INTEGER NOT NULL,
+                PRIMARY KEY (band, value, email_id)
+            ) WITHOUT ROWID
+        ''')
+        
+        # One row per normalized sender address, with incrementally maintained aggregates
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS contacts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                address TEXT UNIQUE NOT NULL,
+                domain TEXT NOT NULL,
+                display_name TEXT,
+                message_count INTEGER DEFAULT 0,
+                first_seen TEXT,
+                last_seen TEXT,
+                dominant_category TEXT
+            )
+        ''')
+        
+        # Per-contact email counts by category (source of dominant_category)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS contact_categories (
+                contact_id INTEGER NOT NULL,
+                category TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (contact_id, category)
+            ) WITHOUT ROWID
+        ''')
+        
+        # Compressed bodies of archived emails
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS email_archive (
+                email_id INTEGER PRIMARY KEY,
+                body BLOB NOT NULL,
+                archived_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        # Database-wide counters, e.g. the inbox generation bumped on every reload
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            ) WITHOUT ROWID
+        ''')
+        
+        # Columns added after the original schema
+        self._add_missing_columns(cursor, 'emails', {
+            'archived': 'INTEGER DEFAULT 0',
+            'processed_at': 'TEXT',
+            'message_id': 'TEXT',
+            'in_reply_to': 'TEXT',
+            'thread_id': 'INTEGER',
+            'simhash': 'INTEGER',
+            'contact_id': 'INTEGER',
+        })
+        
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_message_id ON emails (message_id)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_thread ON emails (thread_id, timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_threads_subject ON threads (normalized_subject, last_timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_category ON emails (category, timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_processed ON emails (processed)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_timestamp ON emails (timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_processed_at ON emails (processed_at)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_emails_contact ON emails (contact_id, timestamp)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_contacts_count ON contacts (message_count)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_contacts_domain ON contacts (domain, message_count)')
+        
+        # Speculative drafts are pre-generated in the background and hidden until used
+        self._add_missing_columns(cursor, 'drafts', {
+            'speculative': 'INTEGER DEFAULT 0',
+            'prompt_hash': 'TEXT',
+        })
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_drafts_email ON drafts (email_id, speculative)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_drafts_listing ON drafts (speculative, created_at)')
+        
+        added = self._add_missing_columns(cursor, 'action_items', {'due_at': 'TEXT'})
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_action_items_due ON action_items (status, due_at)')
+        if added:
+            # Normalize deadlines of tasks saved before due dates existed
+            cursor.execute('''
+                SELECT a.id, a.deadline, e.timestamp
+                FROM action_items a
+                JOIN emails e ON a.email_id = e.id
+            ''')
+            updates = [(parse_deadline(row['deadline'], row['timestamp']), row['id'])
+                       for row in cursor.fetchall()]
+            cursor.executemany('UPDATE action_items SET due_at = ? WHERE id = ?',
+                               [update for update in updates if update[0]])
+        
+        # Thread emails stored before threading existed
+        cursor.execute('''
+            SELECT id, subject, timestamp, in_reply_to
+            FROM emails
+            WHERE thread_id IS NULL
+            ORDER BY timestamp
+        ''')
+        for row in cursor.fetchall():
+            self._assign_thread(cursor, row['id'], row['subject'], row['timestamp'],
+                                row['in_reply_to'])
+        
+        # Fingerprint emails stored before near-duplicate detection existed
+        cursor.execute('SELECT id, body FROM emails WHERE simhash IS NULL')
+        for row in cursor.fetchall():
+            self._index_simhash(cursor, row['id'], row['body'])
+        
+        # Link emails stored before the contacts index existed
+        self._link_contacts(cursor)
+        
         conn.commit()
         conn.close()
     
+    def _add_missing_columns(self, cursor: sqlite3.Cursor, table: str, columns: Dict[str, str]) -> List[str]:
+        """Add columns that are missing from an existing table, returning the added names."""
+        cursor.execute(f'PRAGMA table_info({table})')
+        existing = {row['name'] for row in cursor.fetchall()}
+        added = []
+        for name, definition in columns.items():
+            if name not in existing:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN {name} {definition}')
+                added.append(name)
+        return added
+    
     # ==================== Email Operations ====================
     
     def load_emails_from_json(self, json_path: str = "data/mock_inbox.json") -> int:
@@ -99,21 +286,23 @@ class Database:
         # Clear existing emails (for fresh start)
         cursor.execute("DELETE FROM emails")
         cursor.execute("DELETE FROM action_items")
+        cursor.execute("DELETE FROM threads")
+        cursor.execute("DELETE FROM simhash_bands")
+        cursor.execute("DELETE FROM email_archive")
+        cursor.execute("DELETE FROM contacts")
+        cursor.execute("DELETE FROM contact_categories")
+        # Pre-generated drafts were written for the old emails, which reloaded ids may not match
+        cursor.execute("DELETE FROM drafts WHERE speculative = 1")
+        # Reloaded emails can reuse ids with different contents; caches keyed by id check this
+        cursor.execute('''
+            INSERT INTO meta (key, value) VALUES ('inbox_generation', 1)
+            ON CONFLICT(key) DO UPDATE SET value = value + 1
+        ''')
         
         # Insert emails
         for email in emails:
-            cursor.execute('''
-                INSERT INTO emails (id, sender, subject, body, timestamp, category, processed)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                email['id'],
-                email['sender'],
-                email['subject'],
-                email['body'],
-                email['timestamp'],
-                email.get('category'),
-                0
-            ))
+            self._insert_email(cursor, email)
+        self._link_contacts(cursor)
         
         conn.commit()
         count = len(emails)
@@ -121,43 +310,312 @@ class Database:
         
         return count
     
-    def get_all_emails(self) -> List[Dict]:
-        """Get all emails from database."""
+    def get_inbox_generation(self) -> int:
+        """Number of times the inbox has been cleared and reloaded."""
+        conn = self.get_connection()
+        row = conn.execute("SELECT value FROM meta WHERE key = 'inbox_generation'").fetchone()
+        conn.close()
+        return row['value'] if row else 0
+    
+    def insert_emails(self, emails: List[Dict]) -> int:
+        """Insert emails without clearing the inbox. Existing IDs are skipped."""
         conn = self.get_connection()
         cursor = conn.cursor()
+        
+        inserted = 0
+        for email in emails:
+            inserted += self._insert_email(cursor, email, ignore_existing=True)
+        self._link_contacts(cursor)
+        
+        conn.commit()
+        conn.close()
+        
+        return inserted
+    
+    def _insert_email(self, cursor: sqlite3.Cursor, email: Dict, ignore_existing: bool = False) -> int:
+        """Insert one email and attach it to a thread. Returns 1 if inserted."""
+        verb = 'INSERT OR IGNORE' if ignore_existing else 'INSERT'
+        message_id = clean_message_id(email.get('message_id'))
+        in_reply_to = clean_message_id(email.get('in_reply_to'))
+        cursor.execute(f'''
+            {verb} INTO emails (id, sender, subject, body, timestamp, category, processed,
+                                message_id, in_reply_to)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            email.get('id'),
+            email['sender'],
+            email['subject'],
+            email['body'],
+            email['timestamp'],
+            email.get('category'),
+            1 if email.get('processed') else 0,
+            message_id,
+            in_reply_to
+        ))
+        if not cursor.rowcount:
+            return 0
+        
+        email_id = cursor.lastrowid
+        self._assign_thread(cursor, email_id, email['subject'], email['timestamp'], in_reply_to)
+        self._index_simhash(cursor, email_id, email['body'])
+        return 1
+    
+    def _link_contacts(self, cursor: sqlite3.Cursor):
+        """Attach emails without a contact to their sender's contact, updating its aggregates.
+        
+        Set-based, so a bulk insert updates each contact once rather than once per email.
+        """
+        cursor.execute('SELECT DISTINCT sender FROM emails WHERE contact_id IS NULL')
+        senders = [row['sender'] for row in cursor.fetchall()]
+        if not senders:
+            return
+        
+        cursor.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS sender_map (
+                sender TEXT PRIMARY KEY,
+                address TEXT NOT NULL,
+                domain TEXT NOT NULL,
+                display_name TEXT
+            )
+        ''')
+        cursor.execute('DELETE FROM sender_map')
+        cursor.executemany('INSERT INTO sender_map (sender, address, domain, display_name) VALUES (?, ?, ?, ?)',
+                           [(sender,) + normalize_address(sender) for sender in senders])
+        
         cursor.execute('''
-            SELECT id, sender, subject, body, timestamp, category, processed, summary
+            INSERT INTO contacts (address, domain, display_name, message_count, first_seen, last_seen)
+            SELECT m.address, m.domain, MAX(NULLIF(m.display_name, '')), COUNT(*),
+                   MIN(e.timestamp), MAX(e.timestamp)
+            FROM emails e
+            JOIN sender_map m ON m.sender = e.sender
+            WHERE e.contact_id IS NULL
+            GROUP BY m.address
+            ON CONFLICT(address) DO UPDATE SET
+                message_count = message_count + excluded.message_count,
+                first_seen = MIN(first_seen, excluded.first_seen),
+                last_seen = MAX(last_seen, excluded.last_seen),
+                display_name = COALESCE(excluded.display_name, display_name)
+        ''')
+        cursor.execute('''
+            INSERT INTO contact_categories (contact_id, category, count)
+            SELECT c.id, e.category, COUNT(*)
+            FROM emails e
+            JOIN sender_map m ON m.sender = e.sender
+            JOIN contacts c ON c.address = m.address
+            WHERE e.contact_id IS NULL AND e.category IS NOT NULL
+            GROUP BY c.id, e.category
+            ON CONFLICT(contact_id, category) DO UPDATE SET count = count + excluded.count
+        ''')
+        cursor.execute('''
+            UPDATE emails
+            SET contact_id = (SELECT c.id FROM sender_map m JOIN contacts c ON c.address = m.address
+                              WHERE m.sender = emails.sender)
+            WHERE contact_id IS NULL
+        ''')
+        cursor.execute('''
+            UPDATE contacts
+            SET dominant_category = (SELECT category FROM contact_categories cc
+                                     WHERE cc.contact_id = contacts.id
+                                     ORDER BY count DESC, category LIMIT 1)
+            WHERE address IN (SELECT address FROM sender_map)
+        ''')
+    
+    def _count_contact_category(self, cursor: sqlite3.Cursor, contact_id: int,
+                                old_category: Optional[str], new_category: Optional[str]):
+        """Move one email of a contact from one category count to another."""
+        if old_category == new_category:
+            return
+        if old_category:
+            cursor.execute('UPDATE contact_categories SET count = count - 1 WHERE contact_id = ? AND category = ?',
+                           (contact_id, old_category))
+            cursor.execute('DELETE FROM contact_categories WHERE contact_id = ? AND count <= 0', (contact_id,))
+        if new_category:
+            cursor.execute('''
+                INSERT INTO contact_categories (contact_id, category, count) VALUES (?, ?, 1)
+                ON CONFLICT(contact_id, category) DO UPDATE SET count = count + 1
+            ''', (contact_id, new_category))
+        cursor.execute('''
+            UPDATE contacts
+            SET dominant_category = (SELECT category FROM contact_categories
+                                     WHERE contact_id = ?
+                                     ORDER BY count DESC, category LIMIT 1)
+            WHERE id = ?
+        ''', (contact_id, contact_id))
+    
+    def _index_simhash(self, cursor: sqlite3.Cursor, email_id: int, body: str):
+        """Store an email's SimHash fingerprint and its band index entries.
+        
+        Bodies too short to fingerprint are stored as 0 and left out of the band index.
+        """
+        fingerprint = dedup.simhash(body)
+        cursor.execute('UPDATE emails SET simhash = ? WHERE id = ?', (dedup.to_signed(fingerprint), email_id))
+        if not fingerprint:
+            return
+        cursor.executemany(
+            'INSERT OR IGNORE INTO simhash_bands (band, value, email_id) VALUES (?, ?, ?)',
+            [(band, value, email_id) for band, value in enumerate(dedup.bands(fingerprint))]
+        )
+    
+    def _assign_thread(self, cursor: sqlite3.Cursor, email_id: int, subject: str,
+                       timestamp: str, in_reply_to: Optional[str]):
+        """Attach an email to its thread, creating the thread if needed.
+        
+        In-Reply-To is matched against stored Message-IDs first. Otherwise a
+        "Re:"/"Fwd:" subject joins the latest recently active thread with the
+        same normalized subject.
+        """
+        thread_id = None
+        if in_reply_to:
+            cursor.execute('''
+                SELECT thread_id FROM emails
+                WHERE message_id = ? AND thread_id IS NOT NULL
+                LIMIT 1
+            ''', (in_reply_to,))
+            row = cursor.fetchone()
+            if row:
+                thread_id = row['thread_id']
+        
+        normalized = normalize_subject(subject)
+        if thread_id is None and normalized and is_reply(subject):
+            try:
+                since = datetime.fromisoformat(timestamp[:19]) - timedelta(days=THREAD_WINDOW_DAYS)
+                since = since.strftime('%Y-%m-%dT%H:%M:%S')
+            except ValueError:
+                since = ''
+            cursor.execute('''
+                SELECT id FROM threads
+                WHERE normalized_subject = ? AND last_timestamp >= ?
+                ORDER BY last_timestamp DESC
+                LIMIT 1
+            ''', (normalized, since))
+            row = cursor.fetchone()
+            if row:
+                thread_id = row['id']
+        
+        if thread_id is None:
+            cursor.execute('''
+                INSERT INTO threads (normalized_subject, message_count, last_timestamp)
+                VALUES (?, 0, ?)
+            ''', (normalized, timestamp))
+            thread_id = cursor.lastrowid
+        
+        cursor.execute('''
+            UPDATE threads
+            SET message_count = message_count + 1,
+                last_timestamp = MAX(COALESCE(last_timestamp, ''), ?)
+            WHERE id = ?
+        ''', (timestamp, thread_id))
+        cursor.execute('UPDATE emails SET thread_id = ? WHERE id = ?', (thread_id, email_id))
+    
+    def get_all_emails(self) -> List[EmailRecord]:
+        """Get all emails from database."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT id, sender, subject, {BODY_COLUMN}, timestamp, category, processed, summary, thread_id
             FROM emails
             ORDER BY timestamp DESC
         ''')
         rows = cursor.fetchall()
         conn.close()
         
-        return [dict(row) for row in rows]
+        return [EmailRecord(row) for row in rows]
     
-    def get_email_by_id(self, email_id: int) -> Optional[Dict]:
-        """Get a specific email by ID."""
+    def iter_unprocessed_emails(self, chunk_size: int = 500, limit: Optional[int] = None) -> Iterator[EmailRecord]:
+        """Yield unprocessed emails in id order, fetching ``chunk_size`` rows per query.
+        
+        Pages by id rather than OFFSET, so each chunk is an indexed range scan and
+        emails marked processed meanwhile don't shift later pages. Only the columns
+        processing needs are read, and no connection is held between chunks.
+        """
+        last_id = 0
+        remaining = limit
+        while remaining is None or remaining > 0:
+            size = chunk_size if remaining is None else min(chunk_size, remaining)
+            with metrics.timer("db_call_seconds", method="iter_unprocessed_emails"):
+                conn = self.get_connection()
+                cursor = conn.cursor()
+                cursor.execute(f'''
+                    SELECT id, sender, subject, {BODY_COLUMN}, timestamp, category, summary, thread_id
+                    FROM emails
+                    WHERE processed = 0 AND id > ?
+                    ORDER BY id
+                    LIMIT ?
+                ''', (last_id, size))
+                rows = cursor.fetchall()
+                conn.close()
+            
+            for row in rows:
+                yield EmailRecord(row)
+            if len(rows) < size:
+                return
+            last_id = rows[-1]['id']
+            if remaining is not None:
+                remaining -= len(rows)
+    
+    def get_unprocessed_summary(self) -> Dict:
+        """Count unprocessed emails and get the newest one's timestamp."""
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT id, sender, subject, body, timestamp, category, processed, summary
+            SELECT COUNT(*) AS count, MAX(timestamp) AS newest
+            FROM emails
+            WHERE processed = 0
+        ''')
+        row = cursor.fetchone()
+        conn.close()
+        return {'count': row['count'], 'newest': row['newest']}
+    
+    def get_email_by_id(self, email_id: int) -> Optional[EmailRecord]:
+        """Get a specific email by ID."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT id, sender, subject, {BODY_COLUMN}, timestamp, category, processed, summary, thread_id
             FROM emails
             WHERE id = ?
         ''', (email_id,))
         row = cursor.fetchone()
         conn.close()
         
-        return dict(row) if row else None
+        return EmailRecord(row) if row else None
+    
+    def get_emails_by_ids(self, email_ids: List[int]) -> List[EmailRecord]:
+        """Get several emails in one query, in the order of ``email_ids``. Missing IDs are skipped."""
+        if not email_ids:
+            return []
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        rows = {}
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(email_ids), 500):
+            chunk = email_ids[start:start + 500]
+            cursor.execute(f'''
+                SELECT id, sender, subject, {BODY_COLUMN}, timestamp, category, processed, summary, thread_id
+                FROM emails
+                WHERE id IN ({', '.join('?' * len(chunk))})
+            ''', chunk)
+            rows.update((row['id'], row) for row in cursor.fetchall())
+        conn.close()
+        
+        return [EmailRecord(rows[i]) for i in email_ids if i in rows]
     
     def update_email_category(self, email_id: int, category: str):
         """Update email category."""
         conn = self.get_connection()
         cursor = conn.cursor()
+        # Take the write lock before reading the old category, so two sessions
+        # recategorizing the same email can't both move it out of that category
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('SELECT category, contact_id FROM emails WHERE id = ?', (email_id,))
+        previous = cursor.fetchone()
         cursor.execute('''
             UPDATE emails
-            SET category = ?, processed = 1
+            SET category = ?, processed = 1, processed_at = CURRENT_TIMESTAMP
             WHERE id = ?
         ''', (category, email_id))
+        if previous and previous['contact_id']:
+            self._count_contact_category(cursor, previous['contact_id'], previous['category'], category)
         conn.commit()
         conn.close()
     
@@ -173,12 +631,12 @@ class Database:
         conn.commit()
         conn.close()
     
-    def get_emails_by_category(self, category: str) -> List[Dict]:
+    def get_emails_by_category(self, category: str) -> List[EmailRecord]:
         """Get all emails in a specific category."""
         conn = self.get_connection()
         cursor = conn.cursor()
-        cursor.execute('''
-            SELECT id, sender, subject, body, timestamp, category, processed, summary
+        cursor.execute(f'''
+            SELECT id, sender, subject, {BODY_COLUMN}, timestamp, category, processed, summary, thread_id
             FROM emails
             WHERE category = ?
             ORDER BY timestamp DESC
@@ -186,22 +644,436 @@ class Database:
         rows = cursor.fetchall()
         conn.close()
         
-        return [dict(row) for row in rows]
+        return [EmailRecord(row) for row in rows]
     
-    def search_emails(self, query: str) -> List[Dict]:
+    def search_emails(self, query: str, limit: Optional[int] = None) -> List[EmailRecord]:
         """Search emails by subject or body."""
         conn = self.get_connection()
         cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT id, sender, subject, {BODY_COLUMN}, timestamp, category, processed, summary, thread_id
+            FROM emails
+            WHERE subject LIKE ? OR {BODY_TEXT} LIKE ?
+            ORDER BY timestamp DESC
+            LIMIT ?
+        ''', (f'%{query}%', f'%{query}%', -1 if limit is None else limit))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [EmailRecord(row) for row in rows]
+
+    def filter_emails(self, query: Optional[str] = None, category: Optional[str] = None,
+                      sender: Optional[str] = None, date_from: Optional[str] = None,
+                      date_to: Optional[str] = None, processed: Optional[bool] = None,
+                      limit: int = 100, offset: int = 0, facet_limit: int = 20) -> Dict:
+        """Filter emails by any combination of predicates, with facet counts.
+        
+        ``query`` matches subject or body, ``sender`` and ``category`` are exact
+        (use 'Uncategorized' for emails without one), and dates compare against
+        the ISO timestamp (``date_to`` is exclusive). Returns the newest matching
+        page under 'emails', the match count under 'total', and per-category and
+        per-sender counts under 'facets'. Each facet ignores its own filter, so it
+        shows what selecting another value would give.
+        
+        The shared predicates are evaluated once into a materialized CTE that the
+        count, both facets and the page are computed from in a single statement.
+        """
+        clauses, params = [], []
+        if query:
+            clauses.append(f'(subject LIKE ? OR {BODY_TEXT} LIKE ?)')
+            params += [f'%{query}%', f'%{query}%']
+        if date_from:
+            clauses.append('timestamp >= ?')
+            params.append(date_from)
+        if date_to:
+            clauses.append('timestamp < ?')
+            params.append(date_to)
+        if processed is not None:
+            clauses.append('processed = ?')
+            params.append(1 if processed else 0)
+        where = ' AND '.join(clauses) or '1'
+        
+        category_match, category_params = '1', ()
+        if category:
+            category_match, category_params = "COALESCE(category, 'Uncategorized') = ?", (category,)
+        sender_match, sender_params = '1', ()
+        if sender:
+            sender_match, sender_params = 'sender = ?', (sender,)
+        
+        materialized = 'MATERIALIZED' if sqlite3.sqlite_version_info >= (3, 35) else ''
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            WITH matched AS {materialized} (
+                SELECT id, sender, category, timestamp
+                FROM emails
+                WHERE {where}
+            )
+            SELECT 'total' AS facet, NULL AS value, COUNT(*) AS count
+            FROM matched
+            WHERE {category_match} AND {sender_match}
+            UNION ALL
+            SELECT 'category', COALESCE(category, 'Uncategorized'), COUNT(*)
+            FROM matched
+            WHERE {sender_match}
+            GROUP BY 2
+            UNION ALL
+            SELECT * FROM (
+                SELECT 'sender', sender, COUNT(*) AS count
+                FROM matched
+                WHERE {category_match}
+                GROUP BY sender
+                ORDER BY count DESC
+                LIMIT ?
+            )
+            UNION ALL
+            SELECT * FROM (
+                SELECT 'page', id, NULL
+                FROM matched
+                WHERE {category_match} AND {sender_match}
+                ORDER BY timestamp DESC
+                LIMIT ? OFFSET ?
+            )
+        ''', tuple(params) + category_params + sender_params + sender_params + category_params
+              + (facet_limit,) + category_params + sender_params + (limit, offset))
+        
+        result = {'emails': [], 'total': 0, 'facets': {'category': {}, 'sender': {}}}
+        page_ids = []
+        for row in cursor.fetchall():
+            if row['facet'] == 'total':
+                result['total'] = row['count']
+            elif row['facet'] == 'page':
+                page_ids.append(row['value'])
+            else:
+                result['facets'][row['facet']][row['value']] = row['count']
+        result['facets']['category'] = dict(sorted(result['facets']['category'].items(),
+                                                   key=lambda item: item[1], reverse=True))
+        
+        if page_ids:
+            placeholders = ', '.join('?' for _ in page_ids)
+            cursor.execute(f'''
+                SELECT id, sender, subject, {BODY_COLUMN}, timestamp, category, processed, summary, thread_id
+                FROM emails
+                WHERE id IN ({placeholders})
+                ORDER BY timestamp DESC
+            ''', page_ids)
+            result['emails'] = [EmailRecord(row) for row in cursor.fetchall()]
+        conn.close()
+        
+        return result
+    
+    def get_stale_emails(self, prompt_type: str = "categorization") -> List[EmailRecord]:
+        """Get processed emails that predate the last change to a prompt.
+        
+        Rows carry listing columns only (no body); processing fetches each email in full.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, sender, subject, timestamp, category, processed_at
+            FROM emails
+            WHERE processed = 1
+              AND (processed_at IS NULL
+                   OR processed_at < (SELECT updated_at FROM prompts WHERE prompt_type = ?))
+            ORDER BY timestamp DESC
+        ''', (prompt_type,))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [EmailRecord(row) for row in rows]
+    
+    def get_email_stats(self) -> Dict:
+        """Get email, task and draft counts using SQL aggregates."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute('SELECT COUNT(*) AS total, COALESCE(SUM(processed), 0) AS processed FROM emails')
+        row = cursor.fetchone()
+        stats = {'total': row['total'], 'processed': row['processed']}
+        
         cursor.execute('''
-            SELECT id, sender, subject, body, timestamp, category, processed, summary
+            SELECT COALESCE(category, 'Uncategorized') AS category, COUNT(*) AS count
             FROM emails
-            WHERE subject LIKE ? OR body LIKE ?
+            GROUP BY category
+            ORDER BY count DESC
+        ''')
+        stats['by_category'] = {row['category']: row['count'] for row in cursor.fetchall()}
+        
+        cursor.execute('SELECT status, COUNT(*) AS count FROM action_items GROUP BY status')
+        stats['tasks'] = {row['status']: row['count'] for row in cursor.fetchall()}
+        
+        cursor.execute('SELECT COUNT(*) AS count FROM drafts WHERE speculative = 0')
+        stats['drafts'] = cursor.fetchone()['count']
+        
+        conn.close()
+        return stats
+    
+    def get_urgent_emails(self, categories: Tuple[str, ...] = ("Important", "To-Do"),
+                          limit: Optional[int] = None) -> List[EmailRecord]:
+        """Get emails in the given categories, newest first."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        placeholders = ', '.join('?' for _ in categories)
+        cursor.execute(f'''
+            SELECT id, sender, subject, {BODY_COLUMN}, timestamp, category, processed, summary, thread_id
+            FROM emails
+            WHERE category IN ({placeholders})
             ORDER BY timestamp DESC
-        ''', (f'%{query}%', f'%{query}%'))
+            LIMIT ?
+        ''', tuple(categories) + (-1 if limit is None else limit,))
         rows = cursor.fetchall()
         conn.close()
         
-        return [dict(row) for row in rows]
+        return [EmailRecord(row) for row in rows]
+    
+    def get_priority_senders(self, categories: Tuple[str, ...] = ("Important", "To-Do")) -> List[str]:
+        """Get normalized addresses of contacts who have previously sent mail in the given categories."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        placeholders = ', '.join('?' for _ in categories)
+        cursor.execute(f'''
+            SELECT DISTINCT c.address
+            FROM contact_categories cc
+            JOIN contacts c ON c.id = cc.contact_id
+            WHERE cc.category IN ({placeholders})
+        ''', tuple(categories))
+        rows = cursor.fetchall()
+        conn.close()
+
+        return [row['address'] for row in rows]
+
+    def find_near_duplicate(self, email_id: int, threshold: int = dedup.THRESHOLD) -> Optional[Dict]:
+        """Find the closest already-processed email with a near-identical body.
+        
+        Matches must also come from the same contact or share the normalized
+        subject, so generic bodies from unrelated senders are never reused.
+        Returns the match with a ``distance`` key (differing SimHash bits), or None.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT simhash, subject, contact_id FROM emails WHERE id = ?', (email_id,))
+        row = cursor.fetchone()
+        if not row or not row['simhash']:
+            conn.close()
+            return None
+        
+        fingerprint = dedup.to_unsigned(row['simhash'])
+        band_filter = ' OR '.join('(b.band = ? AND b.value = ?)' for _ in range(dedup.NUM_BANDS))
+        params = [v for pair in enumerate(dedup.bands(fingerprint)) for v in pair]
+        cursor.execute(f'''
+            SELECT DISTINCT e.id, e.simhash, e.category, e.summary, e.subject, e.contact_id
+            FROM simhash_bands b
+            JOIN emails e ON e.id = b.email_id
+            WHERE ({band_filter})
+              AND e.id != ? AND e.processed = 1 AND e.category IS NOT NULL AND e.simhash != 0
+            LIMIT 200
+        ''', (*params, email_id))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        subject = normalize_subject(row['subject'])
+        best = None
+        for candidate in rows:
+            same_contact = row['contact_id'] is not None and candidate['contact_id'] == row['contact_id']
+            if not same_contact and not (subject and normalize_subject(candidate['subject']) == subject):
+                continue
+            distance = dedup.hamming(fingerprint, dedup.to_unsigned(candidate['simhash']))
+            if distance <= threshold and (best is None or distance < best['distance']):
+                best = {'id': candidate['id'], 'category': candidate['category'],
+                        'summary': candidate['summary'], 'distance': distance}
+        return best
+    
+    # ==================== Contact Operations ====================
+    
+    def get_contact(self, sender: str) -> Optional[ContactRecord]:
+        """Get a contact by address (any form, e.g. with a display name)."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, address, domain, display_name, message_count, first_seen, last_seen, dominant_category
+            FROM contacts
+            WHERE address = ?
+        ''', (normalize_address(sender)[0],))
+        row = cursor.fetchone()
+        conn.close()
+        
+        return ContactRecord(row) if row else None
+    
+    def get_top_senders(self, limit: int = 20, offset: int = 0, domain: Optional[str] = None,
+                        category: Optional[str] = None) -> List[ContactRecord]:
+        """Get contacts by message count, optionally for one domain or dominant category."""
+        where, params = [], []
+        if domain:
+            where.append('domain = ?')
+            params.append(domain.lower())
+        if category:
+            where.append('dominant_category = ?')
+            params.append(category)
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT id, address, domain, display_name, message_count, first_seen, last_seen, dominant_category
+            FROM contacts
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            ORDER BY message_count DESC, address
+            LIMIT ? OFFSET ?
+        ''', params + [limit, offset])
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [ContactRecord(row) for row in rows]
+    
+    def get_emails_from_sender(self, sender: str, limit: int = 50, offset: int = 0) -> List[EmailRecord]:
+        """Get a contact's emails, newest first, through the contact index."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT id, sender, subject, {BODY_COLUMN}, timestamp, category, processed, summary, thread_id
+            FROM emails
+            WHERE contact_id = (SELECT id FROM contacts WHERE address = ?)
+            ORDER BY timestamp DESC
+            LIMIT ? OFFSET ?
+        ''', (normalize_address(sender)[0], limit, offset))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [EmailRecord(row) for row in rows]
+    
+    # ==================== Archive Operations ====================
+    
+    def archive_old_emails(self, older_than_days: int = ARCHIVE_AFTER_DAYS, batch_size: int = 500,
+                           codec: Optional[str] = None) -> int:
+        """Move bodies of emails older than ``older_than_days`` into the compressed archive.
+        
+        Works in batches, each its own transaction, so readers and writers are
+        only briefly blocked. Returns the number of emails archived.
+        """
+        cutoff = (datetime.now() - timedelta(days=older_than_days)).strftime(TIMESTAMP_FORMAT)
+        archived = 0
+        while True:
+            conn = self.get_connection()
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, body
+                FROM emails
+                WHERE archived = 0 AND timestamp < ?
+                LIMIT ?
+            ''', (cutoff, batch_size))
+            rows = cursor.fetchall()
+            
+            cursor.executemany(
+                'INSERT OR REPLACE INTO email_archive (email_id, body) VALUES (?, ?)',
+                [(row['id'], compress_body(row['body'], codec)) for row in rows]
+            )
+            cursor.executemany("UPDATE emails SET body = '', archived = 1 WHERE id = ?",
+                               [(row['id'],) for row in rows])
+            conn.commit()
+            conn.close()
+            
+            archived += len(rows)
+            if len(rows) < batch_size:
+                return archived
+    
+    def get_archive_stats(self) -> Dict:
+        """Get archived email count, compressed size and database file size."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) AS count, COALESCE(SUM(LENGTH(body)), 0) AS bytes FROM email_archive')
+        row = cursor.fetchone()
+        conn.close()
+        
+        return {
+            'archived': row['count'],
+            'archived_bytes': row['bytes'],
+            'file_bytes': os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0,
+        }
+    
+    def compact(self) -> Dict:
+        """VACUUM the database to return freed pages, and refresh planner statistics."""
+        before = os.path.getsize(self.db_path)
+        conn = self.get_connection()
+        isolation_level = conn.isolation_level
+        conn.isolation_level = None  # VACUUM can't run inside a transaction
+        try:
+            conn.execute('VACUUM')
+            conn.execute('PRAGMA optimize')
+        finally:
+            conn.isolation_level = isolation_level
+            conn.close()
+        return {'bytes_before': before, 'bytes_after': os.path.getsize(self.db_path)}
+    
+    # ==================== Thread Operations ====================
+    
+    def get_threads(self, limit: int = 100, offset: int = 0) -> List[ThreadRecord]:
+        """Get threads, most recently active first, with their latest message."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT t.id, t.message_count, t.last_timestamp, t.summary,
+                   e.id AS latest_email_id, e.subject, e.sender, e.category
+            FROM threads t
+            JOIN emails e ON e.id = (
+                SELECT id FROM emails
+                WHERE thread_id = t.id
+                ORDER BY timestamp DESC
+                LIMIT 1
+            )
+            ORDER BY t.last_timestamp DESC
+            LIMIT ? OFFSET ?
+        ''', (limit, offset))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [ThreadRecord(row) for row in rows]
+    
+    def get_thread(self, thread_id: int) -> Optional[ThreadRecord]:
+        """Get a thread by ID."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id, normalized_subject, message_count, last_timestamp, summary,
+                   summarized_email_id, summarized_timestamp
+            FROM threads
+            WHERE id = ?
+        ''', (thread_id,))
+        row = cursor.fetchone()
+        conn.close()
+        
+        return ThreadRecord(row) if row else None
+    
+    def get_thread_emails(self, thread_id: int) -> List[EmailRecord]:
+        """Get a thread's emails, oldest first."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT id, sender, subject, {BODY_COLUMN}, timestamp, category, processed, summary, thread_id
+            FROM emails
+            WHERE thread_id = ?
+            ORDER BY timestamp ASC
+        ''', (thread_id,))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [EmailRecord(row) for row in rows]
+    
+    def update_thread_summary(self, thread_id: int, summary: str, email_id: int, timestamp: str) -> bool:
+        """Store a thread summary covering messages up to ``email_id``.
+        
+        Ignored if the thread already has a summary covering a newer message.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE threads
+            SET summary = ?, summarized_email_id = ?, summarized_timestamp = ?
+            WHERE id = ? AND (summarized_timestamp IS NULL OR summarized_timestamp <= ?)
+        ''', (summary, email_id, timestamp, thread_id, timestamp))
+        updated = cursor.rowcount > 0
+        conn.commit()
+        conn.close()
+        
+        return updated
     
     # ==================== Prompt Operations ====================
     
@@ -210,23 +1082,17 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Check if prompt exists
-        cursor.execute('SELECT id FROM prompts WHERE prompt_type = ?', (prompt_type,))
-        exists = cursor.fetchone()
+        cursor.execute('''
+            INSERT INTO prompts (prompt_type, content)
+            VALUES (?, ?)
+            ON CONFLICT(prompt_type) DO UPDATE
+            SET content = excluded.content, updated_at = CURRENT_TIMESTAMP
+        ''', (prompt_type, content))
         
-        if exists:
-            # Update existing
-            cursor.execute('''
-                UPDATE prompts
-                SET content = ?, updated_at = CURRENT_TIMESTAMP
-                WHERE prompt_type = ?
-            ''', (content, prompt_type))
-        else:
-            # Insert new
-            cursor.execute('''
-                INSERT INTO prompts (prompt_type, content)
-                VALUES (?, ?)
-            ''', (prompt_type, content))
+        if prompt_type == 'auto_reply':
+            # Speculative drafts written with an older reply prompt are stale
+            cursor.execute('DELETE FROM drafts WHERE speculative = 1 AND prompt_hash IS NOT ?',
+                           (prompt_hash(content),))
         
         conn.commit()
         conn.close()
@@ -265,17 +1131,21 @@ class Database:
     # ==================== Draft Operations ====================
     
     def save_draft(self, email_id: Optional[int], subject: str, body: str, 
-                   metadata: Optional[Dict] = None) -> int:
-        """Save a draft email."""
+                   metadata: Optional[Dict] = None, speculative: bool = False,
+                   reply_prompt_hash: Optional[str] = None) -> int:
+        """Save a draft email.
+        
+        Speculative drafts are hidden from draft listings until promoted.
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         
         metadata_json = json.dumps(metadata) if metadata else None
         
         cursor.execute('''
-            INSERT INTO drafts (email_id, subject, body, metadata)
-            VALUES (?, ?, ?, ?)
-        ''', (email_id, subject, body, metadata_json))
+            INSERT INTO drafts (email_id, subject, body, metadata, speculative, prompt_hash)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (email_id, subject, body, metadata_json, int(speculative), reply_prompt_hash))
         
         draft_id = cursor.lastrowid
         conn.commit()
@@ -283,7 +1153,7 @@ class Database:
         
         return draft_id
     
-    def get_all_drafts(self) -> List[Dict]:
+    def get_all_drafts(self) -> List[DraftRecord]:
         """Get all drafts."""
         conn = self.get_connection()
         cursor = conn.cursor()
@@ -292,21 +1162,46 @@ class Database:
                    e.subject as original_subject
             FROM drafts d
             LEFT JOIN emails e ON d.email_id = e.id
+            WHERE d.speculative = 0
             ORDER BY d.created_at DESC
         ''')
         rows = cursor.fetchall()
         conn.close()
         
-        drafts = []
-        for row in rows:
-            draft = dict(row)
-            if draft['metadata']:
-                draft['metadata'] = json.loads(draft['metadata'])
-            drafts.append(draft)
+        return [DraftRecord(row) for row in rows]
+    
+    def count_drafts(self) -> int:
+        """Count drafts, not including speculative ones."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) AS count FROM drafts WHERE speculative = 0')
+        count = cursor.fetchone()['count']
+        conn.close()
+        
+        return count
+    
+    def get_draft_page(self, limit: int = 25, offset: int = 0) -> List[DraftRecord]:
+        """Get one page of drafts, newest first, without bodies or metadata.
+        
+        Load a draft's body with ``get_draft_by_id`` when it is opened.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT d.id, d.email_id, d.subject, d.created_at,
+                   e.subject as original_subject
+            FROM drafts d
+            LEFT JOIN emails e ON d.email_id = e.id
+            WHERE d.speculative = 0
+            ORDER BY d.created_at DESC, d.id DESC
+            LIMIT ? OFFSET ?
+        ''', (limit, offset))
+        rows = cursor.fetchall()
+        conn.close()
         
-        return drafts
+        return [DraftRecord(row) for row in rows]
     
-    def get_draft_by_id(self, draft_id: int) -> Optional[Dict]:
+    def get_draft_by_id(self, draft_id: int) -> Optional[DraftRecord]:
         """Get a specific draft by ID."""
         conn = self.get_connection()
         cursor = conn.cursor()
@@ -318,24 +1213,82 @@ class Database:
         row = cursor.fetchone()
         conn.close()
         
-        if row:
-            draft = dict(row)
-            if draft['metadata']:
-                draft['metadata'] = json.loads(draft['metadata'])
-            return draft
-        return None
+        return DraftRecord(row) if row else None
+    
+    def update_draft(self, draft_id: int, subject: Optional[str] = None, body: Optional[str] = None):
+        """Update an existing draft. Fields left as None are not written."""
+        changes = {'subject': subject, 'body': body}
+        self.update_drafts({draft_id: {k: v for k, v in changes.items() if v is not None}})
+    
+    def update_drafts(self, changes: Dict[int, Dict[str, str]]) -> int:
+        """Write changed fields of several drafts in one transaction.
+        
+        ``changes`` maps draft IDs to the fields that changed, e.g.
+        ``{3: {'body': '...'}, 7: {'subject': '...', 'body': '...'}}``.
+        Returns the number of drafts updated.
+        """
+        # Group drafts by which fields changed, so each group is one executemany
+        groups: Dict[Tuple[str, ...], List[tuple]] = {}
+        for draft_id, fields in changes.items():
+            fields = {k: v for k, v in fields.items() if k in ('subject', 'body')}
+            if fields:
+                columns = tuple(sorted(fields))
+                groups.setdefault(columns, []).append(tuple(fields[c] for c in columns) + (draft_id,))
+        if not groups:
+            return 0
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        updated = 0
+        for columns, rows in groups.items():
+            assignments = ', '.join(f'{column} = ?' for column in columns)
+            cursor.executemany(f'UPDATE drafts SET {assignments} WHERE id = ?', rows)
+            updated += cursor.rowcount
+        conn.commit()
+        conn.close()
+        
+        return updated
+    
+    def has_draft(self, email_id: int) -> bool:
+        """Check whether an email already has a draft, speculative or not."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT 1 FROM drafts WHERE email_id = ? LIMIT 1', (email_id,))
+        row = cursor.fetchone()
+        conn.close()
+        
+        return row is not None
+    
+    def get_speculative_draft(self, email_id: int, reply_prompt_hash: str) -> Optional[int]:
+        """Get the ID of a speculative draft for an email written with the given reply prompt."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT id
+            FROM drafts
+            WHERE email_id = ? AND speculative = 1 AND prompt_hash = ?
+            ORDER BY id DESC
+            LIMIT 1
+        ''', (email_id, reply_prompt_hash))
+        row = cursor.fetchone()
+        conn.close()
+        
+        return row['id'] if row else None
     
-    def update_draft(self, draft_id: int, subject: str, body: str):
-        """Update an existing draft."""
+    def promote_draft(self, draft_id: int) -> bool:
+        """Turn a speculative draft into a regular one. Returns False if it was already taken."""
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('''
             UPDATE drafts
-            SET subject = ?, body = ?
-            WHERE id = ?
-        ''', (subject, body, draft_id))
+            SET speculative = 0, created_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND speculative = 1
+        ''', (draft_id,))
+        promoted = cursor.rowcount > 0
         conn.commit()
         conn.close()
+        
+        return promoted
     
     def delete_draft(self, draft_id: int):
         """Delete a draft."""
@@ -347,23 +1300,28 @@ class Database:
     
     # ==================== Action Item Operations ====================
     
-    def save_action_item(self, email_id: int, task: str, deadline: str = "Not specified"):
-        """Save an action item."""
+    def save_action_item(self, email_id: int, task: str, deadline: str = "Not specified",
+                         email_timestamp: Optional[str] = None):
+        """Save an action item, normalizing its deadline relative to the email's timestamp."""
         conn = self.get_connection()
         cursor = conn.cursor()
+        if email_timestamp is None:
+            cursor.execute('SELECT timestamp FROM emails WHERE id = ?', (email_id,))
+            row = cursor.fetchone()
+            email_timestamp = row['timestamp'] if row else None
         cursor.execute('''
-            INSERT INTO action_items (email_id, task, deadline)
-            VALUES (?, ?, ?)
-        ''', (email_id, task, deadline))
+            INSERT INTO action_items (email_id, task, deadline, due_at)
+            VALUES (?, ?, ?, ?)
+        ''', (email_id, task, deadline, parse_deadline(deadline, email_timestamp)))
         conn.commit()
         conn.close()
     
-    def get_action_items_for_email(self, email_id: int) -> List[Dict]:
+    def get_action_items_for_email(self, email_id: int) -> List[TaskRecord]:
         """Get all action items for a specific email."""
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT id, email_id, task, deadline, status, created_at
+            SELECT id, email_id, task, deadline, due_at, status, created_at
             FROM action_items
             WHERE email_id = ?
             ORDER BY created_at DESC
@@ -371,14 +1329,14 @@ class Database:
         rows = cursor.fetchall()
         conn.close()
         
-        return [dict(row) for row in rows]
+        return [TaskRecord(row) for row in rows]
     
-    def get_all_action_items(self) -> List[Dict]:
+    def get_all_action_items(self) -> List[TaskRecord]:
         """Get all action items across all emails."""
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('''
-            SELECT a.id, a.email_id, a.task, a.deadline, a.status, a.created_at,
+            SELECT a.id, a.email_id, a.task, a.deadline, a.due_at, a.status, a.created_at,
                    e.subject as email_subject, e.sender
             FROM action_items a
             JOIN emails e ON a.email_id = e.id
@@ -387,7 +1345,136 @@ class Database:
         rows = cursor.fetchall()
         conn.close()
         
-        return [dict(row) for row in rows]
+        return [TaskRecord(row) for row in rows]
+    
+    def get_task_counts(self) -> Dict[str, int]:
+        """Count action items by status."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT status, COUNT(*) AS count FROM action_items GROUP BY status')
+        counts = {row['status']: row['count'] for row in cursor.fetchall()}
+        conn.close()
+        return counts
+    
+    def _task_filters(self, status: Optional[str], sender: Optional[str],
+                      due_before: Optional[str], due_after: Optional[str]) -> Tuple[str, Tuple]:
+        clauses, params = [], []
+        if status:
+            clauses.append('a.status = ?')
+            params.append(status)
+        if due_before:
+            clauses.append('a.due_at < ?')
+            params.append(due_before)
+        if due_after:
+            clauses.append('a.due_at >= ?')
+            params.append(due_after)
+        if sender:
+            clauses.append('e.sender LIKE ?')
+            params.append(f'%{sender}%')
+        return ' AND '.join(clauses) or '1', tuple(params)
+    
+    def find_tasks(self, status: Optional[str] = "pending", sender: Optional[str] = None,
+                   due_before: Optional[str] = None, due_after: Optional[str] = None,
+                   limit: int = 20) -> List[TaskRecord]:
+        """Find action items by status, sender (substring) and due-date range, soonest first."""
+        where, params = self._task_filters(status, sender, due_before, due_after)
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT a.id, a.email_id, a.task, a.deadline, a.due_at, a.status, a.created_at,
+                   e.subject as email_subject, e.sender
+            FROM action_items a
+            JOIN emails e ON a.email_id = e.id
+            WHERE {where}
+            ORDER BY a.due_at IS NULL, a.due_at, a.id DESC
+            LIMIT ?
+        ''', params + (limit,))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [TaskRecord(row) for row in rows]
+    
+    def count_tasks(self, status: Optional[str] = "pending", sender: Optional[str] = None,
+                    due_before: Optional[str] = None, due_after: Optional[str] = None) -> int:
+        """Count action items matching the same filters as find_tasks."""
+        where, params = self._task_filters(status, sender, due_before, due_after)
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT COUNT(*) AS count
+            FROM action_items a
+            JOIN emails e ON a.email_id = e.id
+            WHERE {where}
+        ''', params)
+        count = cursor.fetchone()['count']
+        conn.close()
+        return count
+    
+    def _query_tasks(self, where: str, params: Tuple, limit: int) -> List[TaskRecord]:
+        """Run a pending-task query that is served in due-date order by idx_action_items_due."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT a.id, a.email_id, a.task, a.deadline, a.due_at, a.status, a.created_at,
+                   e.subject as email_subject, e.sender
+            FROM action_items a
+            JOIN emails e ON a.email_id = e.id
+            WHERE a.status = 'pending' AND {where}
+            ORDER BY a.due_at
+            LIMIT ?
+        ''', params + (limit,))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [TaskRecord(row) for row in rows]
+    
+    def get_overdue_tasks(self, now: Optional[str] = None, limit: int = 100) -> List[TaskRecord]:
+        """Get pending tasks whose due date has passed, oldest first."""
+        now = now or datetime.now().strftime(TIMESTAMP_FORMAT)
+        return self._query_tasks('a.due_at < ?', (now,), limit)
+    
+    def get_tasks_due_soon(self, hours: int = 48, now: Optional[str] = None, limit: int = 100) -> List[TaskRecord]:
+        """Get pending tasks due within the next ``hours``, soonest first."""
+        start = datetime.fromisoformat(now) if now else datetime.now()
+        until = start + timedelta(hours=hours)
+        return self._query_tasks('a.due_at >= ? AND a.due_at < ?',
+                                 (start.strftime(TIMESTAMP_FORMAT), until.strftime(TIMESTAMP_FORMAT)), limit)
+    
+    def get_urgent_tasks(self, limit: int = 50) -> List[TaskRecord]:
+        """Get pending tasks by due date, followed by tasks without one (newest first)."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        # Each branch is an indexed scan bounded by the limit, so only
+        # 2 * limit rows are ever sorted
+        cursor.execute('''
+            SELECT id, email_id, task, deadline, due_at, status, created_at, email_subject, sender FROM (
+                SELECT * FROM (
+                    SELECT 0 AS undated, a.id, a.email_id, a.task, a.deadline, a.due_at, a.status,
+                           a.created_at, e.subject as email_subject, e.sender
+                    FROM action_items a
+                    JOIN emails e ON a.email_id = e.id
+                    WHERE a.status = 'pending' AND a.due_at IS NOT NULL
+                    ORDER BY a.due_at
+                    LIMIT ?
+                )
+                UNION ALL
+                SELECT * FROM (
+                    SELECT 1 AS undated, a.id, a.email_id, a.task, a.deadline, a.due_at, a.status,
+                           a.created_at, e.subject as email_subject, e.sender
+                    FROM action_items a
+                    JOIN emails e ON a.email_id = e.id
+                    WHERE a.status = 'pending' AND a.due_at IS NULL
+                    ORDER BY a.id DESC
+                    LIMIT ?
+                )
+            )
+            ORDER BY undated, due_at, id DESC
+            LIMIT ?
+        ''', (limit, limit, limit))
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return [TaskRecord(row) for row in rows]
     
     def update_action_item_status(self, item_id: int, status: str):
         """Update action item status (pending/completed)."""
@@ -401,6 +1488,20 @@ class Database:
         conn.commit()
         conn.close()
     
+    def update_action_item_statuses(self, statuses: Dict[int, str]) -> int:
+        """Set the status of several action items in one transaction. Returns the number updated."""
+        if not statuses:
+            return 0
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.executemany('UPDATE action_items SET status = ? WHERE id = ?',
+                           [(status, item_id) for item_id, status in statuses.items()])
+        updated = cursor.rowcount
+        conn.commit()
+        conn.close()
+        
+        return updated
+    
     def delete_action_items_for_email(self, email_id: int):
         """Delete all action items for a specific email."""
         conn = self.get_connection()
@@ -408,3 +1509,7 @@ class Database:
         cursor.execute('DELETE FROM action_items WHERE email_id = ?', (email_id,))
         conn.commit()
         conn.close()
+
+
+# Time every public Database method
+metrics.instrument_class(Database, "db_call_seconds", exclude=("get_connection", "iter_unprocessed_emails"))
@@ -0,0 +1,167 @@
+"""
+Deadline normalization for action items.
+Turns the free-text deadlines the LLM extracts ("by EOD", "next Thursday",
+"Nov 25 at 3pm") into an ISO timestamp relative to the email's own timestamp,
+so tasks can be indexed and ordered by due date.
+"""
+
+import re
+from datetime import datetime, timedelta
+from typing import Optional
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+
+# Time of day used when a deadline names only a day
+END_OF_DAY = (17, 0)
+
+_WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+_WEEKDAY_ALIASES = {name[:3]: i for i, name in enumerate(_WEEKDAYS)}
+_WEEKDAY_ALIASES.update({'tue': 1, 'tues': 1, 'wed': 2, 'thu': 3, 'thur': 3, 'thurs': 3})
+_WEEKDAY_ALIASES.update({name: i for i, name in enumerate(_WEEKDAYS)})
+
+_MONTHS = {name: i + 1 for i, name in enumerate(
+    ['january', 'february', 'march', 'april', 'may', 'june', 'july',
+     'august', 'september', 'october', 'november', 'december'])}
+_MONTHS.update({name[:3]: number for name, number in list(_MONTHS.items())})
+_MONTHS['sept'] = 9
+
+_UNSPECIFIED = re.compile(r'^\s*(not specified|none|n/?a|no deadline|unknown|tbd|-)?\s*\.?\s*$', re.IGNORECASE)
+_ISO_DATE = re.compile(r'\b(\d{4})-(\d{1,2})-(\d{1,2})\b')
+_NUMERIC_DATE = re.compile(r'\b(\d{1,2})/(\d{1,2})(?:/(\d{2,4}))?\b')
+_MONTH_DAY = re.compile(r'\b([a-z]{3,9})\.?\s+(\d{1,2})(?:st|nd|rd|th)?\b(?:,?\s*(\d{4}))?')
+_DAY_MONTH = re.compile(r'\b(\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?([a-z]{3,9})\b(?:,?\s*(\d{4}))?')
+_RELATIVE = re.compile(r'\bin\s+(\d+|a|an|one|two|three)\s+(hour|day|week|month)s?\b')
+_WEEKDAY = re.compile(r'\b(next\s+|this\s+)?(' + '|'.join(sorted(_WEEKDAY_ALIASES, key=len, reverse=True)) + r')\b')
+_TIME = re.compile(r'\b(\d{1,2})(?::(\d{2}))?\s*(am|pm)\b|\b(\d{1,2}):(\d{2})\b')
+
+_WORD_NUMBERS = {'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3}
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse an email timestamp, ignoring fractional seconds and timezones."""
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace('Z', '')[:19].replace(' ', 'T'))
+    except ValueError:
+        return None
+
+
+def _time_of_day(text: str):
+    if re.search(r'\b(noon|midday)\b', text):
+        return 12, 0
+    if re.search(r'\b(eod|end of (the )?day|close of business|cob|tonight)\b', text):
+        return END_OF_DAY
+    if re.search(r'\bmorning\b', text):
+        return 9, 0
+    match = _TIME.search(text)
+    if not match:
+        return None
+    if match.group(3):
+        hour = int(match.group(1)) % 12 + (12 if match.group(3) == 'pm' else 0)
+        minute = int(match.group(2) or 0)
+    else:
+        hour, minute = int(match.group(4)), int(match.group(5))
+    if hour > 23 or minute > 59:
+        return None
+    return hour, minute
+
+
+def _next_year_if_past(day: datetime, reference: datetime, explicit_year: bool) -> datetime:
+    if not explicit_year and day.date() < reference.date():
+        return day.replace(year=day.year + 1)
+    return day
+
+
+def _date(text: str, reference: datetime) -> Optional[datetime]:
+    today = reference.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    match = _ISO_DATE.search(text)
+    if match:
+        return datetime(int(match.group(1)), int(match.group(2)), int(match.group(3)))
+
+    for match in _MONTH_DAY.finditer(text):
+        if match.group(1) in _MONTHS:
+            year = int(match.group(3)) if match.group(3) else reference.year
+            day = datetime(year, _MONTHS[match.group(1)], int(match.group(2)))
+            return _next_year_if_past(day, reference, bool(match.group(3)))
+
+    for match in _DAY_MONTH.finditer(text):
+        if match.group(2) in _MONTHS:
+            year = int(match.group(3)) if match.group(3) else reference.year
+            day = datetime(year, _MONTHS[match.group(2)], int(match.group(1)))
+            return _next_year_if_past(day, reference, bool(match.group(3)))
+
+    match = _NUMERIC_DATE.search(text)
+    if match:
+        # US ordering (month/day), matching the mock inbox
+        year = int(match.group(3)) if match.group(3) else reference.year
+        if year < 100:
+            year += 2000
+        day = datetime(year, int(match.group(1)), int(match.group(2)))
+        return _next_year_if_past(day, reference, bool(match.group(3)))
+
+    if re.search(r'\b(today|tonight|eod|end of (the )?day|close of business|cob|asap|immediately|urgent)\b', text):
+        return today
+    if re.search(r'\btomorrow\b', text):
+        return today + timedelta(days=1)
+    if re.search(r'\b(end of (the )?week|eow|this week)\b', text):
+        return today + timedelta(days=(4 - today.weekday()) % 7)
+    if re.search(r'\bnext week\b', text):
+        return today + timedelta(days=7 - today.weekday())
+    if re.search(r'\b(end of (the )?month|eom|this month)\b', text):
+        first_of_next = (today.replace(day=28) + timedelta(days=4)).replace(day=1)
+        return first_of_next - timedelta(days=1)
+    if re.search(r'\bnext month\b', text):
+        return (today.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+    match = _WEEKDAY.search(text)
+    if match:
+        ahead = (_WEEKDAY_ALIASES[match.group(2)] - today.weekday()) % 7
+        if match.group(1) and match.group(1).startswith('next') and ahead == 0:
+            ahead = 7
+        return today + timedelta(days=ahead)
+
+    return None
+
+
+def parse_deadline(deadline: Optional[str], reference: Optional[str]) -> Optional[str]:
+    """Normalize a free-text deadline to an ISO timestamp, or None if it has no date.
+
+    Relative phrases are resolved against ``reference`` (the email's timestamp).
+    """
+    if not deadline or _UNSPECIFIED.match(deadline):
+        return None
+    start = parse_timestamp(reference)
+    if start is None:
+        return None
+    text = deadline.lower()
+
+    match = _RELATIVE.search(text)
+    if match:
+        amount = _WORD_NUMBERS.get(match.group(1)) or int(match.group(1))
+        unit = match.group(2)
+        if unit == 'hour':
+            return (start + timedelta(hours=amount)).strftime(TIMESTAMP_FORMAT)
+        days = {'day': 1, 'week': 7, 'month': 30}[unit] * amount
+        due = (start + timedelta(days=days)).replace(hour=END_OF_DAY[0], minute=END_OF_DAY[1], second=0)
+        return due.strftime(TIMESTAMP_FORMAT)
+
+    try:
+        day = _date(text, start)
+    except ValueError:
+        # Impossible dates such as "2/30"
+        return None
+    time_of_day = _time_of_day(text)
+    if day is None:
+        if time_of_day is None:
+            return None
+        # "by 3pm": that time on the day the email was sent
+        day = start.replace(hour=0, minute=0, second=0, microsecond=0)
+
+    hour, minute = time_of_day or END_OF_DAY
+    due = day.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if due < start and due.date() == start.date():
+        # "by EOD" in an email sent after 5pm
+        due = due.replace(hour=23, minute=59)
+    return due.strftime(TIMESTAMP_FORMAT)
@@ -0,0 +1,103 @@
+"""
+Near-duplicate detection for templated mail.
+64-bit SimHash fingerprints over normalized bodies, split into bands so that
+candidates within a small Hamming distance can be found with indexed lookups.
+"""
+
+import hashlib
+import os
+import re
+from typing import List
+
+from backend.threads import strip_quoted
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+BITS = 64
+NUM_BANDS = 4
+BAND_BITS = BITS // NUM_BANDS
+
+# Max differing bits for two bodies to count as near-duplicates. Must stay below
+# NUM_BANDS so that any match is guaranteed to share at least one band.
+THRESHOLD = min(int(os.getenv("NEAR_DUP_THRESHOLD", "3")), NUM_BANDS - 1)
+
+# Bodies with fewer word shingles than this ("Sounds good", "Thanks!") are too
+# generic to fingerprint: they get no SimHash and are never reused
+MIN_SHINGLES = int(os.getenv("NEAR_DUP_MIN_SHINGLES", "8"))
+
+_URL = re.compile(r'https?://\S+|www\.\S+')
+_EMAIL = re.compile(r'\S+@\S+')
+_NUMBER = re.compile(r'\d+([.,:/-]\d+)*')
+_NON_WORD = re.compile(r'[^\w\s]')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize_body(body: str) -> str:
+    """Reduce a body to the parts that stay the same across templated sends."""
+    text = strip_quoted(body or '') or (body or '')
+    text = text.lower()
+    text = _URL.sub(' url ', text)
+    text = _EMAIL.sub(' email ', text)
+    text = _NUMBER.sub(' 0 ', text)
+    text = _NON_WORD.sub(' ', text)
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def _features(text: str, size: int = 3) -> List[str]:
+    words = text.split()
+    if len(words) < size:
+        return [' '.join(words)] if words else []
+    return [' '.join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def simhash(body: str) -> int:
+    """Get the unsigned 64-bit SimHash of a body's word shingles, or 0 for too short a body."""
+    digests = [hashlib.blake2b(f.encode(), digest_size=8).digest()
+               for f in _features(normalize_body(body))]
+    if len(digests) < MIN_SHINGLES:
+        return 0
+
+    if np is not None:
+        # Count set bits per position across all features in one pass
+        bits = np.unpackbits(np.frombuffer(b''.join(digests), dtype=np.uint8).reshape(-1, 8), axis=1)
+        ones = bits.sum(axis=0)
+        fingerprint = 0
+        for position, count in enumerate(ones):
+            if count * 2 > len(digests):
+                fingerprint |= 1 << (BITS - 1 - position)
+        return fingerprint
+
+    weights = [0] * BITS
+    for digest in digests:
+        h = int.from_bytes(digest, 'big')
+        for bit in range(BITS):
+            weights[bit] += 1 if h >> bit & 1 else -1
+
+    fingerprint = 0
+    for bit in range(BITS):
+        if weights[bit] > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def bands(fingerprint: int) -> List[int]:
+    """Split a fingerprint into NUM_BANDS band values."""
+    mask = (1 << BAND_BITS) - 1
+    return [(fingerprint >> (i * BAND_BITS)) & mask for i in range(NUM_BANDS)]
+
+
+def hamming(a: int, b: int) -> int:
+    """Number of differing bits."""
+    return bin(a ^ b).count('1')
+
+
+def to_signed(fingerprint: int) -> int:
+    """Convert to a signed 64-bit value so SQLite can store it as INTEGER."""
+    return fingerprint - (1 << BITS) if fingerprint >= 1 << (BITS - 1) else fingerprint
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << BITS) if value < 0 else value
@@ -1,84 +1,316 @@
+import os
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import datetime, timedelta
 from typing import Dict, List
-from backend.database import Database
-from backend import llm_service
+from backend.database import Database, prompt_hash
+from backend import llm_service, metrics
+from backend import scheduler as sched
+from backend.threads import strip_quoted
+from backend.contacts import normalize_address
 
 db = None
+scheduler = None
+
+# Emails received within this many hours count as newly arrived
+NEW_MAIL_WINDOW_HOURS = float(os.getenv("NEW_MAIL_WINDOW_HOURS", "24"))
+PROCESSING_WORKERS = int(os.getenv("PROCESSING_WORKERS", "3"))
+
+# Emails read ahead and queued at once by process_all_emails; bounds its memory use
+PROCESSING_WINDOW = max(1, int(os.getenv("PROCESSING_WINDOW", "500")))
+
+# Reuse category/summary from a processed near-identical email (optionally verified)
+NEAR_DUP_REUSE = os.getenv("NEAR_DUP_REUSE", "1") == "1"
+NEAR_DUP_VERIFY = os.getenv("NEAR_DUP_VERIFY", "0") == "1"
+
+STAGES = ("categorize", "tasks", "summary")
+TASK_CATEGORIES = ["To-Do", "Important", "Meeting Request"]
+
+# Opt-in: pre-generate reply drafts in the background right after categorization,
+# so "Draft Reply" returns instantly. Budgeted per hour to bound LLM spend.
+SPECULATIVE_DRAFTS = os.getenv("SPECULATIVE_DRAFTS", "0") == "1"
+SPECULATIVE_DRAFTS_PER_HOUR = int(os.getenv("SPECULATIVE_DRAFTS_PER_HOUR", "50"))
+DRAFT_CATEGORIES = ["To-Do", "Important", "Meeting Request"]
+
+# One lock per conversation thread, so concurrent workers roll its summary forward in turn
+_thread_locks = weakref.WeakValueDictionary()
+_thread_locks_guard = threading.Lock()
+
+_speculation_lock = threading.Lock()
+_speculation_budget = {"window_start": 0.0, "used": 0}
+_speculative_jobs = set()
+
 
 def init_processor(database):
     global db
     db = database
 
 
-def format_email(email):
-    return f"From: {email['sender']}\nSubject: {email['subject']}\n\n{email['body']}"
+def format_email(email, thread=None):
+    body = email['body']
+    context = ""
+    
+    # Replies only send their new text plus the cached summary of the thread
+    if thread and thread['message_count'] > 1:
+        body = strip_quoted(body) or body
+        # Only a summary of earlier mail; one that already covers this or later messages would leak ahead
+        covered = thread.get('summarized_timestamp')
+        if thread.get('summary') and covered and covered < email['timestamp']:
+            context = f"Earlier in this thread: {thread['summary']}\n\n"
+            metrics.inc("llm_cache_hits_total", cache="thread_summary")
+    
+    return f"{context}From: {email['sender']}\nSubject: {email['subject']}\n\n{body}"
 
 
-def process_single_email(email_id, with_summary=False):
-    email = db.get_email_by_id(email_id)
-    if not email:
+def find_reusable_match(email_id, email_text):
+    match = db.find_near_duplicate(email_id)
+    if not match:
         return None
     
-    results = {"email_id": email_id}
-    email_text = format_email(email)
-    
-    cat_prompt = db.get_prompt("categorization")
-    if not cat_prompt:
-        db.load_default_prompts()
-        cat_prompt = db.get_prompt("categorization")
+    if NEAR_DUP_VERIFY and not llm_service.verify_category(email_text, match['category']):
+        return None
+    return match
+
+
+def thread_lock(thread_id):
+    with _thread_locks_guard:
+        lock = _thread_locks.get(thread_id)
+        if lock is None:
+            lock = _thread_locks[thread_id] = threading.Lock()
+        return lock
+
+
+def update_thread_summary(email, thread, results):
+    if not thread:
+        return
     
-    category = llm_service.categorize_email(email_text, cat_prompt)
-    if category:
-        db.update_email_category(email_id, category)
-        results["category"] = category
+    # A single-message thread's summary is just the email summary
+    if thread['message_count'] <= 1:
+        if results.get("summary"):
+            db.update_thread_summary(thread['id'], results["summary"], email['id'], email['timestamp'])
+        return
     
-    if category in ["To-Do", "Important", "Meeting Request"]:
-        task_prompt = db.get_prompt("action_item")
-        tasks = llm_service.extract_tasks(email_text, task_prompt)
+    with thread_lock(thread['id']):
+        thread = db.get_thread(thread['id'])
+        covered = thread.get('summarized_timestamp')
+        if covered and covered >= email['timestamp']:
+            return
         
-        db.delete_action_items_for_email(email_id)
-        for task in tasks:
-            if task.get('task'):
-                db.save_action_item(
-                    email_id, 
-                    task['task'], 
-                    task.get('deadline', 'Not specified')
-                )
-        results["tasks"] = tasks
-    
-    if with_summary:
+        # Fold in every message since the cached summary, not only this one: emails are
+        # processed out of order (new mail first), and the summary must cover all mail
+        # up to its timestamp for the check above to hold
+        new_messages = [
+            f"From: {m['sender']}\n{(strip_quoted(m['body']) or m['body'])[:2000]}"
+            for m in db.get_thread_emails(thread['id'])
+            if (not covered or m['timestamp'] > covered) and m['timestamp'] <= email['timestamp']
+        ]
         summary_prompt = db.get_prompt("summary")
-        summary = llm_service.generate_summary(email_text, summary_prompt)
+        with metrics.timer("processing_stage_seconds", stage="thread_summary"):
+            summary = llm_service.update_thread_summary(thread.get('summary'), "\n\n".join(new_messages),
+                                                        summary_prompt)
         if summary:
-            db.update_email_summary(email_id, summary)
-            results["summary"] = summary
+            db.update_thread_summary(thread['id'], summary, email['id'], email['timestamp'])
+
+
+def thread_for_reply(email):
+    """Get an email's thread with its summary brought up to the message before it."""
+    thread = db.get_thread(email['thread_id']) if email.get('thread_id') else None
+    if not thread or thread['message_count'] <= 1:
+        return thread
     
-    return results
+    # "Process All" skips thread summaries by default, so a reply builds its own
+    earlier = [m for m in db.get_thread_emails(thread['id']) if m['timestamp'] < email['timestamp']]
+    if earlier:
+        update_thread_summary(earlier[-1], thread, {})
+        thread = db.get_thread(thread['id'])
+    return thread
 
 
-def process_all_emails(with_summary=False):
-    emails = db.get_all_emails()
-    results = []
+def resolve_stages(with_summary=False, stages=None):
+    if stages is None:
+        stages = ["categorize", "tasks"] + (["summary"] if with_summary else [])
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Unknown processing stage(s): {', '.join(sorted(unknown))}")
+    return set(stages)
+
+
+def process_single_email(email_id, with_summary=False, stages=None, email=None):
+    stages = resolve_stages(with_summary, stages)
+    # Listing rows (e.g. get_stale_emails) leave out the body; fetch the full email
+    if email is None or 'body' not in email or 'thread_id' not in email:
+        email = db.get_email_by_id(email_id)
+    if not email:
+        return None
     
-    for email in emails:
-        if not email['processed']:
-            result = process_single_email(email['id'], with_summary)
-            if result:
-                results.append(result)
+    results = {"email_id": email_id}
+    thread = db.get_thread(email['thread_id']) if email.get('thread_id') else None
+    email_text = format_email(email, thread)
+    category = email.get('category')
+    
+    match = None
+    if NEAR_DUP_REUSE and stages & {"categorize", "summary"}:
+        match = find_reusable_match(email_id, email_text)
+        if match:
+            results["reused_from"] = match['id']
+    
+    if "categorize" in stages:
+        with metrics.timer("processing_stage_seconds", stage="categorize"):
+            if match:
+                category = match['category']
+                metrics.inc("llm_cache_hits_total", cache="near_duplicate")
+            else:
+                cat_prompt = db.get_prompt("categorization")
+                if not cat_prompt:
+                    db.load_default_prompts()
+                    cat_prompt = db.get_prompt("categorization")
+                
+                category = llm_service.categorize_email(email_text, cat_prompt)
+            if category:
+                db.update_email_category(email_id, category)
+                results["category"] = category
+                schedule_speculative_draft(email_id, category)
+    
+    if "tasks" in stages and category in TASK_CATEGORIES:
+        with metrics.timer("processing_stage_seconds", stage="tasks"):
+            task_prompt = db.get_prompt("action_item")
+            tasks = llm_service.extract_tasks(email_text, task_prompt)
+            
+            db.delete_action_items_for_email(email_id)
+            for task in tasks:
+                if task.get('task'):
+                    db.save_action_item(
+                        email_id, 
+                        task['task'], 
+                        task.get('deadline', 'Not specified'),
+                        email['timestamp']
+                    )
+            results["tasks"] = tasks
+    
+    if "summary" in stages:
+        with metrics.timer("processing_stage_seconds", stage="summary"):
+            if match and match.get('summary'):
+                summary = match['summary']
+                metrics.inc("llm_cache_hits_total", cache="near_duplicate")
+            else:
+                summary_prompt = db.get_prompt("summary")
+                summary = llm_service.generate_summary(email_text, summary_prompt)
+            if summary:
+                db.update_email_summary(email_id, summary)
+                results["summary"] = summary
+    
+    if "summary" in stages:
+        update_thread_summary(email, thread, results)
     
     return results
 
 
-def create_draft_reply(email_id, custom_instructions=""):
-    email = db.get_email_by_id(email_id)
-    if not email:
-        return None
+def get_scheduler():
+    global scheduler
+    if scheduler is None:
+        scheduler = sched.PriorityScheduler(workers=PROCESSING_WORKERS)
+        scheduler.start()
+    return scheduler
+
+
+def email_priority(email, priority_senders, new_mail_cutoff):
+    if email['timestamp'][:19] >= new_mail_cutoff:
+        return sched.NEW_MAIL
+    if normalize_address(email['sender'])[0] in priority_senders:
+        return sched.IMPORTANT_SENDER
+    return sched.BACKFILL
+
+
+def new_mail_cutoff(now=None):
+    cutoff = (now or datetime.now()) - timedelta(hours=NEW_MAIL_WINDOW_HOURS)
+    return cutoff.strftime("%Y-%m-%dT%H:%M:%S")
+
+
+def process_email_now(email_id, with_summary=True):
+    future = get_scheduler().submit(
+        process_single_email, email_id, with_summary, priority=sched.INTERACTIVE
+    )
+    return future.result()
+
+
+def configure_scheduler(workers, reserved_interactive=1):
+    global scheduler
+    if scheduler is not None:
+        scheduler.shutdown()
+    scheduler = sched.PriorityScheduler(workers=workers, reserved_interactive=reserved_interactive)
+    scheduler.start()
+    return scheduler
+
+
+def process_all_emails(with_summary=False, stages=None, limit=None):
+    pending = db.get_unprocessed_summary()
+    if not pending['count']:
+        return {"total": 0, "processed": 0, "failed": 0}
+    emails = db.iter_unprocessed_emails(chunk_size=PROCESSING_WINDOW, limit=limit)
+    return process_emails(emails, with_summary, stages)
+
+
+def process_emails(emails, with_summary=False, stages=None):
+    """Process an iterable of email rows, keeping at most PROCESSING_WINDOW in flight.
+    
+    Returns counts rather than per-email results, so memory stays bounded however
+    many emails stream through. An email fails if it errored or a requested
+    categorization came back empty.
+    """
+    counts = {"total": 0, "processed": 0, "failed": 0}
+    needs_category = "categorize" in resolve_stages(with_summary, stages)
+    
+    # Load prompts once up front rather than racing to do it in every worker
+    if not db.get_prompt("categorization"):
+        db.load_default_prompts()
+    
+    priority_senders = set(db.get_priority_senders())
+    cutoff = new_mail_cutoff()
+    
+    def collect(future):
+        counts["total"] += 1
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Error: {e}")
+            result = None
+        if result and (result.get("category") or not needs_category):
+            counts["processed"] += 1
+        else:
+            counts["failed"] += 1
+    
+    in_flight = deque()
+    for email in emails:
+        priority = email_priority(email, priority_senders, cutoff)
+        in_flight.append(get_scheduler().submit(
+            process_single_email, email['id'], with_summary, stages, email, priority=priority
+        ))
+        # Bound memory: wait for the oldest jobs before reading further ahead
+        while len(in_flight) >= PROCESSING_WINDOW:
+            collect(in_flight.popleft())
+    
+    while in_flight:
+        collect(in_flight.popleft())
     
+    return counts
+
+
+def get_processing_stats():
+    return get_scheduler().stats()
+
+
+def get_reply_prompt():
     reply_prompt = db.get_prompt("auto_reply")
     if not reply_prompt:
         db.load_default_prompts()
         reply_prompt = db.get_prompt("auto_reply")
-    
-    email_text = format_email(email)
+    return reply_prompt
+
+
+def generate_draft(email, reply_prompt, custom_instructions="", speculative=False):
+    email_text = format_email(email, thread_for_reply(email))
     reply_body = llm_service.generate_reply(email_text, reply_prompt, custom_instructions)
     
     if reply_body:
@@ -87,10 +319,87 @@ def create_draft_reply(email_id, custom_instructions=""):
             subject = f"Re: {subject}"
         
         metadata = {
-            "original_email_id": email_id,
+            "original_email_id": email['id'],
             "category": email.get('category')
         }
-        draft_id = db.save_draft(email_id, subject, reply_body, metadata)
-        return draft_id
+        return db.save_draft(email['id'], subject, reply_body, metadata,
+                             speculative=speculative, reply_prompt_hash=prompt_hash(reply_prompt))
     
     return None
+
+
+def create_draft_reply(email_id, custom_instructions=""):
+    email = db.get_email_by_id(email_id)
+    if not email:
+        return None
+    
+    reply_prompt = get_reply_prompt()
+    
+    # Use a draft pre-generated with the current reply prompt, if there is one
+    if not custom_instructions:
+        draft_id = db.get_speculative_draft(email_id, prompt_hash(reply_prompt))
+        if draft_id and db.promote_draft(draft_id):
+            metrics.inc("speculative_drafts_total", outcome="used")
+            return draft_id
+    
+    return generate_draft(email, reply_prompt, custom_instructions)
+
+
+def _take_speculation_budget():
+    with _speculation_lock:
+        now = time.monotonic()
+        if now - _speculation_budget["window_start"] >= 3600:
+            _speculation_budget["window_start"] = now
+            _speculation_budget["used"] = 0
+        if _speculation_budget["used"] >= SPECULATIVE_DRAFTS_PER_HOUR:
+            return False
+        _speculation_budget["used"] += 1
+        return True
+
+
+def speculate_draft(email_id):
+    # Skip emails that got a draft (or a speculative one) since this was queued
+    if db.has_draft(email_id):
+        return None
+    email = db.get_email_by_id(email_id)
+    if not email:
+        return None
+    draft_id = generate_draft(email, get_reply_prompt(), speculative=True)
+    metrics.inc("speculative_drafts_total", outcome="generated" if draft_id else "failed")
+    return draft_id
+
+
+def schedule_speculative_draft(email_id, category):
+    """Queue a background reply draft for an email that will likely be answered."""
+    if not SPECULATIVE_DRAFTS or category not in DRAFT_CATEGORIES:
+        return None
+    if db.has_draft(email_id):
+        return None
+    if not _take_speculation_budget():
+        metrics.inc("speculative_drafts_total", outcome="over_budget")
+        return None
+    
+    # Backfill priority: drafts never hold up categorization of other mail
+    future = get_scheduler().submit(speculate_draft, email_id, priority=sched.BACKFILL)
+    with _speculation_lock:
+        _speculative_jobs.add(future)
+    future.add_done_callback(_speculative_done)
+    return future
+
+
+def _speculative_done(future):
+    with _speculation_lock:
+        _speculative_jobs.discard(future)
+    if not future.cancelled() and future.exception():
+        print(f"Error pre-generating draft: {future.exception()}")
+
+
+def wait_for_speculative_drafts(timeout=None):
+    """Wait for queued speculative drafts, e.g. before a batch process exits."""
+    with _speculation_lock:
+        pending = list(_speculative_jobs)
+    for future in pending:
+        try:
+            future.result(timeout=timeout)
+        except Exception:
+            pass
@@ -1,66 +1,271 @@
 import os
+import threading
+import time
 from langchain_groq import ChatGroq
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
 from dotenv import load_dotenv
 import json
+import re
+from backend import metrics
+from backend.structured_output import TASK_SCHEMA, parse_object_array
 
 load_dotenv()
 
-try:
-    import streamlit as st
-    api_key = st.secrets.get("GROQ_API_KEY", os.getenv("GROQ_API_KEY"))
-    model = st.secrets.get("GROQ_MODEL", os.getenv("GROQ_MODEL", "llama3-70b-8192"))
-except:
-    api_key = os.getenv("GROQ_API_KEY")
-    model = os.getenv("GROQ_MODEL", "llama3-70b-8192")
+
+def get_setting(name, default=None):
+    try:
+        import streamlit as st
+        return st.secrets.get(name, os.getenv(name, default))
+    except Exception:
+        return os.getenv(name, default)
+
+
+api_key = get_setting("GROQ_API_KEY")
+model = get_setting("GROQ_MODEL", "llama3-70b-8192")
 
 if not api_key:
     raise ValueError("GROQ_API_KEY not found. Please configure it in Streamlit secrets or .env file")
 
-llm = ChatGroq(groq_api_key=api_key, model_name=model, temperature=0.7)
+# Per-task model routing. Triage (categorization, task extraction) runs on a small
+# model and escalates to GROQ_MODEL when its answer fails validation.
+triage_model = get_setting("GROQ_TRIAGE_MODEL", "llama-3.1-8b-instant")
+summary_model = get_setting("GROQ_SUMMARY_MODEL", model)
+reply_model = get_setting("GROQ_REPLY_MODEL", model)
+chat_model = get_setting("GROQ_CHAT_MODEL", model)
+
+# Small-model samples that must agree before a triage answer is accepted. One
+# sample can't show low confidence, so it is only escalated when unparseable.
+TRIAGE_SAMPLES = max(1, int(get_setting("TRIAGE_SAMPLES", "2")))
+
+# Request JSON-mode output for structured tasks (disable for models without it)
+JSON_MODE = get_setting("LLM_JSON_MODE", "1") == "1"
+
+# Tool-call rounds a chat answer may take before the model must reply
+MAX_TOOL_ROUNDS = max(1, int(get_setting("AGENT_MAX_TOOL_ROUNDS", "4")))
+
+_llms = {}
+_llms_lock = threading.Lock()
+
+
+def get_llm(model_name, temp):
+    key = (model_name, temp)
+    with _llms_lock:
+        if key not in _llms:
+            _llms[key] = ChatGroq(groq_api_key=api_key, model_name=model_name, temperature=temp)
+        return _llms[key]
 
+MAX_RETRIES = int(get_setting("LLM_MAX_RETRIES", "2"))
+RETRY_BACKOFF = float(get_setting("LLM_RETRY_BACKOFF", "1.0"))
+
+# USD per million (prompt, completion) tokens, for cost estimates
+MODEL_PRICES = {
+    "llama3-70b-8192": (0.59, 0.79),
+    "llama3-8b-8192": (0.05, 0.08),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "mixtral-8x7b-32768": (0.24, 0.24),
+}
+
+
+def record_usage(response, model_name, task):
+    usage = getattr(response, "usage_metadata", None) or {}
+    prompt_tokens = usage.get("input_tokens")
+    completion_tokens = usage.get("output_tokens")
+    
+    if prompt_tokens is None:
+        token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+        prompt_tokens = token_usage.get("prompt_tokens", 0)
+        completion_tokens = token_usage.get("completion_tokens", 0)
+    
+    metrics.inc("llm_tokens_total", prompt_tokens, kind="prompt", model=model_name, task=task)
+    metrics.inc("llm_tokens_total", completion_tokens or 0, kind="completion", model=model_name, task=task)
+    
+    prices = MODEL_PRICES.get(model_name)
+    if prices:
+        cost = (prompt_tokens * prices[0] + (completion_tokens or 0) * prices[1]) / 1_000_000
+        metrics.inc("llm_cost_usd_total", cost, model=model_name, task=task)
+
+
+def invoke_llm(llm, messages, task, model_name):
+    """Invoke a chat model with retries, recording latency and token usage. Raises on failure."""
+    started = time.perf_counter()
+    try:
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                response = llm.invoke(messages)
+                break
+            except Exception:
+                if attempt == MAX_RETRIES:
+                    raise
+                metrics.inc("llm_retries_total", task=task)
+                time.sleep(RETRY_BACKOFF * 2 ** attempt)
+        
+        record_usage(response, model_name, task)
+        return response
+    except Exception:
+        metrics.inc("llm_errors_total", task=task)
+        raise
+    finally:
+        metrics.observe("llm_request_seconds", time.perf_counter() - started, model=model_name, task=task)
 
 
-def call_llm(prompt, system_msg="You are a helpful assistant.", temp=0.7):
+def call_llm(prompt, system_msg="You are a helpful assistant.", temp=0.7, task="general", model_name=None,
+             json_mode=False):
+    model_name = model_name or model
+    llm = get_llm(model_name, temp)
+    if json_mode and JSON_MODE:
+        llm = llm.bind(response_format={"type": "json_object"})
+    messages = [
+        SystemMessage(content=system_msg),
+        HumanMessage(content=prompt)
+    ]
     try:
-        messages = [
-            SystemMessage(content=system_msg),
-            HumanMessage(content=prompt)
-        ]
-        response = llm.invoke(messages)
-        return response.content.strip()
+        return invoke_llm(llm, messages, task, model_name).content.strip()
     except Exception as e:
         print(f"Error: {e}")
         return None
 
 
+# Used when a categorization prompt doesn't list its categories as "categories: A, B, C."
+DEFAULT_CATEGORIES = ["Important", "Newsletter", "Spam", "To-Do", "Project Update", "Meeting Request", "Personal"]
+_CATEGORY_LIST = re.compile(r'categor(?:y|ies)\b[^:\n]*:\s*([^\n.]+)', re.IGNORECASE)
+_CATEGORY_SEPARATOR = re.compile(r',|\bor\b|\band\b')
+
+
+def prompt_categories(prompt_template):
+    """Get the category names a categorization prompt offers."""
+    match = _CATEGORY_LIST.search(prompt_template or '')
+    if match:
+        names = [name.strip().strip('"\'`* ') for name in _CATEGORY_SEPARATOR.split(match.group(1))]
+        names = [name for name in names if name and len(name) <= 40]
+        if len(names) >= 2:
+            return names
+    return DEFAULT_CATEGORIES
+
+
+def clean_category(result, prompt_template):
+    """Return the category if the answer is exactly one the prompt offers, otherwise None."""
+    if not result:
+        return None
+    answer = result.strip().strip('"\'.`* ')
+    if answer.lower().startswith("category:"):
+        answer = answer[len("category:"):].strip().strip('"\'.`* ')
+    # Use the prompt's spelling so "to-do" and "To-Do" count as one category
+    for category in prompt_categories(prompt_template):
+        if answer.lower() == category.lower():
+            return category
+    return None
+
+
+def find_category(result, prompt_template):
+    """Fallback for wordy answers: the one offered category named in the answer, if exactly one is."""
+    if not result:
+        return None
+    named = [category for category in prompt_categories(prompt_template)
+             if re.search(rf'(?<![\w-]){re.escape(category)}(?![\w-])', result, re.IGNORECASE)]
+    return named[0] if len(named) == 1 else None
+
+
+def run_triage(task, prompt, system_msg, validate, fallback=lambda result: None, json_mode=False,
+               triage_validate=None):
+    """Ask the triage model, escalating to the main model on low confidence.
+    
+    ``validate`` turns a raw response into a result, or None if unusable. With
+    TRIAGE_SAMPLES > 1 all small-model samples must also agree. Small-model
+    answers are checked with ``triage_validate`` instead when given, so a
+    stricter check can escalate rather than patch them up. If the main
+    model's answer fails validation too, ``fallback`` gets the raw response.
+    """
+    if triage_model != model:
+        temp = 0.3 if TRIAGE_SAMPLES == 1 else 0.7
+        check = triage_validate or validate
+        answers = [check(call_llm(prompt, system_msg, temp, task=task, model_name=triage_model,
+                                  json_mode=json_mode))
+                   for _ in range(TRIAGE_SAMPLES)]
+        if answers[0] is not None and all(a == answers[0] for a in answers):
+            return answers[0]
+        metrics.inc("llm_escalations_total", task=task)
+    
+    result = call_llm(prompt, system_msg, 0.3, task=task, model_name=model, json_mode=json_mode)
+    answer = validate(result)
+    return answer if answer is not None else fallback(result)
+
+
 def categorize_email(email_text, prompt_template):
     full_prompt = f"{prompt_template}\n\nEmail:\n{email_text}"
-    result = call_llm(full_prompt, "You are an email categorizer.", 0.3)
+    return run_triage(
+        "categorize", full_prompt, "You are an email categorizer.",
+        validate=lambda result: clean_category(result, prompt_template),
+        fallback=lambda result: find_category(result, prompt_template)
+    )
+
+
+def verify_category(email_text, category):
+    prompt = (f"Is '{category}' the right category for this email? Answer only yes or no."
+              f"\n\nEmail:\n{email_text[:1500]}")
+    result = call_llm(prompt, "You verify email categories.", 0.0, task="verify", model_name=triage_model)
+    return bool(result) and result.strip().lower().startswith("yes")
+
+
+TASKS_SYSTEM = (
+    "Extract tasks from emails. Respond with only a JSON object matching this schema: "
+    + json.dumps(TASK_SCHEMA)
+)
+
+
+def clean_tasks(objects):
+    tasks = []
+    for obj in objects:
+        task = obj.get('task')
+        if isinstance(task, str) and task.strip():
+            deadline = obj.get('deadline')
+            tasks.append({
+                "task": task.strip(),
+                "deadline": deadline.strip() if isinstance(deadline, str) and deadline.strip() else "Not specified"
+            })
+    return tasks
+
+
+def repair_tasks(fragments):
+    """Ask for a fix of only the malformed fragments, not a full re-extraction."""
+    prompt = (
+        "These fragments of a JSON task list are malformed or cut off. Fix each one into a "
+        "complete object with \"task\" and \"deadline\" keys, keeping the original wording; "
+        "use \"Not specified\" for a missing deadline. Do not add new tasks.\n\n"
+        + "\n".join(fragments)
+    )
+    result = call_llm(prompt, TASKS_SYSTEM, 0.0, task="tasks_repair", json_mode=True)
+    return parse_object_array(result).objects if result else []
+
+
+def parse_tasks(result, repair=True):
+    """Parse a task list response, repairing broken items. None if nothing usable.
     
-    if result:
-        return result.strip().strip('"').strip("'")
-    return None
+    With ``repair=False`` a response with any broken item is unusable instead.
+    """
+    if not result:
+        return None
+    parsed = parse_object_array(result)
+    if not parsed.found_array:
+        return None
+    
+    objects = list(parsed.objects)
+    if parsed.broken:
+        if not repair:
+            return None
+        repaired = repair_tasks(parsed.broken)
+        if len(repaired) < len(parsed.broken):
+            metrics.inc("llm_parse_failures_total", len(parsed.broken) - len(repaired), task="tasks")
+            print(f"Warning: dropped {len(parsed.broken) - len(repaired)} unparseable task(s)")
+        objects += repaired
+    return clean_tasks(objects)
 
 
 def extract_tasks(email_text, prompt_template):
     full_prompt = f"{prompt_template}\n\nEmail:\n{email_text}"
-    result = call_llm(full_prompt, "Extract tasks from emails.", 0.3)
-    
-    if result:
-        try:
-            tasks = json.loads(result)
-            if isinstance(tasks, list):
-                return tasks
-        except:
-            import re
-            match = re.search(r'\[.*\]', result, re.DOTALL)
-            if match:
-                try:
-                    return json.loads(match.group())
-                except:
-                    pass
-    return []
+    # A malformed small-model answer escalates instead of costing a repair call
+    return run_triage("tasks", full_prompt, TASKS_SYSTEM, parse_tasks, json_mode=True,
+                      triage_validate=lambda result: parse_tasks(result, repair=False)) or []
 
 
 def generate_reply(email_text, prompt_template, extra_instructions=""):
@@ -68,18 +273,105 @@ def generate_reply(email_text, prompt_template, extra_instructions=""):
     if extra_instructions:
         full_prompt += f"\n\nExtra instructions: {extra_instructions}"
     
-    return call_llm(full_prompt, "You are an email writer.", 0.7)
+    return call_llm(full_prompt, "You are an email writer.", 0.7, task="reply", model_name=reply_model)
 
 
 def generate_summary(email_text, prompt_template):
     full_prompt = f"{prompt_template}\n\nEmail:\n{email_text}"
-    return call_llm(full_prompt, "Summarize emails concisely.", 0.5)
+    return call_llm(full_prompt, "Summarize emails concisely.", 0.5, task="summary", model_name=summary_model)
+
+
+def update_thread_summary(previous_summary, new_messages, prompt_template):
+    full_prompt = f"{prompt_template}\n\nThis message continues an email conversation. Summarize the whole conversation so far."
+    if previous_summary:
+        full_prompt += f"\n\nConversation so far:\n{previous_summary}"
+    full_prompt += f"\n\nNew messages, oldest first:\n{new_messages}"
+    return call_llm(full_prompt, "Summarize email threads concisely.", 0.5, task="thread_summary",
+                    model_name=summary_model)
+
+
+def summarize_conversation(previous_summary, turns, max_words=150):
+    transcript = "\n".join(f"{'User' if t['role'] == 'user' else 'Assistant'}: {t['content']}" for t in turns)
+    prompt = (f"Update the summary of this conversation between a user and their email assistant. "
+              f"Keep names, email subjects, decisions and open questions. Use at most {max_words} words.")
+    if previous_summary:
+        prompt += f"\n\nSummary so far:\n{previous_summary}"
+    prompt += f"\n\nNew turns:\n{transcript}"
+    return call_llm(prompt, "Summarize conversations concisely.", 0.3, task="chat_memory", model_name=summary_model)
 
 
-def chat_with_agent(question, email_context=""):
+def chat_with_agent(question, email_context="", history=None):
     if email_context:
         prompt = f"Email:\n{email_context}\n\nQuestion: {question}"
     else:
         prompt = question
     
-    return call_llm(prompt, "You are a helpful email assistant.", 0.7)
+    if not history:
+        return call_llm(prompt, "You are a helpful email assistant.", 0.7, task="chat", model_name=chat_model)
+    
+    messages = [SystemMessage(content="You are a helpful email assistant."), *history, HumanMessage(content=prompt)]
+    try:
+        return invoke_llm(get_llm(chat_model, 0.7), messages, "chat", chat_model).content.strip()
+    except Exception as e:
+        print(f"Error: {e}")
+        return None
+
+
+def stream_chat_with_agent(question, email_context="", history=None):
+    """Yield the answer to a chat question in chunks as the model generates it."""
+    if email_context:
+        prompt = f"Email:\n{email_context}\n\nQuestion: {question}"
+    else:
+        prompt = question
+    
+    messages = [SystemMessage(content="You are a helpful email assistant."), *(history or []), HumanMessage(content=prompt)]
+    started = time.perf_counter()
+    response = None
+    try:
+        for chunk in get_llm(chat_model, 0.7).stream(messages):
+            response = chunk if response is None else response + chunk
+            if chunk.content:
+                yield chunk.content
+        if response is not None:
+            record_usage(response, chat_model, "chat")
+    except Exception as e:
+        metrics.inc("llm_errors_total", task="chat")
+        print(f"Error: {e}")
+    finally:
+        metrics.observe("llm_request_seconds", time.perf_counter() - started, model=chat_model, task="chat")
+
+
+def chat_with_tools(messages, tools, run_tool, max_rounds=MAX_TOOL_ROUNDS):
+    """Answer a chat, letting the model call tools for up to ``max_rounds`` rounds.
+    
+    ``tools`` are OpenAI-style function schemas and ``run_tool(name, args)``
+    returns a JSON-serializable result that is sent back to the model.
+    Returns "" if the model gave neither a tool call nor an answer (e.g. it
+    doesn't support tool calling), and None if a request failed.
+    """
+    llm = get_llm(chat_model, 0.3)
+    messages = list(messages)
+    try:
+        for round_number in range(max_rounds):
+            try:
+                bound = llm.bind_tools(tools)
+            except NotImplementedError:
+                return ""
+            response = invoke_llm(bound, messages, "chat", chat_model)
+            if not response.tool_calls:
+                answer = response.content.strip()
+                # An empty answer after tool calls is a failure, not a model without tools
+                return answer if answer or round_number == 0 else None
+            
+            messages.append(response)
+            for call in response.tool_calls:
+                result = run_tool(call['name'], call.get('args') or {})
+                messages.append(ToolMessage(content=json.dumps(result, default=str), tool_call_id=call['id']))
+        
+        # Out of rounds: answer from the results gathered so far
+        metrics.inc("agent_tool_round_limit_total")
+        response = invoke_llm(llm.bind_tools(tools, tool_choice="none"), messages, "chat", chat_model)
+        return response.content.strip() or None
+    except Exception as e:
+        print(f"Error: {e}")
+        return None
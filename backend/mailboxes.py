@@ -0,0 +1,204 @@
+"""
+Mailbox (tenant) sharding for Email Productivity Agent.
+Each mailbox lives in its own SQLite file so mailboxes don't share a write
+lock. A small registry database maps mailbox names to shard files, and helpers
+fan out admin queries across shards and process shards in parallel workers.
+"""
+
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Optional
+
+from backend.database import Database
+
+MAILBOX_DIR = os.getenv("MAILBOX_DIR", "data/mailboxes")
+
+# The mailbox that existed before sharding keeps its original file
+DEFAULT_MAILBOX = "default"
+DEFAULT_DB_PATH = "data/email_agent.db"
+
+_NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9_.@-]{0,63}$')
+
+
+class MailboxRegistry:
+    """Registry of mailboxes and their shard files."""
+
+    def __init__(self, root: str = MAILBOX_DIR, default_path: str = DEFAULT_DB_PATH):
+        """Open (and create if needed) the registry under ``root``."""
+        self.root = root
+        self.default_path = default_path
+        self._databases: Dict[str, Database] = {}
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self.init_registry()
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Get a registry connection."""
+        conn = sqlite3.connect(os.path.join(self.root, "registry.db"))
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def init_registry(self):
+        """Create the registry table and register the default mailbox."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS mailboxes (
+                name TEXT PRIMARY KEY,
+                db_path TEXT NOT NULL,
+                created_at TEXT DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('INSERT OR IGNORE INTO mailboxes (name, db_path) VALUES (?, ?)',
+                       (DEFAULT_MAILBOX, self.default_path))
+        conn.commit()
+        conn.close()
+
+    def list_mailboxes(self) -> List[Dict]:
+        """Get all registered mailboxes."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT name, db_path, created_at FROM mailboxes ORDER BY name')
+        rows = cursor.fetchall()
+        conn.close()
+
+        return [dict(row) for row in rows]
+
+    def get_path(self, name: str) -> Optional[str]:
+        """Get the shard file of a mailbox, or None if it isn't registered."""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('SELECT db_path FROM mailboxes WHERE name = ?', (name,))
+        row = cursor.fetchone()
+        conn.close()
+
+        return row['db_path'] if row else None
+
+    def create_mailbox(self, name: str, db_path: Optional[str] = None) -> str:
+        """Register a mailbox, creating its shard file. Returns the shard path."""
+        if not _NAME.match(name):
+            raise ValueError(f"Invalid mailbox name: {name!r}")
+        existing = self.get_path(name)
+        if existing:
+            return existing
+
+        db_path = db_path or os.path.join(self.root, f"{name}.db")
+        Database(db_path)
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute('INSERT OR IGNORE INTO mailboxes (name, db_path) VALUES (?, ?)', (name, db_path))
+        conn.commit()
+        conn.close()
+        return self.get_path(name)
+
+    def open(self, name: str = DEFAULT_MAILBOX) -> Database:
+        """Get the Database for a mailbox, shared within this process."""
+        with self._lock:
+            if name not in self._databases:
+                path = self.get_path(name)
+                if path is None:
+                    raise KeyError(f"Unknown mailbox: {name}")
+                self._databases[name] = Database(path)
+            return self._databases[name]
+
+    def fan_out(self, fn: Callable[[Database], object], names: Optional[List[str]] = None,
+                max_workers: int = 8) -> Dict[str, object]:
+        """Run ``fn(db)`` against each mailbox concurrently and collect results by name.
+
+        A mailbox whose call raises maps to the exception instead of a result.
+        """
+        names = names or [m['name'] for m in self.list_mailboxes()]
+
+        def run(name):
+            try:
+                return fn(self.open(name))
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(names)))) as pool:
+            return dict(zip(names, pool.map(run, names)))
+
+    def get_all_stats(self, names: Optional[List[str]] = None) -> Dict:
+        """Get per-mailbox stats and totals across mailboxes."""
+        per_mailbox = self.fan_out(lambda db: db.get_email_stats(), names)
+
+        totals = {'total': 0, 'processed': 0, 'by_category': {}, 'tasks': {}, 'drafts': 0}
+        errors = {}
+        for name, stats in per_mailbox.items():
+            if isinstance(stats, Exception):
+                errors[name] = str(stats)
+                continue
+            totals['total'] += stats['total']
+            totals['processed'] += stats['processed']
+            totals['drafts'] += stats['drafts']
+            for key in ('by_category', 'tasks'):
+                for label, count in stats[key].items():
+                    totals[key][label] = totals[key].get(label, 0) + count
+
+        return {
+            'mailboxes': {name: stats for name, stats in per_mailbox.items() if name not in errors},
+            'totals': totals,
+            'errors': errors,
+        }
+
+
+def _process_shard(name, db_path, with_summary, stages, workers):
+    # Runs in a worker process: email_processor keeps its database in module
+    # globals, so each shard gets a process of its own
+    from backend import email_processor, agent
+
+    db = Database(db_path)
+    email_processor.init_processor(db)
+    agent.init_agent(db)
+    email_processor.configure_scheduler(workers, reserved_interactive=0)
+    started = time.monotonic()
+    try:
+        counts = email_processor.process_all_emails(with_summary, stages)
+        email_processor.wait_for_speculative_drafts()
+    finally:
+        email_processor.scheduler.shutdown()
+    return {
+        'mailbox': name,
+        'processed': counts['processed'],
+        'failed': counts['failed'],
+        'elapsed': round(time.monotonic() - started, 3),
+    }
+
+
+def process_mailboxes(registry: MailboxRegistry, names: Optional[List[str]] = None,
+                      with_summary: bool = False, stages=None, shard_processes: int = 4,
+                      workers_per_shard: int = 3, on_done: Optional[Callable[[Dict], None]] = None) -> List[Dict]:
+    """Process each mailbox's unprocessed emails, one worker process per shard.
+
+    Up to ``shard_processes`` shards run at once, each with its own scheduler of
+    ``workers_per_shard`` LLM workers. ``on_done`` is called as each shard finishes.
+    """
+    mailboxes = {m['name']: m['db_path'] for m in registry.list_mailboxes()}
+    names = names or list(mailboxes)
+    unknown = [name for name in names if name not in mailboxes]
+    if unknown:
+        raise KeyError(f"Unknown mailbox: {', '.join(unknown)}")
+
+    results = []
+    # spawn, not fork: the parent may be running scheduler or metrics threads
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=max(1, min(shard_processes, len(names))), mp_context=context) as pool:
+        futures = {pool.submit(_process_shard, name, mailboxes[name], with_summary, stages, workers_per_shard): name
+                   for name in names}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = {'mailbox': name, 'error': str(e)}
+            results.append(result)
+            if on_done:
+                on_done(result)
+
+    return results
@@ -0,0 +1,90 @@
+"""
+Token-budgeted chat memory.
+Recent turns are sent to the model verbatim; older turns are folded into a
+rolling summary that is kept on the memory object, so each session pays to
+compress a turn only once.
+"""
+
+import os
+import threading
+from typing import Dict, List
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from backend import llm_service
+
+# Token budget for the conversation history sent with each question
+TOKEN_BUDGET = int(os.getenv("CHAT_MEMORY_TOKENS", "1500"))
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English)."""
+    return len(text or '') // 4 + 1
+
+
+class ConversationMemory:
+    """Builds the history messages for a chat session within a token budget.
+
+    Keep one instance per session alongside the displayed chat history. It may
+    be shared by concurrent requests of one session; they take turns.
+    """
+
+    def __init__(self, token_budget: int = TOKEN_BUDGET):
+        self.token_budget = token_budget
+        self.summary = ""
+        self.summarized = 0
+        self._lock = threading.Lock()
+
+    def reset(self):
+        self.summary = ""
+        self.summarized = 0
+
+    def _fit(self, turns: List[Dict], budget: int) -> int:
+        """Number of newest turns that fit in ``budget`` tokens."""
+        used = 0
+        for count, turn in enumerate(reversed(turns)):
+            used += estimate_tokens(turn['content'])
+            if used > budget:
+                return count
+        return len(turns)
+
+    def _compress(self, turns: List[Dict]):
+        summary_budget = self.token_budget // 4
+        new_summary = llm_service.summarize_conversation(self.summary, turns, max_words=summary_budget * 3 // 4)
+        if new_summary:
+            self.summary = new_summary[:summary_budget * 4]
+        else:
+            print(f"Warning: dropped {len(turns)} chat turn(s) from memory without summarizing")
+
+    def messages(self, history: List[Dict]) -> List:
+        """Get the summary and recent turns of ``history`` as chat messages."""
+        with self._lock:
+            return self._messages(history)
+
+    def _messages(self, history: List[Dict]) -> List:
+        if len(history) < self.summarized:
+            # The history was cleared or replaced
+            self.reset()
+
+        # Turns without text (e.g. a failed answer stored as None) can't be sent
+        window = [(position, turn) for position, turn in enumerate(history[self.summarized:], self.summarized)
+                  if isinstance(turn.get('content'), str) and turn['content']]
+        recent = [turn for _, turn in window]
+        available = self.token_budget - estimate_tokens(self.summary)
+        if sum(estimate_tokens(turn['content']) for turn in recent) > available:
+            # Fold down to half the budget so the next few turns don't each need a summary call
+            keep = self._fit(recent, self.token_budget // 2)
+            self._compress(recent[:len(recent) - keep])
+            # Positions index the full history, skipped turns included
+            self.summarized = window[len(window) - keep][0] if keep else len(history)
+            recent = recent[len(recent) - keep:]
+
+        messages = []
+        if self.summary:
+            messages.append(SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}"))
+        for turn in recent:
+            if turn['role'] == 'user':
+                messages.append(HumanMessage(content=turn['content']))
+            else:
+                messages.append(AIMessage(content=turn['content']))
+        return messages
@@ -0,0 +1,240 @@
+"""
+In-process metrics for Email Productivity Agent.
+Counters and latency histograms recorded around LLM calls, processing stages and
+Database methods, exposed as Prometheus text (file or HTTP) and as plain dicts
+for the Streamlit diagnostics page.
+"""
+
+import functools
+import inspect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+# Latency buckets in seconds (upper bounds)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+HELP = {
+    "db_call_seconds": "Database method latency",
+    "llm_request_seconds": "LLM request latency, including retries",
+    "llm_tokens_total": "LLM tokens used",
+    "llm_cost_usd_total": "Estimated LLM cost in USD",
+    "llm_retries_total": "LLM request retries",
+    "llm_errors_total": "LLM requests that failed after all retries",
+    "llm_cache_hits_total": "LLM calls avoided by reusing earlier results",
+    "llm_escalations_total": "Triage answers escalated from the small to the main model",
+    "llm_parse_failures_total": "Structured LLM output items dropped after a failed repair",
+    "processing_stage_seconds": "Email processing stage latency",
+    "analytics_refresh_seconds": "Incremental analytics snapshot refresh latency",
+    "agent_tool_seconds": "Chat agent tool call latency",
+    "agent_tool_round_limit_total": "Chat answers that hit the tool-call round limit",
+    "scheduler_wait_seconds": "Time processing jobs spend queued",
+    "speculative_drafts_total": "Reply drafts pre-generated in the background, by outcome",
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[LabelKey, float]] = {}
+_histograms: Dict[str, Dict[LabelKey, "_Histogram"]] = {}
+_server: Optional[ThreadingHTTPServer] = None
+
+
+class _Histogram:
+    """Cumulative bucket counts plus sum, count and max."""
+
+    __slots__ = ("buckets", "counts", "sum", "count", "max")
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile as the upper bound of the bucket containing it."""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets, self.counts):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+def _key(labels: Dict[str, object]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1.0, **labels):
+    """Increment a counter."""
+    key = _key(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0.0) + value
+
+
+def observe(name: str, value: float, buckets: Tuple[float, ...] = DEFAULT_BUCKETS, **labels):
+    """Record a value in a histogram."""
+    key = _key(labels)
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        if key not in series:
+            series[key] = _Histogram(buckets)
+        series[key].observe(value)
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Time a block into a latency histogram."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def instrument(name: str, **labels):
+    """Decorator that times every call to a function.
+
+    Generator functions are timed over their full iteration, not just creation.
+    """
+    def decorate(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def gen_wrapper(*args, **kwargs):
+                with timer(name, **labels):
+                    yield from fn(*args, **kwargs)
+            return gen_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(name, **labels):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def instrument_class(cls, name: str, exclude: Tuple[str, ...] = ()):
+    """Time every public method of ``cls`` into histogram ``name``, labelled by method."""
+    for attr, value in list(vars(cls).items()):
+        if attr.startswith("_") or attr in exclude or not inspect.isfunction(value):
+            continue
+        setattr(cls, attr, instrument(name, method=attr)(value))
+    return cls
+
+
+def reset():
+    """Clear all recorded metrics."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def snapshot() -> Dict[str, List[Dict]]:
+    """Get all metrics as plain rows, e.g. for display in a table."""
+    with _lock:
+        counters = [
+            {"metric": name, **dict(key), "value": value}
+            for name, series in _counters.items()
+            for key, value in series.items()
+        ]
+        histograms = [
+            {
+                "metric": name,
+                **dict(key),
+                "count": h.count,
+                "mean_ms": (h.sum / h.count * 1000) if h.count else 0.0,
+                "p50_ms": h.quantile(0.50) * 1000,
+                "p95_ms": h.quantile(0.95) * 1000,
+                "max_ms": h.max * 1000,
+                "total_s": h.sum,
+            }
+            for name, series in _histograms.items()
+            for key, h in series.items()
+        ]
+    return {"counters": counters, "histograms": histograms}
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    items = key + extra
+    if not items:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in items)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(items, escaped)) + "}"
+
+
+def render_prometheus() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        for name, series in sorted(_counters.items()):
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} counter")
+            for key, value in series.items():
+                lines.append(f"{name}{_format_labels(key)} {value}")
+
+        for name, series in sorted(_histograms.items()):
+            if name in HELP:
+                lines.append(f"# HELP {name} {HELP[name]}")
+            lines.append(f"# TYPE {name} histogram")
+            for key, h in series.items():
+                cumulative = 0
+                for bound, n in zip(h.buckets, h.counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_format_labels(key, (('le', str(bound)),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, (('le', '+Inf'),))} {h.count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {h.sum}")
+                lines.append(f"{name}_count{_format_labels(key)} {h.count}")
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str):
+    """Write metrics to a file, e.g. for the node_exporter textfile collector."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(render_prometheus())
+    # Atomic rename so scrapers never read a partial file
+    os.replace(tmp_path, path)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip("/") not in ("", "/metrics"):
+            self.send_error(404)
+            return
+        body = render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port: int, host: str = "0.0.0.0") -> ThreadingHTTPServer:
+    """Serve /metrics on a background thread. Safe to call more than once."""
+    global _server
+    with _lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((host, port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
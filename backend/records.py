@@ -0,0 +1,93 @@
+"""
+Compact result rows for Database reads.
+Records wrap the sqlite3.Row returned by the cursor instead of copying it into
+a dict, and decode columns such as JSON metadata only when they are read. They
+behave like read-only dicts (``row['subject']``, ``row.get(...)``, ``dict(row)``)
+and also allow attribute access (``row.subject``).
+"""
+
+import json
+import sqlite3
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator
+
+from backend.archive import decompress_body
+
+
+class Record(Mapping):
+    """Read-only, dict-compatible view of one result row."""
+
+    __slots__ = ('_row', '_decoded')
+
+    # Column name -> function applied to its non-empty value on first access
+    decoders: Dict[str, Callable[[Any], Any]] = {}
+
+    def __init__(self, row: sqlite3.Row):
+        self._row = row
+        self._decoded = None
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            value = self._row[key]
+        except (IndexError, TypeError):
+            raise KeyError(key) from None
+
+        decoder = self.decoders.get(key)
+        if decoder is None or not value:
+            return value
+        if self._decoded is None:
+            self._decoded = {}
+        if key not in self._decoded:
+            self._decoded[key] = decoder(value)
+        return self._decoded[key]
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._row.keys())
+
+    def __len__(self) -> int:
+        return len(self._row)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._row.keys()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def __reduce__(self):
+        # sqlite3.Row can't be pickled; round-trip as a plain dict
+        return dict, (dict(self),)
+
+
+class EmailRecord(Record):
+    """An ``emails`` row; an archived body is decompressed on first access."""
+    __slots__ = ()
+    decoders = {'body': decompress_body}
+
+
+class ThreadRecord(Record):
+    """A ``threads`` row."""
+    __slots__ = ()
+
+
+class TaskRecord(Record):
+    """An ``action_items`` row, usually joined with its email's subject and sender."""
+    __slots__ = ()
+
+
+class ContactRecord(Record):
+    """A ``contacts`` row: one normalized sender address and its aggregates."""
+    __slots__ = ()
+
+
+class DraftRecord(Record):
+    """A ``drafts`` row whose JSON metadata is parsed on first access."""
+    __slots__ = ()
+    decoders = {'metadata': json.loads}
@@ -0,0 +1,222 @@
+"""
+Priority scheduling for email processing work.
+Interactive requests, newly arrived mail and known-important senders are served
+before bulk backfill, and queue wait/run latency is tracked per priority class.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Optional
+from backend import metrics
+
+# Priority classes (lower value = served first)
+INTERACTIVE = 0
+NEW_MAIL = 1
+IMPORTANT_SENDER = 2
+BACKFILL = 3
+
+PRIORITY_NAMES = {
+    INTERACTIVE: "interactive",
+    NEW_MAIL: "new_mail",
+    IMPORTANT_SENDER: "important_sender",
+    BACKFILL: "backfill",
+}
+
+# Longest a job may wait (seconds) before it jumps ahead of everything but
+# interactive work. None means the class is served strictly by priority; only
+# classes with something above them besides interactive work can be promoted.
+DEFAULT_MAX_WAIT = {
+    INTERACTIVE: None,
+    NEW_MAIL: None,
+    IMPORTANT_SENDER: 120.0,
+    BACKFILL: 600.0,
+}
+
+
+class _Job:
+    """A queued unit of work."""
+
+    __slots__ = ("fn", "args", "kwargs", "priority", "future", "enqueued_at")
+
+    def __init__(self, fn: Callable, args: tuple, kwargs: dict, priority: int):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.future = Future()
+        self.enqueued_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Per-priority-class queue wait and run time statistics."""
+
+    def __init__(self, max_samples: int = 1000):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self._samples = {p: deque(maxlen=max_samples) for p in PRIORITY_NAMES}
+        self._counts = {p: 0 for p in PRIORITY_NAMES}
+
+    def record(self, priority: int, wait: float, run: float):
+        """Record one completed job."""
+        with self._lock:
+            self._samples[priority].append((wait, run))
+            self._counts[priority] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        """Get latency statistics (seconds) keyed by priority class name."""
+        with self._lock:
+            samples = {p: list(s) for p, s in self._samples.items()}
+            counts = dict(self._counts)
+
+        stats = {}
+        for priority, name in PRIORITY_NAMES.items():
+            waits = sorted(s[0] for s in samples[priority])
+            totals = sorted(s[0] + s[1] for s in samples[priority])
+            stats[name] = {
+                "completed": counts[priority],
+                "wait_p50": _percentile(waits, 0.50),
+                "wait_p95": _percentile(waits, 0.95),
+                "wait_max": waits[-1] if waits else 0.0,
+                "total_p50": _percentile(totals, 0.50),
+                "total_p95": _percentile(totals, 0.95),
+            }
+        return stats
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class PriorityScheduler:
+    """Thread pool that serves processing jobs by priority class.
+
+    ``reserved_interactive`` workers only ever run INTERACTIVE jobs, so a
+    single-email request from the UI never waits behind a bulk backfill.
+    The remaining workers serve interactive work first, then any job that has
+    exceeded its class's max wait, then jobs in priority order.
+    """
+
+    def __init__(self, workers: int = 3, reserved_interactive: int = 1,
+                 max_wait: Optional[Dict[int, Optional[float]]] = None):
+        self.workers = max(1, workers)
+        self.reserved_interactive = max(0, min(reserved_interactive, self.workers - 1))
+        self.max_wait = dict(DEFAULT_MAX_WAIT)
+        if max_wait:
+            self.max_wait.update(max_wait)
+
+        self.latency = LatencyTracker()
+        self._queues = {p: deque() for p in PRIORITY_NAMES}
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._running = False
+
+    def start(self):
+        """Start worker threads."""
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+
+        for i in range(self.workers):
+            interactive_only = i < self.reserved_interactive
+            thread = threading.Thread(
+                target=self._worker,
+                args=(interactive_only,),
+                name=f"email-scheduler-{i}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn: Callable, *args, priority: int = BACKFILL, **kwargs) -> Future:
+        """Queue ``fn(*args, **kwargs)`` and return a Future for its result."""
+        if priority not in PRIORITY_NAMES:
+            raise ValueError(f"Unknown priority class: {priority}")
+
+        job = _Job(fn, args, kwargs, priority)
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("Scheduler is not running")
+            self._queues[priority].append(job)
+            self._cond.notify_all()
+        return job.future
+
+    def pending(self) -> Dict[str, int]:
+        """Get the number of queued jobs per priority class."""
+        with self._cond:
+            return {PRIORITY_NAMES[p]: len(q) for p, q in self._queues.items()}
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Get per-class latency statistics plus current queue depth."""
+        stats = self.latency.snapshot()
+        for name, depth in self.pending().items():
+            stats[name]["queued"] = depth
+        return stats
+
+    def shutdown(self, wait: bool = True):
+        """Stop workers; queued jobs that have not started are cancelled."""
+        with self._cond:
+            self._running = False
+            for queue in self._queues.values():
+                while queue:
+                    queue.popleft().future.cancel()
+            self._cond.notify_all()
+
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+
+    def _next_job(self, interactive_only: bool) -> Optional[_Job]:
+        """Pick the next job to run. Must be called with the lock held."""
+        if self._queues[INTERACTIVE]:
+            return self._queues[INTERACTIVE].popleft()
+        if interactive_only:
+            return None
+
+        # Jobs past their max wait go first, oldest class deadline first
+        now = time.monotonic()
+        overdue = None
+        for priority, queue in self._queues.items():
+            limit = self.max_wait.get(priority)
+            if queue and limit is not None and now - queue[0].enqueued_at >= limit:
+                if overdue is None or queue[0].enqueued_at < self._queues[overdue][0].enqueued_at:
+                    overdue = priority
+        if overdue is not None:
+            return self._queues[overdue].popleft()
+
+        for priority in sorted(self._queues):
+            if self._queues[priority]:
+                return self._queues[priority].popleft()
+        return None
+
+    def _worker(self, interactive_only: bool):
+        while True:
+            with self._cond:
+                job = self._next_job(interactive_only)
+                while job is None:
+                    if not self._running:
+                        return
+                    self._cond.wait()
+                    job = self._next_job(interactive_only)
+
+            if not job.future.set_running_or_notify_cancel():
+                continue
+
+            started = time.monotonic()
+            metrics.observe("scheduler_wait_seconds", started - job.enqueued_at,
+                            priority=PRIORITY_NAMES[job.priority])
+            try:
+                result = job.fn(*job.args, **job.kwargs)
+            except BaseException as e:
+                job.future.set_exception(e)
+            else:
+                job.future.set_result(result)
+            finally:
+                self.latency.record(job.priority, started - job.enqueued_at,
+                                    time.monotonic() - started)
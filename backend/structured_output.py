@@ -0,0 +1,126 @@
+"""
+Tolerant parsing of structured LLM output.
+A single-pass, incremental parser for JSON arrays of objects that keeps every
+complete object even when the output is truncated or partly malformed, and
+returns the broken fragments so only those need to be repaired.
+"""
+
+import json
+from typing import Dict, List
+
+TASK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "tasks": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "task": {"type": "string"},
+                    "deadline": {"type": "string"},
+                },
+                "required": ["task", "deadline"],
+            },
+        },
+    },
+    "required": ["tasks"],
+}
+
+
+class ObjectArrayParser:
+    """Incrementally extract the objects of the first JSON array in a text.
+
+    Feed chunks as they arrive (e.g. from a streamed response) and collect the
+    objects returned by ``feed``; call ``finish`` at the end. Text before the
+    array (including a wrapping ``{"tasks": ...}`` object) is skipped.
+    """
+
+    def __init__(self):
+        self.objects: List[Dict] = []
+        self.broken: List[str] = []
+        self.found_array = False
+        self.closed = False
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._start = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[Dict]:
+        """Consume a chunk and return the objects it completed."""
+        self._buffer += chunk
+        completed = []
+        buffer = self._buffer
+        i = self._pos
+
+        while i < len(buffer) and not self.closed:
+            c = buffer[i]
+            if not self.found_array:
+                self.found_array = c == '['
+            elif self._depth == 0:
+                if c == '{':
+                    self._depth = 1
+                    self._start = i
+                    self._in_string = False
+                elif c == ']':
+                    self.closed = True
+            elif self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+            elif c == '"':
+                self._in_string = True
+            elif c in '{[':
+                self._depth += 1
+            elif c in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    span = buffer[self._start:i + 1]
+                    try:
+                        value = json.loads(span)
+                    except ValueError:
+                        self.broken.append(span)
+                    else:
+                        if isinstance(value, dict):
+                            self.objects.append(value)
+                            completed.append(value)
+                        else:
+                            self.broken.append(span)
+            i += 1
+
+        self._pos = i
+        return completed
+
+    def finish(self) -> List[Dict]:
+        """End the input. An unterminated trailing object is kept as a broken fragment."""
+        if self._depth > 0:
+            self.broken.append(self._buffer[self._start:])
+            self._depth = 0
+        return self.objects
+
+    @property
+    def complete(self) -> bool:
+        """Whether a whole array was parsed with no broken objects."""
+        return self.found_array and self.closed and not self.broken
+
+
+def parse_object_array(text: str) -> ObjectArrayParser:
+    """Parse a complete response in one pass."""
+    parser = ObjectArrayParser()
+    parser.feed(text or "")
+    parser.finish()
+
+    # Some models answer a single object instead of an array
+    if not parser.found_array:
+        try:
+            value = json.loads(text)
+        except (TypeError, ValueError):
+            return parser
+        if isinstance(value, dict):
+            parser.found_array = parser.closed = True
+            parser.objects.append(value)
+    return parser
@@ -0,0 +1,50 @@
+"""
+Conversation threading helpers.
+Normalizes subjects and strips quoted reply text so a thread's messages can be
+grouped and only the new part of each reply is sent to the LLM.
+"""
+
+import re
+from typing import Optional
+
+# Reply/forward prefixes, possibly repeated and in any case: "Re: RE: Fwd: FW:"
+_PREFIX = re.compile(r'^\s*((re|fwd?|aw|sv|tr)(\[\d+\])?\s*:\s*)+', re.IGNORECASE)
+_WHITESPACE = re.compile(r'\s+')
+
+# "On Mon, Nov 20, 2025 at 9:30 AM John <john@x.com> wrote:"
+_ATTRIBUTION = re.compile(r'^\s*On .{0,200}wrote:\s*$', re.IGNORECASE)
+_ORIGINAL_MESSAGE = re.compile(r'^\s*-{2,}\s*Original Message\s*-{2,}\s*$', re.IGNORECASE)
+
+# Replies to an existing subject join a thread only if it was active this recently
+THREAD_WINDOW_DAYS = 30
+
+
+def normalize_subject(subject: str) -> str:
+    """Lowercase a subject and drop reply/forward prefixes and extra whitespace."""
+    subject = _PREFIX.sub('', subject or '')
+    return _WHITESPACE.sub(' ', subject).strip().lower()
+
+
+def is_reply(subject: str) -> bool:
+    """Whether a subject carries a reply/forward prefix."""
+    return bool(_PREFIX.match(subject or ''))
+
+
+def strip_quoted(body: str) -> str:
+    """Remove quoted earlier messages from a reply body."""
+    lines = []
+    for line in (body or '').splitlines():
+        if _ATTRIBUTION.match(line) or _ORIGINAL_MESSAGE.match(line):
+            break
+        if line.lstrip().startswith('>'):
+            continue
+        lines.append(line)
+    return '\n'.join(lines).strip()
+
+
+def clean_message_id(value: Optional[str]) -> Optional[str]:
+    """Normalize a Message-ID / In-Reply-To header value."""
+    if not value:
+        return None
+    value = value.strip().split()[0] if value.strip() else ''
+    return value.strip('<>') or None
@@ -0,0 +1,121 @@
+"""
+Seeded synthetic mailbox generator.
+Uses data/mock_inbox.json as templates and varies senders, subjects, bodies and
+timestamps to produce realistic mailboxes from a few thousand to millions of emails.
+"""
+
+import json
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
+
+from backend.database import Database
+from benchmarks.stub_llm import categorize_text
+
+FIRST_NAMES = [
+    "john", "sarah", "mike", "emily", "david", "jessica", "tom", "rachel", "priya", "carlos",
+    "anna", "wei", "fatima", "lucas", "olivia", "noah", "mei", "omar", "sofia", "liam",
+]
+LAST_NAMES = [
+    "smith", "johnson", "chen", "rodriguez", "lee", "wang", "brown", "green", "patel", "garcia",
+    "kim", "nguyen", "ali", "silva", "müller", "rossi", "tanaka", "khan", "novak", "jones",
+]
+DOMAINS = ["company.com", "techcorp.com", "clientcorp.com", "partner.com", "vendor.io", "agency.co"]
+
+FILLER_PARAGRAPHS = [
+    "Let me know if you have any questions or need more context on this.",
+    "As discussed in our last sync, we should keep the scope tight for this iteration.",
+    "I've attached the relevant documents for your reference. Please review them at your convenience.",
+    "Thanks again for your help with the rollout last week, it went really smoothly.",
+    "Please keep this confidential until the official announcement goes out.",
+    "For background: the previous approach didn't scale past a few hundred users, so we revisited it.",
+    "If this doesn't work for your schedule, propose another time and I'll adjust.",
+    "You are receiving this email because you subscribed to updates. Manage your preferences online.",
+]
+
+# Timestamps are skewed towards recent weeks, like a real inbox
+DEFAULT_SPAN_DAYS = 365
+
+
+def load_templates(path: str = "data/mock_inbox.json") -> List[Dict]:
+    """Load template emails."""
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def _is_person(sender: str) -> bool:
+    local = sender.split('@')[0]
+    return '.' in local and not any(w in local for w in ("no-reply", "newsletter", "noreply"))
+
+
+def _vary_sender(rng: random.Random, sender: str) -> str:
+    if _is_person(sender):
+        return f"{rng.choice(FIRST_NAMES)}.{rng.choice(LAST_NAMES)}@{rng.choice(DOMAINS)}"
+    return sender
+
+
+def _vary_subject(rng: random.Random, subject: str, n: int) -> str:
+    roll = rng.random()
+    if roll < 0.15:
+        return f"Re: {subject}"
+    if roll < 0.20:
+        return f"Fwd: {subject}"
+    if roll < 0.45:
+        return f"{subject} #{n}"
+    return subject
+
+
+def _vary_body(rng: random.Random, body: str) -> str:
+    # Log-normal paragraph count gives mostly short mail with a long tail
+    extra = min(40, int(rng.lognormvariate(0.5, 1.0)))
+    paragraphs = [body] + [rng.choice(FILLER_PARAGRAPHS) for _ in range(extra)]
+    return "\n\n".join(paragraphs)
+
+
+def generate_emails(count: int, seed: int = 0, start_id: int = 1,
+                    templates: Optional[List[Dict]] = None,
+                    end: Optional[datetime] = None,
+                    span_days: int = DEFAULT_SPAN_DAYS,
+                    processed_fraction: float = 0.0) -> Iterator[Dict]:
+    """Yield ``count`` synthetic emails. The same seed always yields the same mailbox.
+
+    ``processed_fraction`` of the emails come pre-categorized (using the stub
+    LLM's keyword rules) so category queries have realistic data.
+    """
+
+    rng = random.Random(seed)
+    templates = templates or load_templates()
+    end = end or datetime(2025, 11, 22)
+
+    for n in range(count):
+        template = rng.choice(templates)
+        age = timedelta(seconds=rng.expovariate(1 / (span_days * 86400 / 4)))
+        age = min(age, timedelta(days=span_days))
+        email = {
+            "id": start_id + n,
+            "sender": _vary_sender(rng, template["sender"]),
+            "subject": _vary_subject(rng, template["subject"], n),
+            "body": _vary_body(rng, template["body"]),
+            "timestamp": (end - age).strftime("%Y-%m-%dT%H:%M:%S"),
+            "category": None,
+        }
+        if rng.random() < processed_fraction:
+            email["category"] = categorize_text(f"{email['subject']}\n{email['body']}")
+            email["processed"] = 1
+        yield email
+
+
+def build_mailbox(db_path: str, count: int, seed: int = 0, processed_fraction: float = 0.0,
+                  chunk_size: int = 10000) -> Database:
+    """Create a database at ``db_path`` filled with ``count`` synthetic emails."""
+    db = Database(db_path)
+    chunk = []
+    for email in generate_emails(count, seed, processed_fraction=processed_fraction):
+        chunk.append(email)
+        if len(chunk) >= chunk_size:
+            db.insert_emails(chunk)
+            chunk = []
+    if chunk:
+        db.insert_emails(chunk)
+    db.load_default_prompts()
+    return db
@@ -0,0 +1,325 @@
+"""
+Concurrent-session load test for the database layer.
+
+    python -m benchmarks.load --sessions 8 --duration 20 --size 10000 \
+        --output benchmarks/results/load.json --baseline benchmarks/results/load-before.json
+
+Each simulated session owns a ``Database`` (as every Streamlit session does in
+``st.session_state``) and runs in its own thread, choosing operations from a
+weighted mix of reads (inbox listing, search, sidebar stats, opening an email,
+task lists) and writes (category updates, processing an email's tasks, task
+status changes, draft saves and edits). The run reports throughput, latency
+percentiles per operation and the rate of "database is locked" errors.
+
+The exit code is 1 if the lock-error rate exceeds ``--max-lock-error-rate``, or
+if a baseline is given and throughput dropped or p99 latency grew by more than
+``--threshold``.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from benchmarks.run import get_mailbox
+from utils.helpers import get_sidebar_stats
+
+SEARCH_TERMS = ["meeting", "review", "budget", "report", "deadline", "invoice", "project", "update"]
+CATEGORIES = ["Important", "To-Do", "Newsletter", "Spam", "Meeting Request", "Project Update"]
+
+OPERATIONS: Dict[str, Callable] = {}
+WEIGHTS: Dict[str, float] = {}
+WRITES = set()
+
+
+def operation(name: str, weight: float, write: bool = False):
+    """Register a session operation. The function receives a Session."""
+    def register(fn: Callable):
+        OPERATIONS[name] = fn
+        WEIGHTS[name] = weight
+        if write:
+            WRITES.add(name)
+        return fn
+    return register
+
+
+class Session:
+    """One simulated user with its own Database, like a Streamlit session."""
+
+    def __init__(self, db_path: str, size: int, seed: int, draft_ids: List[int]):
+        from backend.database import Database
+        self.db = Database(db_path)
+        self.size = size
+        self.rng = random.Random(seed)
+        self.draft_ids = draft_ids
+
+    def email_id(self) -> int:
+        # Recent mail is opened and processed far more often than old mail
+        return max(1, self.size - int(self.rng.expovariate(1 / max(1, self.size / 10))))
+
+
+# ==================== Reads ====================
+
+@operation("inbox_page", 20)
+def op_inbox_page(s):
+    s.db.filter_emails(category=s.rng.choice([None, None] + CATEGORIES), limit=50,
+                       offset=50 * s.rng.randrange(3))
+
+
+@operation("search", 10)
+def op_search(s):
+    s.db.search_emails(s.rng.choice(SEARCH_TERMS), limit=50)
+
+
+@operation("sidebar_stats", 25)
+def op_sidebar_stats(s):
+    get_sidebar_stats(s.db)
+
+
+@operation("open_email", 15)
+def op_open_email(s):
+    email_id = s.email_id()
+    s.db.get_email_by_id(email_id)
+    s.db.get_action_items_for_email(email_id)
+
+
+@operation("task_list", 5)
+def op_task_list(s):
+    s.db.get_urgent_tasks(50)
+
+
+# ==================== Writes ====================
+
+@operation("update_category", 8, write=True)
+def op_update_category(s):
+    s.db.update_email_category(s.email_id(), s.rng.choice(CATEGORIES))
+
+
+@operation("process_email", 6, write=True)
+def op_process_email(s):
+    # What processing writes for one email: category, then its replaced tasks
+    email_id = s.email_id()
+    s.db.update_email_category(email_id, "To-Do")
+    s.db.delete_action_items_for_email(email_id)
+    for n in range(s.rng.randint(1, 3)):
+        s.db.save_action_item(email_id, f"Load test task {n}", s.rng.choice(["EOD", "tomorrow", "Friday"]))
+
+
+@operation("task_status", 4, write=True)
+def op_task_status(s):
+    tasks = s.db.find_tasks(limit=20)
+    if tasks:
+        s.db.update_action_item_status(s.rng.choice(tasks)['id'], s.rng.choice(["pending", "completed"]))
+
+
+@operation("save_draft", 2, write=True)
+def op_save_draft(s):
+    email_id = s.email_id()
+    s.db.save_draft(email_id, f"Re: load test {email_id}", "Thanks, I'll take a look.")
+
+
+@operation("edit_draft", 5, write=True)
+def op_edit_draft(s):
+    draft_id = s.rng.choice(s.draft_ids)
+    s.db.update_draft(draft_id, f"Re: edited {draft_id}", f"Edited at {time.time():.3f}")
+
+
+# ==================== Runner ====================
+
+def is_lock_error(e: Exception) -> bool:
+    return isinstance(e, sqlite3.OperationalError) and ("locked" in str(e) or "busy" in str(e))
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(timings: List[float], errors: int, lock_errors: int) -> Dict[str, float]:
+    ordered = sorted(timings)
+    return {
+        "ops": len(ordered),
+        "errors": errors,
+        "lock_errors": lock_errors,
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+    }
+
+
+def choose_weights(write_fraction: float) -> Dict[str, float]:
+    """Scale the registered weights so writes make up ``write_fraction`` of operations."""
+    reads = sum(w for n, w in WEIGHTS.items() if n not in WRITES)
+    writes = sum(w for n, w in WEIGHTS.items() if n in WRITES)
+    return {n: w * (write_fraction / writes if n in WRITES else (1 - write_fraction) / reads)
+            for n, w in WEIGHTS.items()}
+
+
+def run_session(session: Session, weights: Dict[str, float], clock: Dict[str, float], think: float,
+                results: Dict, lock: threading.Lock, start: threading.Barrier):
+    names = list(weights)
+    shares = [weights[n] for n in names]
+    timings = defaultdict(list)
+    errors = defaultdict(int)
+    lock_errors = defaultdict(int)
+    other_errors = []
+
+    start.wait()
+    while time.monotonic() < clock["deadline"]:
+        name = session.rng.choices(names, weights=shares)[0]
+        started = time.perf_counter()
+        try:
+            OPERATIONS[name](session)
+        except Exception as e:
+            errors[name] += 1
+            if is_lock_error(e):
+                lock_errors[name] += 1
+            elif len(other_errors) < 5:
+                other_errors.append(f"{name}: {e}")
+        timings[name].append(time.perf_counter() - started)
+        if think:
+            time.sleep(session.rng.expovariate(1 / think))
+
+    with lock:
+        for name in timings:
+            results["timings"][name].extend(timings[name])
+            results["errors"][name] += errors[name]
+            results["lock_errors"][name] += lock_errors[name]
+        results["messages"].extend(other_errors)
+
+
+def run(args) -> Dict:
+    db = get_mailbox(args.size, args.seed, args.workdir)
+    draft_ids = [db.save_draft(i, f"Re: draft {i}", "Draft body") for i in range(1, min(args.size, 50) + 1)]
+    weights = choose_weights(args.write_fraction)
+
+    results = {"timings": defaultdict(list), "errors": defaultdict(int),
+               "lock_errors": defaultdict(int), "messages": []}
+    lock = threading.Lock()
+    # Sessions start together and share one deadline, set as the barrier opens
+    clock = {}
+    start = threading.Barrier(args.sessions, action=lambda: clock.update(
+        started=time.monotonic(), deadline=time.monotonic() + args.duration))
+    sessions = [Session(db.db_path, args.size, args.seed + i, draft_ids) for i in range(args.sessions)]
+
+    print(f"Running {args.sessions} sessions for {args.duration}s "
+          f"({args.write_fraction:.0%} writes) on {args.size} emails...", file=sys.stderr)
+    threads = [threading.Thread(target=run_session, daemon=True,
+                                args=(session, weights, clock, args.think_ms / 1000, results, lock, start))
+               for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.monotonic() - clock["started"]
+
+    operations = {name: summarize(results["timings"][name], results["errors"][name], results["lock_errors"][name])
+                  for name in sorted(results["timings"])}
+    all_timings = [t for timings in results["timings"].values() for t in timings]
+    total = summarize(all_timings, sum(results["errors"].values()), sum(results["lock_errors"].values()))
+    total["throughput"] = total["ops"] / elapsed if elapsed else 0.0
+    total["lock_error_rate"] = total["lock_errors"] / total["ops"] if total["ops"] else 0.0
+    total["error_rate"] = total["errors"] / total["ops"] if total["ops"] else 0.0
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sqlite": sqlite3.sqlite_version,
+            "seed": args.seed,
+            "size": args.size,
+            "sessions": args.sessions,
+            "duration": args.duration,
+            "write_fraction": args.write_fraction,
+            "think_ms": args.think_ms,
+            "elapsed": elapsed,
+        },
+        "total": total,
+        "operations": operations,
+        "errors": results["messages"],
+    }
+
+
+def report(current: Dict):
+    print(f"\n{'operation':<18} {'ops':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'locked':>7}", file=sys.stderr)
+    for name, stats in list(current["operations"].items()) + [("TOTAL", current["total"])]:
+        print(f"{name:<18} {stats['ops']:>7} {stats['p50_ms']:7.1f}ms {stats['p95_ms']:7.1f}ms "
+              f"{stats['p99_ms']:7.1f}ms {stats['lock_errors']:>7}", file=sys.stderr)
+    total = current["total"]
+    print(f"\nthroughput {total['throughput']:.1f} ops/s, lock errors {total['lock_error_rate']:.2%}, "
+          f"other errors {total['errors'] - total['lock_errors']}", file=sys.stderr)
+    for message in current["errors"]:
+        print(f"  {message}", file=sys.stderr)
+
+
+def gate(current: Dict, baseline: Dict, args) -> List[str]:
+    """Return the reasons this run fails the gate."""
+    failures = []
+    total = current["total"]
+    if total["lock_error_rate"] > args.max_lock_error_rate:
+        failures.append(f"lock-error rate {total['lock_error_rate']:.2%} > {args.max_lock_error_rate:.2%}")
+
+    if baseline:
+        base = baseline["total"]
+        if base["throughput"] and total["throughput"] < base["throughput"] * (1 - args.threshold):
+            failures.append(f"throughput {total['throughput']:.1f} ops/s vs baseline {base['throughput']:.1f}")
+        if base["p99_ms"] and total["p99_ms"] > base["p99_ms"] * (1 + args.threshold):
+            failures.append(f"p99 {total['p99_ms']:.1f} ms vs baseline {base['p99_ms']:.1f} ms")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Email Productivity Agent concurrent-session load test")
+    parser.add_argument("--sessions", type=int, default=8, help="Concurrent simulated sessions")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to run")
+    parser.add_argument("--size", type=int, default=10000, help="Emails in the mailbox")
+    parser.add_argument("--write-fraction", type=float, default=0.25, help="Share of operations that write")
+    parser.add_argument("--think-ms", type=float, default=0.0,
+                        help="Mean pause between a session's operations (0 = back to back)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Compare against this results JSON")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed throughput drop / p99 growth against the baseline")
+    parser.add_argument("--max-lock-error-rate", type=float, default=0.0,
+                        help="Fail if more than this share of operations hit 'database is locked'")
+    args = parser.parse_args(argv)
+    if args.sessions < 1 or not 0 <= args.write_fraction <= 1:
+        parser.error("--sessions must be positive and --write-fraction between 0 and 1")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        args.workdir = workdir
+        current = run(args)
+
+    report(current)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+
+    failures = gate(current, baseline, args)
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
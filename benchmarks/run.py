@@ -0,0 +1,290 @@
+"""
+Benchmark runner.
+
+    python -m benchmarks.run --sizes 1000 10000 --output benchmarks/results/after.json \
+        --baseline benchmarks/results/before.json
+
+Each case is timed ``--repeat`` times per mailbox size. Results are written as
+JSON and, when a baseline is given, compared against it; the exit code is 1 if
+any case's median regressed by more than ``--threshold``.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from benchmarks import stub_llm
+from benchmarks.generator import build_mailbox, generate_emails
+from utils.helpers import get_sidebar_stats
+
+CACHE_DIR = os.path.join(os.path.dirname(__file__), ".cache")
+CASES: List[tuple] = []
+
+
+def case(name: str):
+    """Register a benchmark case. The function receives a BenchContext."""
+    def register(fn: Callable):
+        CASES.append((name, fn))
+        return fn
+    return register
+
+
+class BenchContext:
+    """Per-size state shared by benchmark cases."""
+
+    def __init__(self, db, size: int, seed: int, args):
+        self.db = db
+        self.size = size
+        self.args = args
+        self.rng = random.Random(seed)
+
+    def random_ids(self, n: int) -> List[int]:
+        return [self.rng.randint(1, self.size) for _ in range(n)]
+
+
+# ==================== Cases ====================
+
+@case("db.get_all_emails")
+def bench_get_all_emails(ctx):
+    ctx.db.get_all_emails()
+
+
+@case("db.get_email_by_id x100")
+def bench_get_email_by_id(ctx):
+    for email_id in ctx.random_ids(100):
+        ctx.db.get_email_by_id(email_id)
+
+
+@case("db.search_emails")
+def bench_search_emails(ctx):
+    ctx.db.search_emails("meeting")
+
+
+@case("db.filter_emails")
+def bench_filter_emails(ctx):
+    ctx.db.filter_emails(query="meeting", processed=True)
+
+
+@case("db.get_emails_by_category")
+def bench_get_emails_by_category(ctx):
+    ctx.db.get_emails_by_category("Newsletter")
+
+
+@case("db.update_email_category x100")
+def bench_update_email_category(ctx):
+    for email_id in ctx.random_ids(100):
+        ctx.db.update_email_category(email_id, "To-Do")
+
+
+@case("db.get_top_senders")
+def bench_get_top_senders(ctx):
+    ctx.db.get_top_senders(20)
+
+
+@case("db.get_emails_from_sender")
+def bench_get_emails_from_sender(ctx):
+    ctx.db.get_emails_from_sender("newsletter@techinsider.com", limit=50)
+
+
+@case("db.save_action_item x100")
+def bench_save_action_item(ctx):
+    for email_id in ctx.random_ids(100):
+        ctx.db.save_action_item(email_id, "Benchmark task", "Not specified")
+
+
+@case("db.get_all_action_items")
+def bench_get_all_action_items(ctx):
+    ctx.db.get_all_action_items()
+
+
+@case("db.get_urgent_tasks")
+def bench_get_urgent_tasks(ctx):
+    ctx.db.get_urgent_tasks(50)
+
+
+@case("db.get_tasks_due_soon")
+def bench_get_tasks_due_soon(ctx):
+    ctx.db.get_tasks_due_soon(hours=24 * 7)
+
+
+@case("db.save_draft x20")
+def bench_save_draft(ctx):
+    for email_id in ctx.random_ids(20):
+        ctx.db.save_draft(email_id, "Re: Benchmark", "Draft body", {"original_email_id": email_id})
+
+
+@case("db.get_all_drafts")
+def bench_get_all_drafts(ctx):
+    ctx.db.get_all_drafts()
+
+
+@case("db.get_draft_page")
+def bench_get_draft_page(ctx):
+    ctx.db.get_draft_page(limit=25)
+
+
+@case("app.sidebar_queries")
+def bench_sidebar_queries(ctx):
+    get_sidebar_stats(ctx.db)
+
+
+@case("agent.get_inbox_summary")
+def bench_get_inbox_summary(ctx):
+    from backend import agent
+    agent.init_agent(ctx.db)
+    agent.get_inbox_summary()
+
+
+@case("analytics.dashboard")
+def bench_analytics_dashboard(ctx):
+    from backend.analytics import InboxAnalytics
+
+    # A fresh snapshot each run, so this times the initial load plus every aggregate
+    snapshot = InboxAnalytics(ctx.db, snapshot_dir="")
+    snapshot.overview()
+    snapshot.category_trend("W")
+    snapshot.sender_volume(20)
+    snapshot.task_backlog()
+    snapshot.processing_latency()
+
+
+@case("email_processor.process_all_emails")
+def bench_process_all_emails(ctx):
+    from backend import email_processor
+    from backend.database import Database
+
+    # Processing is LLM-bound, so it runs on a small fresh mailbox of its own
+    path = os.path.join(ctx.args.workdir, "process.db")
+    if os.path.exists(path):
+        os.remove(path)
+    db = Database(path)
+    db.insert_emails(list(generate_emails(ctx.args.process_size, seed=ctx.args.seed)))
+    db.load_default_prompts()
+    email_processor.init_processor(db)
+    email_processor.process_all_emails(with_summary=True)
+
+
+# ==================== Runner ====================
+
+def get_mailbox(size: int, seed: int, workdir: str):
+    """Copy a cached pristine mailbox of ``size`` emails into ``workdir``."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    pristine = os.path.join(CACHE_DIR, f"mailbox-{size}-{seed}.db")
+    if not os.path.exists(pristine):
+        print(f"Generating {size} emails...", file=sys.stderr)
+        build_mailbox(pristine + ".tmp", size, seed, processed_fraction=0.8)
+        os.replace(pristine + ".tmp", pristine)
+
+    from backend.database import Database
+    path = os.path.join(workdir, f"mailbox-{size}.db")
+    shutil.copyfile(pristine, path)
+    return Database(path)
+
+
+def summarize(timings: List[float]) -> Dict[str, float]:
+    ordered = sorted(timings)
+    return {
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "min": ordered[0],
+        "p95": ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+        "repeat": len(ordered),
+    }
+
+
+def run(args) -> Dict:
+    selected = [(n, fn) for n, fn in CASES if not args.only or any(o in n for o in args.only)]
+    results = {}
+
+    for size in args.sizes:
+        db = get_mailbox(size, args.seed, args.workdir)
+        ctx = BenchContext(db, size, args.seed, args)
+        for name, fn in selected:
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                fn(ctx)
+                timings.append(time.perf_counter() - started)
+            key = f"{name}@{size}"
+            results[key] = summarize(timings)
+            print(f"{key:<50} median {results[key]['median'] * 1000:10.2f} ms", file=sys.stderr)
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "sizes": args.sizes,
+            "llm_latency": args.llm_latency,
+            "process_size": args.process_size,
+        },
+        "results": results,
+    }
+
+
+def compare(current: Dict, baseline: Dict, threshold: float) -> List[str]:
+    """Print a comparison table and return the names of regressed cases."""
+    regressions = []
+    print(f"\n{'case':<50} {'baseline':>12} {'current':>12} {'change':>8}", file=sys.stderr)
+    for key, result in current["results"].items():
+        base = baseline["results"].get(key)
+        if not base:
+            continue
+        change = (result["median"] - base["median"]) / base["median"] if base["median"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(key)
+            flag = "  REGRESSION"
+        print(f"{key:<50} {base['median'] * 1000:10.2f}ms {result['median'] * 1000:10.2f}ms "
+              f"{change:+7.1%}{flag}", file=sys.stderr)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Email Productivity Agent benchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", nargs="*", help="Run only cases whose name contains one of these")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Stub LLM latency in seconds")
+    parser.add_argument("--process-size", type=int, default=200,
+                        help="Emails in the mailbox used by the processing benchmark")
+    parser.add_argument("--output", help="Write results JSON here")
+    parser.add_argument("--baseline", help="Compare against this results JSON")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Allowed median slowdown before a case counts as a regression")
+    args = parser.parse_args(argv)
+
+    stub_llm.install(latency=args.llm_latency, seed=args.seed)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        args.workdir = workdir
+        current = run(args)
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(current, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s)", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Stub LLM for benchmarks.
+Replaces llm_service.call_llm with deterministic canned responses and a
+configurable latency, so processing can be measured without API calls.
+"""
+
+import os
+import random
+import time
+
+CATEGORY_KEYWORDS = [
+    ("Spam", ("lottery", "won", "claim", "!!!")),
+    ("Newsletter", ("newsletter", "unsubscribe", "this week", "off everything", "free course")),
+    ("Meeting Request", ("meeting", "invitation", "schedule", "standup")),
+    ("To-Do", ("urgent", "required", "review", "approval", "fix", "complete")),
+    ("Project Update", ("status", "update", "notes", "pull request")),
+    ("Personal", ("family", "dinner", "weekend")),
+]
+
+
+def categorize_text(text):
+    """Pick a category from keywords, the way the stub answers categorization prompts."""
+    text = text.lower()
+    for category, keywords in CATEGORY_KEYWORDS:
+        if any(k in text for k in keywords):
+            return category
+    return "Important"
+
+
+class StubLLM:
+    """Callable with the same signature as llm_service.call_llm."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self._rng = random.Random(seed)
+
+    def __call__(self, prompt, system_msg="You are a helpful assistant.", temp=0.7, **kwargs):
+        self.calls += 1
+        if self.latency or self.jitter:
+            time.sleep(max(0.0, self.latency + self._rng.uniform(-self.jitter, self.jitter)))
+
+        system = system_msg.lower()
+        if "verify" in system:
+            return "yes"
+        if "categor" in system:
+            return categorize_text(prompt.rsplit("Email:", 1)[-1])
+        if "task" in system:
+            return '[{"task": "Follow up on this email", "deadline": "Not specified"}]'
+        if "summar" in system:
+            return "The sender shares an update and asks for a follow-up."
+        if "writer" in system:
+            return "Thanks for your email. I'll get back to you shortly.\n\nBest regards"
+        return "Stub response."
+
+
+def install(latency: float = 0.0, jitter: float = 0.0, seed: int = 0) -> StubLLM:
+    """Patch llm_service to use a StubLLM and return it."""
+    # llm_service refuses to import without a key; the stub never uses it
+    os.environ.setdefault("GROQ_API_KEY", "stub-key")
+    from backend import llm_service
+
+    stub = StubLLM(latency, jitter, seed)
+    llm_service.call_llm = stub
+    return stub
@@ -0,0 +1,291 @@
+"""
+Headless command-line interface for Email Productivity Agent.
+Runs ingestion, processing and export without a Streamlit session, e.g. from cron:
+
+    python cli.py ingest data/mock_inbox.json
+    python cli.py process --concurrency 4 --batch-size 200 --stages categorize tasks
+    python cli.py reprocess-stale
+    python cli.py stats
+    python cli.py export emails --format csv --output emails.csv
+    python cli.py mailboxes create alice
+    python cli.py --mailbox alice ingest alice_inbox.json
+    python cli.py process --all-mailboxes --shard-processes 4
+    python cli.py stats --all-mailboxes
+    python cli.py archive --older-than-days 90
+
+Progress and results are written to stdout as JSON lines. Exit codes:
+0 = success, 1 = error, 2 = invalid usage, 3 = some emails failed to process.
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import sys
+import time
+
+from backend import metrics
+from backend.archive import ARCHIVE_AFTER_DAYS
+from backend.database import Database
+from backend.mailboxes import MailboxRegistry, process_mailboxes
+
+EXIT_OK = 0
+EXIT_ERROR = 1
+EXIT_USAGE = 2
+EXIT_PARTIAL = 3
+
+
+def emit(event, **fields):
+    """Write one machine-readable progress record."""
+    print(json.dumps({"event": event, **fields}, default=str), flush=True)
+
+
+def load_processor(db, args):
+    # Imported lazily so ingest/stats/export work without LLM credentials
+    from backend import email_processor, agent
+    email_processor.init_processor(db)
+    agent.init_agent(db)
+    email_processor.configure_scheduler(args.concurrency, reserved_interactive=0)
+    return email_processor
+
+
+def run_batches(processor, emails, args, total):
+    """Process an iterable of emails in batches, emitting progress after each batch."""
+    emails = iter(emails)
+    done = failed = 0
+    started = time.monotonic()
+    emit("start", total=total, batch_size=args.batch_size, stages=args.stages)
+
+    while True:
+        batch = list(itertools.islice(emails, args.batch_size))
+        if not batch:
+            break
+        counts = processor.process_emails(batch, stages=args.stages)
+        done += len(batch)
+        failed += counts['failed']
+        emit("progress", done=done, total=total, failed=failed,
+             elapsed=round(time.monotonic() - started, 3))
+
+    # Let background reply drafts (SPECULATIVE_DRAFTS=1) finish before exiting
+    processor.wait_for_speculative_drafts()
+    emit("done", total=total, failed=failed, elapsed=round(time.monotonic() - started, 3))
+    return EXIT_PARTIAL if failed else EXIT_OK
+
+
+def cmd_ingest(db, args):
+    with open(args.path, 'r') as f:
+        emails = json.load(f)
+
+    if args.replace:
+        count = db.load_emails_from_json(args.path)
+    else:
+        count = db.insert_emails(emails)
+
+    emit("ingested", path=args.path, received=len(emails), inserted=count)
+    return EXIT_OK
+
+
+def cmd_process(db, args):
+    if args.all_mailboxes:
+        return cmd_process_mailboxes(args)
+    processor = load_processor(db, args)
+    total = db.get_unprocessed_summary()['count']
+    if args.limit:
+        total = min(total, args.limit)
+    emails = db.iter_unprocessed_emails(chunk_size=args.batch_size, limit=args.limit or None)
+    return run_batches(processor, emails, args, total)
+
+
+def cmd_reprocess_stale(db, args):
+    processor = load_processor(db, args)
+    emails = db.get_stale_emails(args.prompt_type)
+    if args.limit:
+        emails = emails[:args.limit]
+    return run_batches(processor, emails, args, len(emails))
+
+
+def cmd_process_mailboxes(args):
+    started = time.monotonic()
+    registry = MailboxRegistry()
+    names = [m['name'] for m in registry.list_mailboxes()]
+    emit("start", mailboxes=names, shard_processes=args.shard_processes, stages=args.stages)
+
+    results = process_mailboxes(registry, names, stages=args.stages, shard_processes=args.shard_processes,
+                                workers_per_shard=args.concurrency,
+                                on_done=lambda result: emit("mailbox_done", **result))
+
+    failed = [r['mailbox'] for r in results if 'error' in r]
+    emit("done", mailboxes=len(results), failed=failed, elapsed=round(time.monotonic() - started, 3))
+    return EXIT_PARTIAL if failed else EXIT_OK
+
+
+def cmd_stats(db, args):
+    if args.all_mailboxes:
+        stats = MailboxRegistry().get_all_stats()
+        for name, mailbox_stats in stats['mailboxes'].items():
+            emit("stats", mailbox=name, **mailbox_stats)
+        for name, message in stats['errors'].items():
+            emit("error", mailbox=name, message=message)
+        emit("stats_total", mailboxes=len(stats['mailboxes']), **stats['totals'])
+        return EXIT_PARTIAL if stats['errors'] else EXIT_OK
+
+    emit("stats", **db.get_email_stats())
+    return EXIT_OK
+
+
+def cmd_mailboxes(db, args):
+    registry = MailboxRegistry()
+    if args.action == "create":
+        if not args.name:
+            print("error: mailboxes create needs a name", file=sys.stderr)
+            return EXIT_USAGE
+        emit("mailbox_created", name=args.name, db_path=registry.create_mailbox(args.name, args.path))
+    else:
+        for mailbox in registry.list_mailboxes():
+            emit("mailbox", **mailbox)
+    return EXIT_OK
+
+
+def cmd_archive(db, args):
+    started = time.monotonic()
+    archived = db.archive_old_emails(args.older_than_days, batch_size=args.batch_size)
+    emit("archived", emails=archived, older_than_days=args.older_than_days)
+    if archived and not args.no_vacuum:
+        emit("compacted", **db.compact())
+    emit("done", elapsed=round(time.monotonic() - started, 3), **db.get_archive_stats())
+    return EXIT_OK
+
+
+def cmd_export(db, args):
+    if args.kind == "emails":
+        rows = db.get_all_emails()
+    elif args.kind == "tasks":
+        rows = db.get_all_action_items()
+    else:
+        rows = db.get_all_drafts()
+    rows = [dict(row) for row in rows]
+
+    out = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        if args.format == "json":
+            json.dump(rows, out, indent=2, default=str)
+            out.write("\n")
+        else:
+            fields = list(rows[0].keys()) if rows else []
+            writer = csv.DictWriter(out, fieldnames=fields)
+            writer.writeheader()
+            for row in rows:
+                writer.writerow({k: json.dumps(v) if isinstance(v, (dict, list)) else v
+                                 for k, v in row.items()})
+    finally:
+        if args.output:
+            out.close()
+
+    if args.output:
+        emit("exported", kind=args.kind, format=args.format, rows=len(rows), output=args.output)
+    return EXIT_OK
+
+
+def open_database(args):
+    """Open --db, or the --mailbox shard (ingest creates the mailbox if needed)."""
+    if not args.mailbox:
+        return Database(args.db)
+
+    registry = MailboxRegistry()
+    if args.command == "ingest":
+        registry.create_mailbox(args.mailbox)
+    path = registry.get_path(args.mailbox)
+    return Database(path) if path else None
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Email Productivity Agent batch CLI")
+    parser.add_argument("--db", default="data/email_agent.db", help="SQLite database path")
+    parser.add_argument("--mailbox", help="Use this registered mailbox's shard instead of --db")
+    parser.add_argument("--metrics-file", help="Write Prometheus metrics here when done")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    ingest = sub.add_parser("ingest", help="Load emails from a JSON file")
+    ingest.add_argument("path", nargs="?", default="data/mock_inbox.json")
+    ingest.add_argument("--replace", action="store_true",
+                        help="Clear existing emails and tasks before loading")
+    ingest.set_defaults(func=cmd_ingest)
+
+    def add_processing_args(p):
+        p.add_argument("--concurrency", type=int, default=4, help="Parallel LLM workers")
+        p.add_argument("--batch-size", type=int, default=100, help="Emails per progress batch")
+        p.add_argument("--stages", nargs="+", default=["categorize", "tasks"],
+                       choices=["categorize", "tasks", "summary"])
+        p.add_argument("--limit", type=int, default=0, help="Process at most N emails")
+
+    process = sub.add_parser("process", help="Process unprocessed emails")
+    add_processing_args(process)
+    process.add_argument("--all-mailboxes", action="store_true",
+                         help="Process every registered mailbox, one worker process per shard")
+    process.add_argument("--shard-processes", type=int, default=4,
+                         help="Mailboxes processed at once with --all-mailboxes")
+    process.set_defaults(func=cmd_process)
+
+    stale = sub.add_parser("reprocess-stale",
+                           help="Reprocess emails processed before the last prompt change")
+    add_processing_args(stale)
+    stale.add_argument("--prompt-type", default="categorization")
+    stale.set_defaults(func=cmd_reprocess_stale)
+
+    stats = sub.add_parser("stats", help="Print inbox statistics")
+    stats.add_argument("--all-mailboxes", action="store_true",
+                       help="Print stats for every registered mailbox plus totals")
+    stats.set_defaults(func=cmd_stats)
+
+    mailboxes = sub.add_parser("mailboxes", help="List or create mailboxes")
+    mailboxes.add_argument("action", choices=["list", "create"], nargs="?", default="list")
+    mailboxes.add_argument("name", nargs="?")
+    mailboxes.add_argument("--path", help="Shard file for a new mailbox (default: under MAILBOX_DIR)")
+    mailboxes.set_defaults(func=cmd_mailboxes)
+
+    archive = sub.add_parser("archive", help="Move old email bodies into compressed storage")
+    archive.add_argument("--older-than-days", type=int, default=ARCHIVE_AFTER_DAYS,
+                         help="Archive bodies of emails older than this (default: ARCHIVE_AFTER_DAYS)")
+    archive.add_argument("--batch-size", type=int, default=500, help="Emails archived per transaction")
+    archive.add_argument("--no-vacuum", action="store_true", help="Skip the VACUUM after archiving")
+    archive.set_defaults(func=cmd_archive)
+
+    export = sub.add_parser("export", help="Export emails, tasks or drafts")
+    export.add_argument("kind", choices=["emails", "tasks", "drafts"])
+    export.add_argument("--format", choices=["json", "csv"], default="json")
+    export.add_argument("--output", help="Output file (default: stdout)")
+    export.set_defaults(func=cmd_export)
+
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if (getattr(args, "batch_size", 1) < 1 or getattr(args, "concurrency", 1) < 1
+            or getattr(args, "shard_processes", 1) < 1):
+        parser.print_usage(sys.stderr)
+        print("error: --batch-size, --concurrency and --shard-processes must be positive", file=sys.stderr)
+        return EXIT_USAGE
+
+    try:
+        db = None
+        # Registry commands open their shards themselves
+        if args.command != "mailboxes" and not getattr(args, "all_mailboxes", False):
+            db = open_database(args)
+            if db is None:
+                print(f"error: unknown mailbox {args.mailbox!r}; create it with 'mailboxes create'",
+                      file=sys.stderr)
+                return EXIT_USAGE
+        return args.func(db, args)
+    except Exception as e:
+        emit("error", command=args.command, message=str(e))
+        return EXIT_ERROR
+    finally:
+        if args.metrics_file:
+            metrics.write_prometheus(args.metrics_file)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks import stub_llm  # noqa: E402
+
+stub_llm.install()
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh database loaded with the mock inbox and default prompts."""
+    from backend.database import Database
+
+    # Default prompts and the mock inbox are read relative to the repo root
+    monkeypatch.chdir(ROOT)
+    database = Database(str(tmp_path / "email_agent.db"))
+    database.load_emails_from_json()
+    database.load_default_prompts()
+    return database
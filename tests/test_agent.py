@@ -0,0 +1,75 @@
+import pytest
+from langchain_core.messages import AIMessage
+
+from backend import agent, llm_service
+
+
+class FakeChatModel:
+    """Answers with queued responses; an Exception in the queue is raised."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def invoke(self, messages):
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def tool_agent(db, monkeypatch):
+    agent.init_agent(db)
+    monkeypatch.setattr(agent, "USE_TOOLS", True)
+    monkeypatch.setattr(llm_service, "MAX_RETRIES", 0)
+    fallback = []
+
+    def chat_with_agent(question, context="", history=None):
+        fallback.append(question)
+        return "Answer without tools."
+
+    monkeypatch.setattr(llm_service, "chat_with_agent", chat_with_agent)
+    return fallback
+
+
+def use_model(monkeypatch, *responses):
+    monkeypatch.setattr(llm_service, "get_llm", lambda model_name, temp: FakeChatModel(*responses))
+
+
+def test_failed_request_is_not_retried_without_tools(tool_agent, monkeypatch):
+    use_model(monkeypatch, RuntimeError("rate limited"))
+    assert agent.ask_question("How many tasks?") is None
+    assert tool_agent == []
+
+
+def test_model_that_skips_tools_gets_the_fallback(tool_agent, monkeypatch):
+    use_model(monkeypatch, AIMessage(content=""))
+    assert agent.ask_question("How many tasks?") == "Answer without tools."
+    assert tool_agent == ["How many tasks?"]
+
+
+def test_tool_answer(tool_agent, monkeypatch):
+    call = {"name": "inbox_stats", "args": {}, "id": "call-1"}
+    use_model(monkeypatch, AIMessage(content="", tool_calls=[call]), AIMessage(content="You have mail."))
+    assert agent.ask_question("How many emails?") == "You have mail."
+    assert tool_agent == []
+
+
+def test_empty_answer_after_tools_is_a_failure(tool_agent, monkeypatch):
+    call = {"name": "inbox_stats", "args": {}, "id": "call-1"}
+    use_model(monkeypatch, AIMessage(content="", tool_calls=[call]), AIMessage(content=""))
+    assert agent.ask_question("How many emails?") is None
+    assert tool_agent == []
+
+
+def test_run_tool_reports_bad_calls(db):
+    agent.init_agent(db)
+    assert agent.run_tool("delete_everything", {}) == {"error": "Unknown tool delete_everything"}
+    assert "error" in agent.run_tool("search_emails", {"keywords": "budget"})
+    assert "error" in agent.run_tool("search_emails", {"query": "budget", "limit": "many"})
+    assert "error" in agent.run_tool("get_email", {"email_id": "latest"})
+    assert agent.run_tool("get_email", {"email_id": 999999}) == {"error": "No email with id 999999"}
+    assert isinstance(agent.run_tool("search_emails", {"query": "meeting", "limit": "2"}), list)
@@ -0,0 +1,30 @@
+from backend.analytics import InboxAnalytics
+
+
+def test_snapshot_rebuilds_after_inbox_reload(db):
+    snapshot = InboxAnalytics(db, snapshot_dir="")
+    assert snapshot.overview()["processed"] == 0
+
+    for email_id in range(1, 6):
+        db.update_email_category(email_id, "Spam")
+    assert snapshot.overview()["processed"] == 5
+    assert snapshot.category_counts()["Spam"] == 5
+
+    # Same ids, same count and no processed_at: only the reload itself signals the change
+    db.load_emails_from_json()
+    assert snapshot.overview()["processed"] == 0
+    assert "Spam" not in snapshot.category_counts()
+    assert db.get_inbox_generation() == 2
+
+
+def test_snapshot_merges_recategorized_emails(db):
+    snapshot = InboxAnalytics(db, snapshot_dir="")
+    snapshot.refresh()
+
+    db.update_email_category(3, "Personal")
+    db.insert_emails([{"sender": "new@example.com", "subject": "Hi", "body": "Hello",
+                       "timestamp": "2026-01-01T09:00:00"}])
+    overview = snapshot.overview()
+    assert overview["emails"] == 21
+    assert overview["processed"] == 1
+    assert snapshot.category_counts()["Personal"] >= 1
@@ -0,0 +1,79 @@
+import importlib
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from backend import agent, email_processor
+
+from conftest import ROOT
+
+
+@pytest.fixture
+def client(db, tmp_path, monkeypatch):
+    # api opens its own database on import; keep that one out of the repo's data/
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data", exist_ok=True)
+    api = importlib.import_module("api")
+    monkeypatch.chdir(ROOT)
+
+    monkeypatch.setattr(api, "db", db)
+    email_processor.init_processor(db)
+    agent.init_agent(db)
+    return TestClient(api.app)
+
+
+def test_health(client):
+    response = client.get("/health")
+    assert response.status_code == 200
+    assert response.json()["status"] == "ok"
+
+
+def test_ingest_skips_unset_fields(client, db):
+    email = {"id": 9001, "sender": "Ana <ana@example.com>", "subject": "Hi", "timestamp": "2026-02-01T09:00:00"}
+    assert client.post("/emails", json=[email]).json() == {"received": 1, "inserted": 1}
+    stored = client.get("/emails/9001").json()
+    assert stored["subject"] == "Hi"
+    assert stored["body"] == ""
+
+
+def test_job_lifecycle(client):
+    submitted = client.post("/jobs/process", json={"limit": 3, "with_summary": False})
+    assert submitted.status_code == 202
+    job_id = submitted.json()["id"]
+    assert submitted.json()["status"] == "queued"
+
+    for _ in range(100):
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            break
+        time.sleep(0.05)
+    assert job["status"] == "done"
+    assert job["total"] == 3
+    assert job["processed"] + job["failed"] == 3
+
+    assert client.get("/jobs/unknown").status_code == 404
+    assert client.post("/jobs/process", json={"stages": ["bogus"]}).status_code == 422
+
+
+def test_streamed_chat(client, monkeypatch):
+    asked = []
+
+    def stream_answer(question, email_id=None, history=None, memory=None):
+        asked.append((question, email_id, history))
+        yield "Two "
+        yield "meetings."
+
+    monkeypatch.setattr(agent, "stream_answer", stream_answer)
+    history = [{"role": "user", "content": "Hi"}, {"role": "assistant", "content": "Hello"}]
+    with client.stream("POST", "/chat", json={"question": "Meetings?", "email_id": 1,
+                                              "history": history, "stream": True}) as response:
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "".join(response.iter_text()) == "Two meetings."
+    assert asked == [("Meetings?", 1, history)]
+
+
+def test_chat_without_an_answer(client, monkeypatch):
+    monkeypatch.setattr(agent, "ask_question", lambda *args: None)
+    assert client.post("/chat", json={"question": "Hi"}).status_code == 502
@@ -0,0 +1,66 @@
+import importlib
+import sys
+
+import pytest
+
+from backend import archive
+
+
+@pytest.fixture
+def archived_db(db):
+    bodies = {e['id']: e['body'] for e in db.get_all_emails()}
+    assert db.archive_old_emails(older_than_days=0, batch_size=7, codec="zlib") == len(bodies)
+    return db, bodies
+
+
+def test_archive_then_read(archived_db):
+    db, bodies = archived_db
+    assert db.get_archive_stats()['archived'] == len(bodies)
+    assert {e['id']: e['body'] for e in db.get_all_emails()} == bodies
+    email_id = next(iter(bodies))
+    assert db.get_email_by_id(email_id)['body'] == bodies[email_id]
+    # Already archived emails are left alone
+    assert db.archive_old_emails(older_than_days=0) == 0
+
+
+def test_search_and_filters_read_archived_bodies(archived_db):
+    db, bodies = archived_db
+    # A phrase that is only in a body, not a subject
+    email_id, body = next((i, b) for i, b in bodies.items() if "agenda" in b.lower())
+    phrase = body[body.lower().index("agenda") - 10:][:25]
+    assert email_id in [e['id'] for e in db.search_emails(phrase)]
+
+    result = db.filter_emails(query=phrase, limit=100)
+    assert email_id in [e['id'] for e in result['emails']]
+    assert {e['id']: e['body'] for e in result['emails']}[email_id] == body
+
+
+@pytest.mark.parametrize("codec", ["zlib", "zstd"])
+def test_codecs_round_trip(codec):
+    if codec == "zstd" and archive.zstandard is None:
+        pytest.skip("zstandard is not installed")
+    text = "Quarterly numbers attached. " * 50 + "ünïcode ✓"
+    packed = archive.compress_body(text, codec)
+    assert isinstance(packed, bytes) and len(packed) < len(text)
+    assert archive.decompress_body(packed) == text
+    assert archive.decompress_body("not archived") == "not archived"
+
+
+def test_zlib_when_zstandard_is_missing(monkeypatch):
+    monkeypatch.delenv("ARCHIVE_CODEC", raising=False)
+    # A None entry makes "import zstandard" fail
+    monkeypatch.setitem(sys.modules, "zstandard", None)
+    try:
+        importlib.reload(archive)
+        assert archive.zstandard is None
+        assert archive.CODEC == "zlib"
+        packed = archive.compress_body("hello")
+        assert packed[:1] == b"Z"
+        assert archive.decompress_body(packed) == "hello"
+        with pytest.raises(RuntimeError):
+            archive.compress_body("hello", "zstd")
+        with pytest.raises(RuntimeError):
+            archive.decompress_body(b"S" + b"\x00")
+    finally:
+        monkeypatch.undo()
+        importlib.reload(archive)
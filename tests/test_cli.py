@@ -0,0 +1,29 @@
+import json
+
+import cli
+
+
+def run(capsys, *argv):
+    code = cli.main(list(argv))
+    events = [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith("{")]
+    return code, events
+
+
+def test_reprocess_stale_after_prompt_change(db, capsys):
+    code, events = run(capsys, "--db", db.db_path, "process", "--concurrency", "2")
+    assert code == cli.EXIT_OK
+    assert events[-1]["failed"] == 0
+
+    # Everything processed before the categorization prompt was edited is stale
+    db.save_prompt("categorization", db.get_prompt("categorization") + "\nBe strict.")
+    conn = db.get_connection()
+    conn.execute("UPDATE emails SET processed_at = '2000-01-01 00:00:00'")
+    conn.commit()
+    conn.close()
+    stale = len(db.get_stale_emails())
+    assert stale == 20
+
+    code, events = run(capsys, "--db", db.db_path, "reprocess-stale", "--concurrency", "2")
+    assert code == cli.EXIT_OK
+    assert events[-1] == {**events[-1], "event": "done", "total": stale, "failed": 0}
+    assert db.get_stale_emails() == []
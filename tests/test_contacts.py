@@ -0,0 +1,40 @@
+import threading
+
+from backend.database import Database
+
+
+def category_counts(db, contact_id):
+    conn = db.get_connection()
+    rows = conn.execute('SELECT category, count FROM contact_categories WHERE contact_id = ?',
+                        (contact_id,)).fetchall()
+    conn.close()
+    return {row['category']: row['count'] for row in rows}
+
+
+def test_concurrent_recategorization_keeps_contact_counts(db):
+    email = db.get_email_by_id(1)
+    contact = db.get_contact(email['sender'])
+    db.update_email_category(1, "Important")
+    before = category_counts(db, contact['id'])
+
+    # Sessions racing to recategorize the same email each move it exactly once
+    sessions = [Database(db.db_path) for _ in range(8)]
+    barrier = threading.Barrier(len(sessions))
+
+    def recategorize(session, category):
+        barrier.wait()
+        session.update_email_category(1, category)
+
+    threads = [threading.Thread(target=recategorize, args=(s, c))
+               for s, c in zip(sessions, ["Spam", "Personal"] * 4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    final = db.get_email_by_id(1)['category']
+    after = category_counts(db, contact['id'])
+    assert sum(after.values()) == sum(before.values())
+    assert after.get(final) == before.get(final, 0) + 1
+    assert after.get("Important", 0) == before["Important"] - 1
+    assert db.get_contact(email['sender'])['dominant_category'] in after
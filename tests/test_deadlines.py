@@ -0,0 +1,73 @@
+import pytest
+
+from backend.deadlines import parse_deadline
+from backend.records import TaskRecord
+
+# A Wednesday morning
+SENT = "2026-02-04T10:00:00"
+
+
+@pytest.mark.parametrize("deadline, due", [
+    ("in 2 days", "2026-02-06T17:00:00"),
+    ("in three hours", "2026-02-04T13:00:00"),
+    ("in a week", "2026-02-11T17:00:00"),
+    ("tomorrow", "2026-02-05T17:00:00"),
+    ("tomorrow at 3pm", "2026-02-05T15:00:00"),
+    ("next week", "2026-02-09T17:00:00"),
+    ("end of week", "2026-02-06T17:00:00"),
+])
+def test_relative_dates(deadline, due):
+    assert parse_deadline(deadline, SENT) == due
+
+
+@pytest.mark.parametrize("deadline, due", [
+    ("Friday", "2026-02-06T17:00:00"),
+    ("by Thurs noon", "2026-02-05T12:00:00"),
+    ("Wednesday", "2026-02-04T17:00:00"),
+    ("next Wednesday", "2026-02-11T17:00:00"),
+    ("Monday morning", "2026-02-09T09:00:00"),
+])
+def test_weekday_names(deadline, due):
+    assert parse_deadline(deadline, SENT) == due
+
+
+def test_end_of_day():
+    assert parse_deadline("EOD", SENT) == "2026-02-04T17:00:00"
+    assert parse_deadline("by end of day", SENT) == "2026-02-04T17:00:00"
+    # Sent after 5pm, so the deadline is that night rather than already past
+    assert parse_deadline("EOD", "2026-02-04T18:30:00") == "2026-02-04T23:59:00"
+
+
+@pytest.mark.parametrize("deadline", ["Not specified", "TBD", "", None, "whenever you can", "2/30"])
+def test_unparseable(deadline):
+    assert parse_deadline(deadline, SENT) is None
+
+
+def test_needs_a_reference():
+    assert parse_deadline("tomorrow", None) is None
+
+
+@pytest.fixture
+def task_db(db):
+    email = db.get_all_emails()[0]['id']
+    db.save_action_item(email, "Overdue", "2/2/2026", SENT)
+    db.save_action_item(email, "Due soon", "Friday", SENT)
+    db.save_action_item(email, "Later", "in 2 months", SENT)
+    db.save_action_item(email, "Undated", "Not specified", SENT)
+    return db
+
+
+def names(tasks):
+    assert all(isinstance(task, TaskRecord) for task in tasks)
+    return [task['task'] for task in tasks]
+
+
+def test_due_queries(task_db):
+    now = "2026-02-04T12:00:00"
+    assert names(task_db.get_overdue_tasks(now=now)) == ["Overdue"]
+    assert names(task_db.get_tasks_due_soon(hours=72, now=now)) == ["Due soon"]
+
+    urgent = task_db.get_urgent_tasks(limit=10)
+    assert names(urgent) == ["Overdue", "Due soon", "Later", "Undated"]
+    assert 'undated' not in urgent[0]
+    assert urgent[-1]['due_at'] is None
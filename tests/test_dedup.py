@@ -0,0 +1,38 @@
+from backend import dedup
+
+NEWSLETTER = ("This week in engineering: three new releases shipped, the on-call rotation changed "
+              "and the platform team is hiring. Read the full issue at https://example.com/{n}")
+
+
+def add_processed(db, email_id, sender, subject, body, category, summary=None):
+    db.insert_emails([{"id": email_id, "sender": sender, "subject": subject, "body": body,
+                       "timestamp": "2026-01-01T09:00:00"}])
+    db.update_email_category(email_id, category)
+    if summary:
+        db.update_email_summary(email_id, summary)
+
+
+def test_short_bodies_are_not_fingerprinted():
+    assert dedup.simhash("Sounds good") == 0
+    assert dedup.simhash("") == 0
+    assert dedup.simhash(NEWSLETTER.format(n=1)) != 0
+
+
+def test_short_reply_from_another_sender_is_not_reused(db):
+    add_processed(db, 900, "ceo@corp.com", "Budget", "Sounds good", "Important", "CEO approves the budget")
+    db.insert_emails([{"id": 901, "sender": "spam@x.biz", "subject": "Offer", "body": "sounds good!",
+                       "timestamp": "2026-01-01T10:00:00"}])
+    assert db.find_near_duplicate(901) is None
+
+
+def test_templated_mail_from_the_same_sender_is_reused(db):
+    add_processed(db, 900, "Digest <digest@news.example.com>", "Weekly digest #1",
+                  NEWSLETTER.format(n=1), "Newsletter")
+    db.insert_emails([{"id": 901, "sender": "digest@news.example.com", "subject": "Weekly digest #2",
+                       "body": NEWSLETTER.format(n=2), "timestamp": "2026-01-08T09:00:00"}])
+    assert db.find_near_duplicate(901)["id"] == 900
+
+    # The same body from an unrelated sender under a different subject is not reused
+    db.insert_emails([{"id": 902, "sender": "other@elsewhere.org", "subject": "FYI",
+                       "body": NEWSLETTER.format(n=3), "timestamp": "2026-01-08T10:00:00"}])
+    assert db.find_near_duplicate(902) is None
@@ -0,0 +1,84 @@
+import os
+import shutil
+
+import pytest
+from streamlit.testing.v1 import AppTest
+
+from backend.database import Database
+
+from conftest import ROOT
+
+
+def test_update_drafts_writes_only_changed_fields(db):
+    ids = [db.save_draft(1, f"Draft {i}", f"Body {i}") for i in range(3)]
+    changes = {ids[0]: {'body': "New body"},
+               ids[1]: {'subject': "New subject", 'body': "Other body"},
+               ids[2]: {'metadata': "ignored"}}
+    assert db.update_drafts(changes) == 2
+
+    drafts = [db.get_draft_by_id(i) for i in ids]
+    assert (drafts[0]['subject'], drafts[0]['body']) == ("Draft 0", "New body")
+    assert (drafts[1]['subject'], drafts[1]['body']) == ("New subject", "Other body")
+    assert (drafts[2]['subject'], drafts[2]['body']) == ("Draft 2", "Body 2")
+    assert db.update_drafts({}) == 0
+
+
+@pytest.fixture
+def drafts_app(tmp_path, monkeypatch):
+    """The app on the Drafts page, over a database holding two pages of drafts."""
+    shutil.copytree(os.path.join(ROOT, "data"), tmp_path / "data",
+                    ignore=shutil.ignore_patterns("*.db", "*.db-*", "analytics"))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.delenv("MAILBOX", raising=False)
+    db = Database()
+    db.load_emails_from_json()
+    db.load_default_prompts()
+    for i in range(30):
+        db.save_draft(1, f"Draft {i}", f"Body {i}")
+
+    app = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=30)
+    app.run()
+    app.sidebar.radio[0].set_value("✍️ Drafts").run()
+    return app, db
+
+
+def save_all(app):
+    return next(b for b in app.button if b.label.startswith("💾 Save All"))
+
+
+def test_edits_survive_paging(drafts_app):
+    app, db = drafts_app
+    newest = db.get_draft_page(limit=1)[0]['id']
+
+    app.button(key=f"open_{newest}").click().run()
+    app.text_area(key=f"body_{newest}").set_value("Edited body").run()
+    assert save_all(app).label == "💾 Save All Changes (1)"
+
+    # The open draft's widgets aren't drawn on the next page, but its edit is kept
+    app.button(key="drafts_older").click().run()
+    assert not app.exception
+    assert f"body_{newest}" not in [t.key for t in app.text_area]
+    assert save_all(app).label == "💾 Save All Changes (1)"
+
+    app.button(key="drafts_newer").click().run()
+    assert app.text_area(key=f"body_{newest}").value == "Edited body"
+    assert db.get_draft_by_id(newest)['body'] == "Body 29"
+
+
+def test_save_all_from_another_page(drafts_app):
+    app, db = drafts_app
+    newest = db.get_draft_page(limit=1)[0]['id']
+
+    app.button(key=f"open_{newest}").click().run()
+    app.text_input(key=f"subject_{newest}").set_value("Edited subject").run()
+    app.button(key="drafts_older").click().run()
+    save_all(app).click().run()
+
+    assert not app.exception
+    saved = db.get_draft_by_id(newest)
+    assert (saved['subject'], saved['body']) == ("Edited subject", "Body 29")
+    assert save_all(app).label == "💾 Save All Changes (0)"
+
+    app.button(key="drafts_newer").click().run()
+    assert app.text_input(key=f"subject_{newest}").value == "Edited subject"
+    assert save_all(app).disabled
@@ -0,0 +1,18 @@
+from backend import email_processor
+from backend.database import prompt_hash
+
+
+def test_reload_drops_speculative_drafts(db):
+    email_processor.init_processor(db)
+    reply_prompt = email_processor.get_reply_prompt()
+    email = db.get_all_emails()[0]
+    db.save_draft(email['id'], "Re: old", "Written for the old inbox", speculative=True,
+                  reply_prompt_hash=prompt_hash(reply_prompt))
+
+    db.load_emails_from_json()
+
+    assert db.get_speculative_draft(email['id'], prompt_hash(reply_prompt)) is None
+    draft_id = email_processor.create_draft_reply(email['id'])
+    draft = db.get_draft_by_id(draft_id)
+    assert draft['body'] != "Written for the old inbox"
+    assert draft['email_id'] == email['id']
@@ -0,0 +1,82 @@
+from collections import Counter
+
+import pytest
+
+from benchmarks.stub_llm import categorize_text
+
+EXTRA = [
+    {"id": 501 + i, "sender": sender, "subject": subject, "body": body, "timestamp": timestamp}
+    for i, (sender, subject, body, timestamp) in enumerate([
+        ("john.smith@techcorp.com", "Budget review", "Please review the budget before Friday.", "2025-11-19T08:00:00"),
+        ("john.smith@techcorp.com", "Budget follow-up", "Any update on the budget numbers?", "2025-11-21T12:00:00"),
+        ("hr@company.com", "Budget for the offsite", "The offsite budget is approved.", "2025-11-20T15:00:00"),
+        ("hr@company.com", "Holiday schedule", "Office closed next Friday.", "2025-11-22T09:00:00"),
+    ])
+]
+
+
+@pytest.fixture
+def inbox(db):
+    db.insert_emails(EXTRA)
+    emails = db.get_all_emails()
+    # Leave a few uncategorized
+    for email in emails[3:]:
+        db.update_email_category(email['id'], categorize_text(email['subject'] + " " + email['body']))
+    return db
+
+
+def matches(email, query=None, category=None, sender=None, date_from=None, date_to=None):
+    text = (email['subject'] + " " + email['body']).lower()
+    return ((not query or query.lower() in text)
+            and (not category or (email['category'] or 'Uncategorized') == category)
+            and (not sender or email['sender'] == sender)
+            and (not date_from or email['timestamp'] >= date_from)
+            and (not date_to or email['timestamp'] < date_to))
+
+
+FILTERS = [
+    {},
+    {"query": "budget"},
+    {"category": "To-Do"},
+    {"category": "Uncategorized"},
+    {"sender": "john.smith@techcorp.com"},
+    {"category": "To-Do", "sender": "john.smith@techcorp.com"},
+    {"date_from": "2025-11-20T00:00:00", "date_to": "2025-11-21T00:00:00"},
+    {"category": "Meeting Request", "date_from": "2025-11-19T00:00:00"},
+    {"query": "budget", "sender": "hr@company.com", "date_to": "2025-11-21T00:00:00"},
+    {"query": "budget", "category": "To-Do", "sender": "john.smith@techcorp.com",
+     "date_from": "2025-11-19T00:00:00", "date_to": "2025-11-22T00:00:00"},
+]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_rows_and_facets_match_separate_queries(inbox, filters):
+    emails = inbox.get_all_emails()
+    result = inbox.filter_emails(**filters, limit=500)
+
+    expected = [e for e in emails if matches(e, **filters)]
+    assert result['total'] == len(expected)
+    assert sorted(e['id'] for e in result['emails']) == sorted(e['id'] for e in expected)
+    timestamps = [e['timestamp'] for e in result['emails']]
+    assert timestamps == sorted(timestamps, reverse=True)
+
+    # Each facet counts what picking one of its values would return
+    without_category = {k: v for k, v in filters.items() if k != 'category'}
+    categories = Counter(e['category'] or 'Uncategorized' for e in emails if matches(e, **without_category))
+    assert result['facets']['category'] == dict(categories)
+    for category, count in categories.items():
+        assert inbox.filter_emails(**{**without_category, "category": category})['total'] == count
+
+    without_sender = {k: v for k, v in filters.items() if k != 'sender'}
+    senders = Counter(e['sender'] for e in emails if matches(e, **without_sender))
+    assert result['facets']['sender'] == dict(senders)
+    for sender, count in senders.items():
+        assert inbox.filter_emails(**{**without_sender, "sender": sender})['total'] == count
+
+
+def test_pages_cover_the_matches_once(inbox):
+    filters = {"date_from": "2025-11-19T00:00:00"}
+    total = inbox.filter_emails(**filters)['total']
+    pages = [inbox.filter_emails(**filters, limit=4, offset=offset)['emails'] for offset in range(0, total, 4)]
+    ids = [e['id'] for page in pages for e in page]
+    assert len(ids) == len(set(ids)) == total
@@ -0,0 +1,16 @@
+from utils.helpers import get_sidebar_stats
+
+
+def test_sidebar_stats_match_the_rows(db, monkeypatch):
+    emails = db.get_all_emails()
+    db.update_email_category(emails[0]['id'], "To-Do")
+    db.save_action_item(emails[0]['id'], "Reply", "Friday")
+    db.save_action_item(emails[0]['id'], "File report", "Not specified")
+    db.update_action_item_status(db.get_all_action_items()[0]['id'], "completed")
+    db.save_draft(emails[0]['id'], "Re: Hi", "Thanks")
+    db.save_draft(emails[0]['id'], "Re: Hi", "Pre-generated", speculative=True)
+
+    # Counts come from SQL aggregates, not by loading every row
+    for name in ("get_all_emails", "get_all_action_items", "get_all_drafts"):
+        monkeypatch.setattr(db, name, None)
+    assert get_sidebar_stats(db) == {"emails": len(emails), "processed": 1, "drafts": 1, "pending_tasks": 1}
@@ -0,0 +1,62 @@
+import json
+import os
+
+from backend.llm_service import clean_category, find_category, prompt_categories
+
+with open(os.path.join(os.path.dirname(__file__), "..", "data", "default_prompts.json")) as f:
+    PROMPT = json.load(f)["categorization"]
+
+
+def test_prompt_categories_are_parsed_from_the_prompt():
+    assert prompt_categories(PROMPT) == ["Important", "Newsletter", "Spam", "To-Do",
+                                         "Project Update", "Meeting Request", "Personal"]
+    assert prompt_categories("Sort mail into categories: Work, Home or Bills.") == ["Work", "Home", "Bills"]
+
+
+def test_clean_category_accepts_whole_names_only():
+    assert clean_category("to-do", PROMPT) == "To-Do"
+    assert clean_category(' "Meeting Request". ', PROMPT) == "Meeting Request"
+    assert clean_category("Category: spam", PROMPT) == "Spam"
+    for junk in ("email", "the", "e", "following", "Meeting", ""):
+        assert clean_category(junk, PROMPT) is None
+
+
+def test_find_category_needs_exactly_one_name():
+    assert find_category("I would say this is a Newsletter.", PROMPT) == "Newsletter"
+    assert find_category("Either Spam or Personal", PROMPT) is None
+    assert find_category("e", PROMPT) is None
+
+
+def test_malformed_triage_tasks_escalate_without_repair(monkeypatch):
+    from backend import llm_service
+
+    monkeypatch.setattr(llm_service, "triage_model", "small")
+    monkeypatch.setattr(llm_service, "model", "large")
+    calls = []
+
+    def answer(prompt, system_msg, temp, task=None, model_name=None, json_mode=False):
+        calls.append((task, model_name))
+        if model_name == "small":
+            return '[{"task": "Send deck", "deadline": "Friday"}, {"task": "Book ro'
+        return '[{"task": "Send deck", "deadline": "Friday"}, {"task": "Book room", "deadline": "Monday"}]'
+
+    monkeypatch.setattr(llm_service, "call_llm", answer)
+    tasks = llm_service.extract_tasks("Please send the deck and book a room.", "Extract tasks.")
+    assert [t["task"] for t in tasks] == ["Send deck", "Book room"]
+    assert "tasks_repair" not in [task for task, _ in calls]
+    assert calls[-1] == ("tasks", "large")
+
+
+def test_disagreeing_triage_samples_escalate(monkeypatch):
+    from backend import llm_service
+
+    monkeypatch.setattr(llm_service, "triage_model", "small")
+    monkeypatch.setattr(llm_service, "model", "large")
+    monkeypatch.setattr(llm_service, "TRIAGE_SAMPLES", 2)
+    small = iter(["Spam", "Newsletter"])
+
+    def answer(prompt, system_msg, temp, task=None, model_name=None, json_mode=False):
+        return next(small) if model_name == "small" else "Newsletter"
+
+    monkeypatch.setattr(llm_service, "call_llm", answer)
+    assert llm_service.categorize_email("Weekly digest", PROMPT) == "Newsletter"
@@ -0,0 +1,68 @@
+from backend import agent, llm_service
+from backend.memory import ConversationMemory
+
+
+def turns(*pairs):
+    history = []
+    for question, answer in pairs:
+        history += [{"role": "user", "content": question}, {"role": "assistant", "content": answer}]
+    return history
+
+
+def test_failed_turns_are_skipped():
+    history = turns(("What's due?", None), ("Any meetings?", "One on Friday."))
+    messages = ConversationMemory().messages(history)
+    assert [m.content for m in messages] == ["What's due?", "Any meetings?", "One on Friday."]
+
+
+def test_summary_position_counts_skipped_turns(monkeypatch):
+    monkeypatch.setattr(llm_service, "summarize_conversation", lambda *args, **kwargs: "Earlier talk.")
+    memory = ConversationMemory(token_budget=40)
+    history = turns(("a " * 30, None), ("b " * 30, "c " * 30), ("last question", "last answer"))
+
+    messages = memory.messages(history)
+    assert messages[0].content.endswith("Earlier talk.")
+    assert messages[-1].content == "last answer"
+    assert memory.summarized == len(history) - 2
+
+    # Later questions only send the unsummarized turns
+    history += turns(("next", "answer"))
+    assert [m.content for m in memory.messages(history)[1:]] == ["last question", "last answer", "next", "answer"]
+
+
+def test_question_after_a_failed_answer(db, monkeypatch):
+    agent.init_agent(db)
+    monkeypatch.setattr(agent, "USE_TOOLS", False)
+    seen = []
+
+    def chat(question, context="", history=None):
+        seen.append(history)
+        return "Fine."
+
+    monkeypatch.setattr(llm_service, "chat_with_agent", chat)
+    memory = ConversationMemory()
+    history = [{"role": "user", "content": "First?"}, {"role": "assistant", "content": None}]
+    assert agent.ask_question("Second?", history=history, memory=memory) == "Fine."
+    assert [m.content for m in seen[0]] == ["First?"]
+
+
+def test_concurrent_requests_summarize_once(monkeypatch):
+    import threading
+    import time
+
+    calls = []
+
+    def summarize(*args, **kwargs):
+        calls.append(args)
+        time.sleep(0.05)
+        return "Earlier talk."
+
+    monkeypatch.setattr(llm_service, "summarize_conversation", summarize)
+    memory = ConversationMemory(token_budget=40)
+    history = turns(("a " * 60, "b " * 60), ("last question", "last answer"))
+    threads = [threading.Thread(target=memory.messages, args=(history,)) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
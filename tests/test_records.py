@@ -0,0 +1,49 @@
+import json
+import pickle
+
+import pytest
+
+from backend.records import DraftRecord, EmailRecord
+
+
+@pytest.fixture
+def draft(db):
+    email = db.get_all_emails()[0]
+    draft_id = db.save_draft(email['id'], "Re: Hi", "Thanks!", metadata={"tone": "friendly", "cc": ["a@x.com"]})
+    return db.get_draft_by_id(draft_id)
+
+
+def test_item_and_attribute_access(draft):
+    assert isinstance(draft, DraftRecord)
+    assert draft['subject'] == draft.subject == "Re: Hi"
+    # Metadata is decoded from JSON on first access, then reused
+    assert draft['metadata'] == {"tone": "friendly", "cc": ["a@x.com"]}
+    assert draft['metadata'] is draft['metadata']
+    with pytest.raises(KeyError):
+        draft['missing']
+    with pytest.raises(AttributeError):
+        draft.missing
+
+
+def test_get_and_membership(draft):
+    assert draft.get('body') == "Thanks!"
+    assert draft.get('missing') is None
+    assert draft.get('missing', "default") == "default"
+    assert 'body' in draft and 'missing' not in draft
+
+
+def test_dict_and_json(draft, db):
+    as_dict = dict(draft)
+    assert list(as_dict) == list(draft.keys())
+    assert as_dict['metadata'] == {"tone": "friendly", "cc": ["a@x.com"]}
+    assert json.loads(json.dumps(dict(draft)))['subject'] == "Re: Hi"
+    assert pickle.loads(pickle.dumps(draft)) == as_dict
+
+    emails = db.get_all_emails()
+    assert all(isinstance(e, EmailRecord) for e in emails)
+    assert json.loads(json.dumps([dict(e) for e in emails]))[0]['id'] == emails[0]['id']
+
+
+def test_records_are_read_only(draft):
+    with pytest.raises(TypeError):
+        draft['subject'] = "changed"
@@ -0,0 +1,78 @@
+import threading
+import time
+from datetime import datetime
+
+from backend import email_processor
+from backend import scheduler as sched
+
+
+def run_queued(scheduler, jobs, before_release=None):
+    """Queue ``(name, priority)`` jobs behind a blocked worker and return the order they ran in."""
+    gate = threading.Event()
+    started = threading.Event()
+    order = []
+
+    def block():
+        started.set()
+        gate.wait()
+
+    scheduler.start()
+    try:
+        scheduler.submit(block, priority=sched.INTERACTIVE)
+        started.wait()
+        futures = [scheduler.submit(order.append, name, priority=priority) for name, priority in jobs]
+        if before_release:
+            futures += before_release(order)
+        gate.set()
+        for future in futures:
+            future.result(timeout=5)
+    finally:
+        scheduler.shutdown()
+    return order
+
+
+def test_priority_order():
+    scheduler = sched.PriorityScheduler(workers=1)
+    order = run_queued(scheduler, [
+        ("backfill", sched.BACKFILL),
+        ("important", sched.IMPORTANT_SENDER),
+        ("new", sched.NEW_MAIL),
+        ("interactive", sched.INTERACTIVE),
+        ("new 2", sched.NEW_MAIL),
+    ])
+    assert order == ["interactive", "new", "new 2", "important", "backfill"]
+
+
+def test_starved_backfill_is_promoted():
+    scheduler = sched.PriorityScheduler(workers=1, max_wait={sched.BACKFILL: 0.05})
+
+    def add_new_mail(order):
+        time.sleep(0.1)
+        return [scheduler.submit(order.append, "new", priority=sched.NEW_MAIL)]
+
+    order = run_queued(scheduler, [("backfill", sched.BACKFILL)], before_release=add_new_mail)
+    assert order == ["backfill", "new"]
+
+
+def test_fresh_backfill_waits_its_turn():
+    scheduler = sched.PriorityScheduler(workers=1, max_wait={sched.BACKFILL: 60.0})
+
+    def add_new_mail(order):
+        return [scheduler.submit(order.append, "new", priority=sched.NEW_MAIL)]
+
+    order = run_queued(scheduler, [("backfill", sched.BACKFILL)], before_release=add_new_mail)
+    assert order == ["new", "backfill"]
+
+
+def test_new_mail_is_judged_by_the_clock(monkeypatch):
+    monkeypatch.setattr(email_processor, "NEW_MAIL_WINDOW_HOURS", 24)
+    cutoff = email_processor.new_mail_cutoff(datetime(2026, 3, 10, 12, 0))
+    assert cutoff == "2026-03-09T12:00:00"
+
+    # Old mail is backfill even if it is the newest unprocessed email
+    cutoff = email_processor.new_mail_cutoff()
+    old = {"timestamp": "2024-01-01T09:00:00", "sender": "ana@example.com"}
+    recent = {"timestamp": datetime.now().strftime("%Y-%m-%dT%H:%M:%S"), "sender": "ana@example.com"}
+    assert email_processor.email_priority(old, set(), cutoff) == sched.BACKFILL
+    assert email_processor.email_priority(old, {"ana@example.com"}, cutoff) == sched.IMPORTANT_SENDER
+    assert email_processor.email_priority(recent, set(), cutoff) == sched.NEW_MAIL
@@ -0,0 +1,59 @@
+import json
+
+from backend import llm_service
+from backend.structured_output import ObjectArrayParser, parse_object_array
+
+
+def test_truncated_array_keeps_complete_objects():
+    parsed = parse_object_array('{"tasks": [{"task": "Send deck", "deadline": "Friday"}, {"task": "Book ro')
+    assert parsed.objects == [{"task": "Send deck", "deadline": "Friday"}]
+    assert parsed.broken == ['{"task": "Book ro']
+    assert not parsed.complete
+
+
+def test_junk_between_objects_is_skipped():
+    parsed = parse_object_array('Here you go: [{"task": "A"}, oops, {"task": "B"}\n] and that is all')
+    assert parsed.objects == [{"task": "A"}, {"task": "B"}]
+    assert parsed.complete
+
+
+def test_braces_and_quotes_inside_strings():
+    items = [{"task": 'Reply "yes" to {Ana}', "deadline": "EOD ]"},
+             {"task": "Check path C:\\temp\\", "meta": {"tags": ["a", "}"]}}]
+    parsed = parse_object_array(json.dumps(items))
+    assert parsed.objects == items
+    assert parsed.complete
+
+
+def test_objects_split_across_chunks():
+    parser = ObjectArrayParser()
+    text = json.dumps([{"task": "A \\\" {"}, {"task": "B"}])
+    completed = []
+    for i in range(0, len(text), 3):
+        completed += parser.feed(text[i:i + 3])
+    parser.finish()
+    assert completed == [{"task": "A \\\" {"}, {"task": "B"}]
+    assert parser.complete
+
+
+def test_broken_fragment_is_repaired(monkeypatch):
+    asked = []
+
+    def repair(prompt, *args, **kwargs):
+        asked.append(prompt)
+        return '[{"task": "Book room", "deadline": "Not specified"}]'
+
+    monkeypatch.setattr(llm_service, "call_llm", repair)
+    tasks = llm_service.parse_tasks('[{"task": "Send deck", "deadline": "Friday"}, {"task": "Book room", "deadline": }]')
+    assert tasks == [{"task": "Send deck", "deadline": "Friday"},
+                     {"task": "Book room", "deadline": "Not specified"}]
+    # Only the broken fragment is sent for repair
+    assert len(asked) == 1
+    assert '{"task": "Book room", "deadline": }' in asked[0]
+    assert "Send deck" not in asked[0]
+
+
+def test_unrepairable_fragment_is_dropped(monkeypatch):
+    monkeypatch.setattr(llm_service, "call_llm", lambda *args, **kwargs: None)
+    assert llm_service.parse_tasks('[{"task": "Send deck"}, {"task": ') == [
+        {"task": "Send deck", "deadline": "Not specified"}]
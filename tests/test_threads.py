@@ -0,0 +1,85 @@
+import pytest
+
+from backend import email_processor, llm_service
+
+THREAD = [
+    {"id": 101, "sender": "ana@example.com", "subject": "Launch plan", "message_id": "<m1@example.com>",
+     "body": "Can we launch on Friday? The checklist is in the shared folder.",
+     "timestamp": "2026-02-01T09:00:00"},
+    {"id": 102, "sender": "ben@example.com", "subject": "Re: Launch plan", "message_id": "<m2@example.com>",
+     "in_reply_to": "<m1@example.com>", "body": "Friday works if QA signs off by Thursday.",
+     "timestamp": "2026-02-01T10:00:00"},
+    {"id": 103, "sender": "ana@example.com", "subject": "Re: Launch plan", "message_id": "<m3@example.com>",
+     "in_reply_to": "<m2@example.com>", "body": "QA signed off. Launching Friday at noon.",
+     "timestamp": "2026-02-01T11:00:00"},
+]
+
+
+@pytest.fixture
+def thread_db(db, monkeypatch):
+    db.insert_emails(THREAD)
+    email_processor.init_processor(db)
+
+    calls = []
+    stub = llm_service.call_llm
+
+    def record(prompt, system_msg="You are a helpful assistant.", *args, **kwargs):
+        calls.append((system_msg, prompt))
+        return stub(prompt, system_msg, *args, **kwargs)
+
+    monkeypatch.setattr(llm_service, "call_llm", record)
+    return db, calls
+
+
+def thread_summary_prompts(calls):
+    return [prompt for system, prompt in calls if system == "Summarize email threads concisely."]
+
+
+def test_newest_reply_first_still_summarizes_earlier_messages(thread_db):
+    db, calls = thread_db
+    email_processor.process_single_email(103, stages=["categorize", "summary"])
+
+    prompts = thread_summary_prompts(calls)
+    assert len(prompts) == 1
+    assert "Can we launch on Friday" in prompts[0] and "QA signs off by Thursday" in prompts[0]
+    thread = db.get_thread(db.get_email_by_id(103)['thread_id'])
+    assert thread['summarized_timestamp'] == "2026-02-01T11:00:00"
+
+    # Older messages are covered now: no further thread calls, and no context from later mail
+    calls.clear()
+    email_processor.process_single_email(101, stages=["categorize", "summary"])
+    email_processor.process_single_email(102, stages=["categorize", "summary"])
+    assert thread_summary_prompts(calls) == []
+    assert not any("Earlier in this thread" in prompt for _, prompt in calls)
+
+
+def test_categorize_only_runs_skip_the_thread_summary(thread_db):
+    db, calls = thread_db
+    for email_id in (101, 102, 103):
+        email_processor.process_single_email(email_id, stages=["categorize"])
+    assert thread_summary_prompts(calls) == []
+
+
+def test_reply_draft_builds_the_thread_summary(thread_db):
+    db, calls = thread_db
+    # As after "Process All", which leaves thread summaries out
+    for email_id in (101, 102, 103):
+        email_processor.process_single_email(email_id, with_summary=False)
+    assert thread_summary_prompts(calls) == []
+
+    calls.clear()
+    assert email_processor.create_draft_reply(103)
+    prompts = thread_summary_prompts(calls)
+    assert len(prompts) == 1
+    assert "Can we launch on Friday" in prompts[0] and "QA signs off by Thursday" in prompts[0]
+    assert "Launching Friday at noon" not in prompts[0]
+    thread = db.get_thread(db.get_email_by_id(103)['thread_id'])
+    assert thread['summarized_timestamp'] == "2026-02-01T10:00:00"
+
+    reply_prompt = next(prompt for system, prompt in calls if system != "Summarize email threads concisely.")
+    assert f"Earlier in this thread: {thread['summary']}" in reply_prompt
+
+    # The summary is reused for the next draft
+    calls.clear()
+    assert email_processor.create_draft_reply(103, "Keep it short")
+    assert thread_summary_prompts(calls) == []
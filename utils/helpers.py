@@ -15,3 +15,15 @@ def get_category_color(category):
         "Personal": "#00bcd4"
     }
     return colors.get(category, "#999999")
+
+
+def get_sidebar_stats(db):
+    # Counted in SQL; the task and draft counts come with the email totals
+    stats = db.get_email_stats()
+    
+    return {
+        "emails": stats['total'],
+        "processed": stats['processed'],
+        "drafts": stats['drafts'],
+        "pending_tasks": stats['tasks'].get('pending', 0)
+    }
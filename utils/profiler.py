@@ -0,0 +1,106 @@
+"""Opt-in per-rerun profiler for the Streamlit app."""
+import cProfile
+import heapq
+import io
+import itertools
+import marshal
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+PAGE_FUNCTIONS = (
+    "inbox_viewer_page",
+    "prompt_configuration_page",
+    "email_agent_page",
+    "draft_manager_page",
+    "diagnostics_page",
+    "get_sidebar_stats",
+)
+
+
+def is_enabled(query_params=None):
+    if os.getenv("EMAIL_AGENT_PROFILE", "").lower() in ("1", "true", "yes"):
+        return True
+    return bool(query_params) and query_params.get("profile") in ("1", "true")
+
+
+class RerunProfile:
+    def __init__(self, label, total, stats):
+        self.label = label
+        self.total = total
+        self.created_at = datetime.now().isoformat(timespec="seconds")
+        self.sections = {}
+        self.db_calls = {}
+        self.raw = marshal.dumps(stats.stats)
+        self._attribute(stats)
+
+    def _attribute(self, stats):
+        for (filename, _, func), (_, ncalls, _, cumtime, _) in stats.stats.items():
+            path = filename.replace("\\", "/")
+            if func in PAGE_FUNCTIONS and (path.endswith("app.py") or path.endswith("utils/helpers.py")):
+                self.sections[func] = self.sections.get(func, 0.0) + cumtime
+            elif path.endswith("backend/database.py") and not func.startswith(("_", "<")):
+                calls, total = self.db_calls.get(func, (0, 0.0))
+                self.db_calls[func] = (calls + ncalls, total + cumtime)
+
+    def report(self, limit=30):
+        """Top functions by cumulative time, built on demand from the raw stats."""
+        out = io.StringIO()
+        pstats.Stats(_RawStats(self.raw), stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+
+class _RawStats:
+    """Marshalled profile data in the form pstats.Stats loads from."""
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def create_stats(self):
+        self.stats = marshal.loads(self.raw)
+
+
+class RerunProfiler:
+    """Profiles whole reruns and keeps the slowest ``keep`` of them."""
+
+    def __init__(self, keep=10):
+        self.keep = keep
+        self._lock = threading.Lock()
+        self._heap = []
+        self._seq = itertools.count()
+
+    @contextmanager
+    def profile(self, label_fn=lambda: ""):
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            total = time.perf_counter() - started
+            stats = pstats.Stats(profiler)
+            self._record(RerunProfile(label_fn(), total, stats))
+
+    def _record(self, record):
+        with self._lock:
+            entry = (record.total, next(self._seq), record)
+            if len(self._heap) < self.keep:
+                heapq.heappush(self._heap, entry)
+            elif record.total > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def slowest(self):
+        with self._lock:
+            return [entry[2] for entry in sorted(self._heap, reverse=True)]
+
+    def clear(self):
+        with self._lock:
+            self._heap = []
+
+
+# Shared by all sessions in this server process
+rerun_profiler = RerunProfiler(keep=int(os.getenv("EMAIL_AGENT_PROFILE_KEEP", "10")))